@@ -0,0 +1,277 @@
+"""
+Micro-benchmarks of the hot paths of `cards.models` and `cards.language`.
+
+Run from the repository root:
+```
+python -m benchmarks.run --output bench.json
+python -m benchmarks.run --save-baseline benchmarks/baseline.json
+python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.25
+```
+Every benchmark reports the best time of a single call over several repeats.
+Comparing against a baseline exits with status 1 when a benchmark got slower
+than the tolerance allows. Baselines are only comparable on the same machine.
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+from typing import Callable, Optional
+
+from cards import constants
+from cards.language import Language
+from cards.models import Card, JokerDeck, StandardDeck
+
+
+def _standard_deck_sequence(deck_type: str = "standard_deck") -> list:
+    return [{"command": "init_deck", "meta": {"deck_type": deck_type}}]
+
+
+# Name -> representative `Language` program and the sequence of its result
+PROGRAMS = {
+    "red_card": (
+        _standard_deck_sequence()
+        + [
+            {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 1}},
+            {
+                "command": "any_match",
+                "meta": {
+                    "conditions": [{"type": "colours", "values": ["red"]}],
+                    "from_sequence": 2,
+                },
+            },
+        ],
+        3,
+    ),
+    "three_suits": (
+        _standard_deck_sequence()
+        + [
+            {"command": "shuffle", "meta": {"sequence": 1}},
+            {"command": "pick_random_cards", "meta": {"count": 3, "from_sequence": 2}},
+            {
+                "command": "all_match",
+                "meta": {
+                    "conditions": [
+                        {"type": "suits", "values": ["hearts", "diamonds", "clubs"]}
+                    ],
+                    "from_sequence": 3,
+                },
+            },
+        ],
+        4,
+    ),
+    "hand_from_picked_cards": (
+        _standard_deck_sequence("canasta_deck")
+        + [
+            {
+                "command": "pick_random_cards",
+                "meta": {"count": 26, "from_sequence": 1},
+            },
+            {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 2}},
+            {
+                "command": "order_match",
+                "meta": {
+                    "conditions": [{"type": "values", "values": [1, 13]}],
+                    "from_sequence": 3,
+                },
+            },
+        ],
+        4,
+    ),
+    "deterministic_prefix": (
+        _standard_deck_sequence()
+        + [
+            {
+                "command": "pick_specific_cards",
+                "meta": {
+                    "cards": [
+                        {"value": value, "suit": "clubs"} for value in range(1, 7)
+                    ],
+                    "from_sequence": 1,
+                },
+            },
+            {
+                "command": "insert_specific_cards",
+                "meta": {
+                    "cards": [{"value": 13, "suit": "spades"}] * 8,
+                    "to_sequence": 1,
+                    "force": True,
+                },
+            },
+            {"command": "pick_random_cards", "meta": {"count": 2, "from_sequence": 1}},
+        ],
+        4,
+    ),
+}
+
+
+def _pick_random_cards(deck_class: type, number_of_cards: int) -> Callable:
+    deck = deck_class()
+    snapshot = deck.snapshot()
+
+    def pick_random_cards():
+        deck.restore(snapshot)
+        deck.pick_random_cards(number_of_cards)
+
+    return pick_random_cards
+
+
+def _language_execute(name: str, compiled: bool) -> Callable:
+    sequences, result_sequence = PROGRAMS[name]
+    lan = Language(sequences=sequences)
+    if compiled:
+        plan = lan.compile()
+        return lambda: plan.execute(result_sequence)
+    return lan.execute
+
+
+def get_benchmarks() -> dict:
+    """
+    :return: <dict> name -> <function> running one call of the benchmark
+    """
+    queen_of_hearts = Card(12, constants.SUIT_HEARTS)
+    ace_of_spades = Card(1, constants.SUIT_SPADES)
+
+    full_deck = StandardDeck()
+    full_snapshot = full_deck.snapshot()
+    # Never changed, `is_valid_deck` only does the full check on a full deck
+    valid_deck = StandardDeck()
+    reset_deck = StandardDeck()
+    shuffled_deck = StandardDeck()
+    shuffled_joker_deck = JokerDeck()
+    missing_card_deck = StandardDeck()
+    missing_card_deck.pick_card(ace_of_spades)
+    missing_card_snapshot = missing_card_deck.snapshot()
+
+    def pick_card():
+        full_deck.restore(full_snapshot)
+        full_deck.pick_card(ace_of_spades)
+
+    def insert_card():
+        missing_card_deck.restore(missing_card_snapshot)
+        missing_card_deck.insert_card(ace_of_spades)
+
+    def card_properties():
+        card = queen_of_hearts
+        return card.colour, card.suit_symbol, card.value_symbol, card.is_joker
+
+    benchmarks = {
+        "card_construction": lambda: Card(12, constants.SUIT_HEARTS),
+        "card_properties": card_properties,
+        "standard_deck_init": StandardDeck,
+        "joker_deck_init": JokerDeck,
+        "deck_reset": reset_deck.reset,
+        "deck_restore": lambda: full_deck.restore(full_snapshot),
+        "shuffle[standard]": shuffled_deck.shuffle,
+        "shuffle[canasta]": shuffled_joker_deck.shuffle,
+        "pick_card": pick_card,
+        "insert_card": insert_card,
+        "is_valid_deck": lambda: StandardDeck.is_valid_deck.fget(valid_deck),
+    }
+    for deck_class, deck_name in ((StandardDeck, "standard"), (JokerDeck, "canasta")):
+        for number_of_cards in (1, 5, 26):
+            name = f"pick_random_cards[{deck_name},k={number_of_cards}]"
+            benchmarks[name] = _pick_random_cards(deck_class, number_of_cards)
+    for name in PROGRAMS:
+        benchmarks[f"language_execute[{name}]"] = _language_execute(name, False)
+        benchmarks[f"plan_execute[{name}]"] = _language_execute(name, True)
+    return benchmarks
+
+
+def run_benchmark(func: Callable, repeat: int = 5, min_time: float = 0.2) -> dict:
+    """
+    Time a benchmark
+    :param func: <function> one call of the benchmark
+    :param repeat: <int> how many times to repeat the measurement
+    :param min_time: <float> seconds each measurement runs at least
+    :return: <dict> best seconds per call and the number of calls measured
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    timings = timer.repeat(repeat=repeat, number=number)
+    return {"seconds_per_call": min(timings) / number, "calls": number}
+
+
+def run_benchmarks(
+    name_filter: Optional[str] = None, repeat: int = 5, min_time: float = 0.2
+) -> dict:
+    """
+    Run every benchmark whose name contains `name_filter`
+    :return: <dict> machine-readable results
+    """
+    results = {}
+    for name, func in get_benchmarks().items():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = run_benchmark(func, repeat=repeat, min_time=min_time)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Find benchmarks that are slower than in the baseline
+    :param results: <dict> see `run_benchmarks`
+    :param baseline: <dict> earlier results
+    :param tolerance: <float> allowed slowdown, 0.2 is 20%
+    :return: <[(str, float)]> name and slowdown ratio of every regression
+    """
+    regressions = []
+    for name, result in results["results"].items():
+        baseline_result = baseline["results"].get(name)
+        if baseline_result is None:
+            continue
+        ratio = result["seconds_per_call"] / baseline_result["seconds_per_call"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--save-baseline", help="write the results as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--filter", help="run benchmarks containing this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.filter, repeat=args.repeat, min_time=args.min_time)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    for name, result in results["results"].items():
+        line = f"{name:50} {result['seconds_per_call'] * 1e6:12.3f} us"
+        if baseline and name in baseline["results"]:
+            ratio = (
+                result["seconds_per_call"]
+                / baseline["results"][name]["seconds_per_call"]
+            )
+            line += f"  x{ratio:.2f}"
+        print(line)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as results_file:
+                json.dump(results, results_file, indent=2, sort_keys=True)
+
+    if baseline:
+        regressions = compare_results(results, baseline, args.tolerance)
+        for name, ratio in regressions:
+            print(f"REGRESSION {name}: {ratio:.2f}x slower than the baseline")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Speed and accuracy of the simulation engines on the scenario corpus of
+`cards.scenarios`, every estimate is compared to the exact answer.
+
+Run from the repository root:
+```
+python -m benchmarks.scenarios --iterations 100000 --output scenarios.json
+python -m benchmarks.scenarios --engine language --engine language_batch
+```
+"""
+import argparse
+import json
+import sys
+from typing import Optional
+
+from cards.scenarios import ENGINES, SCENARIOS, format_report, run_scenarios
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument(
+        "--engine", action="append", choices=sorted(ENGINES), help="default: all"
+    )
+    parser.add_argument("--scenario", help="run scenarios containing this text")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    scenarios = [
+        scenario
+        for scenario in SCENARIOS
+        if not args.scenario or args.scenario in scenario.name
+    ]
+    results = run_scenarios(
+        scenarios, engines=args.engine, iteration_count=args.iterations, seed=args.seed
+    )
+    print(format_report(results))
+    if args.output:
+        with open(args.output, "w") as results_file:
+            json.dump([result.as_dict() for result in results], results_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+asyncio front end of the `ProbabilityTest` runners. Iterations run in chunks
+on a bounded thread or process pool, so the event loop stays responsive and
+a run can be cancelled or time out between chunks.
+"""
+import asyncio
+import math
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, Union
+
+from . import exceptions
+from . import parallel
+from .language import ProgramTask
+from .models import ProbabilityTest
+
+# Iterations per chunk, the granularity of cancellation and of sharing the pool
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class AsyncProbabilityRunner(object):
+    """
+    Runs probability tests from coroutines on a pool of `max_workers` threads
+    or processes, shared by every test the runner runs.
+
+    Every test runs as chunks of `chunk_size` iterations, seeded tests as the
+    `parallel.SHARD_COUNT` shards of `parallel.count_successes`, so a seed
+    gives the same result as the other runners. A chunk waits for a
+    free worker in a first-come first-served queue, and a test queues again
+    after each chunk, so concurrent tests take turns on the pool instead of
+    the first big one holding it. A single test still uses all workers.
+
+    Cancelling a test (or its `timeout` running out) submits no more chunks;
+    chunks already running finish in the background and are discarded.
+
+    Threads keep the event loop responsive, processes also run the chunks in
+    parallel. Seeded runs need processes, as the decks use the global `random`
+    generator which threads share, and test functions sent to processes must
+    be picklable (or "module:function" import paths).
+
+    Example usage:
+    ```
+    runner = AsyncProbabilityRunner(max_workers=4)
+
+    async def handler():
+        return await runner.run_language_probability_test(
+            lan.execute, result_sequence=3, timeout=10
+        )
+    ```
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        processes: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        """
+        :param max_workers: <int> size of the pool, all CPUs if None
+        :param processes: <bool> run chunks in processes instead of threads
+        :param chunk_size: <int> iterations per chunk of unseeded tests
+        """
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.processes = processes
+        self.chunk_size = chunk_size
+        executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self.executor = executor_class(max_workers=self.max_workers)
+        self._slots = None
+
+    async def __aenter__(self) -> "AsyncProbabilityRunner":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shut the pool down, without waiting for discarded chunks
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run_probability_test(
+        self,
+        test_func: Union[Callable, str],
+        iteration_count: int = 20000,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> float:
+        """
+        See `ProbabilityTest.run_probability_test`
+        :param timeout: <float> seconds, raises `asyncio.TimeoutError` after
+        :return: <float> Percentage of chance of test happening
+        """
+        successful_runs = await self._count_successes(
+            (test_func, None, kwargs), iteration_count, seed, timeout
+        )
+        return ProbabilityTest._get_percentage(successful_runs, iteration_count)
+
+    async def run_language_probability_test(
+        self,
+        test_func: Callable,
+        result_sequence: int,
+        iteration_count: int = 20000,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> float:
+        """
+        See `ProbabilityTest.run_language_probability_test`
+        :param timeout: <float> seconds, raises `asyncio.TimeoutError` after
+        :return: <float> Percentage of chance of test happening
+        """
+        program = getattr(test_func, "__self__", None)
+        if getattr(test_func, "__name__", None) == "execute" and hasattr(
+            program, "compile"
+        ):
+            # The same pruned plan as `ProbabilityTest`, a compiled plan can be
+            # executed from several threads at once
+            test_func = ProgramTask(program, result_sequence)
+
+        successful_runs = await self._count_successes(
+            (test_func, result_sequence, kwargs), iteration_count, seed, timeout
+        )
+        return ProbabilityTest._get_percentage(successful_runs, iteration_count)
+
+    async def _count_successes(
+        self, task: tuple, iteration_count: int, seed: Optional[int], timeout
+    ) -> int:
+        """
+        :param task: (test_func, result_sequence, kwargs), see `parallel.run_shard`
+        :return: <int> number of successful iterations
+        """
+        if seed is not None and not self.processes:
+            raise exceptions.UnsupportedAction(
+                "Seeded runs need a runner with processes"
+            )
+        if self.processes:
+            try:
+                pickle.dumps(task)
+            except (pickle.PicklingError, AttributeError, TypeError):
+                raise exceptions.UnsupportedAction(
+                    "test_func can't be pickled, pass it as a `module:function` path"
+                )
+        return await asyncio.wait_for(
+            self._run_chunks(task, iteration_count, seed), timeout
+        )
+
+    async def _run_chunks(
+        self, task: tuple, iteration_count: int, seed: Optional[int]
+    ) -> int:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        slots = self._slots
+        loop = asyncio.get_running_loop()
+
+        if seed is None:
+            chunk_count = max(1, math.ceil(iteration_count / self.chunk_size))
+            seeds = [None] * chunk_count
+        else:
+            chunk_count = parallel.SHARD_COUNT
+            seeds = parallel.get_shard_seeds(seed, chunk_count)
+        chunks = zip(parallel.split_iterations(iteration_count, chunk_count), seeds)
+
+        async def run_chunks():
+            successful_runs = 0
+            # The chunks iterator is shared by the coroutines of this test
+            for size, chunk_seed in chunks:
+                async with slots:
+                    successful_runs += await loop.run_in_executor(
+                        self.executor, parallel.run_shard, task, size, chunk_seed
+                    )
+            return successful_runs
+
+        workers = [
+            asyncio.ensure_future(run_chunks())
+            for _ in range(min(self.max_workers, chunk_count))
+        ]
+        try:
+            return sum(await asyncio.gather(*workers))
+        finally:
+            for worker in workers:
+                worker.cancel()
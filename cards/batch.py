@@ -0,0 +1,289 @@
+from functools import cached_property
+from typing import Iterator, Optional, Union
+
+import numpy as np
+
+from . import constants
+from . import exceptions
+from .models import CARDS, JOKER_CODE, Card, StandardDeck
+
+# Integer encodings of card attributes used by the vectorized columns.
+# Jokers get their own index in every column.
+SUIT_INDEXES = {suit: idx for idx, suit in enumerate(constants.CARD_SUITS_CONF)}
+JOKER_SUIT_INDEX = len(SUIT_INDEXES)
+COLOUR_INDEXES = {constants.COLOUR_BLACK: 0, constants.COLOUR_RED: 1}
+JOKER_COLOUR_INDEX = len(COLOUR_INDEXES)
+JOKER_VALUE_INDEX = 0
+
+CODE_VALUES = np.array(
+    [card.value for card in CARDS[:JOKER_CODE]] + [JOKER_VALUE_INDEX], dtype=np.int8
+)
+CODE_SUITS = np.array(
+    [SUIT_INDEXES[card.suit] for card in CARDS[:JOKER_CODE]] + [JOKER_SUIT_INDEX],
+    dtype=np.int8,
+)
+CODE_COLOURS = np.array(
+    [COLOUR_INDEXES[card.colour] for card in CARDS[:JOKER_CODE]] + [JOKER_COLOUR_INDEX],
+    dtype=np.int8,
+)
+CODE_IS_JOKER = np.arange(len(CARDS)) == JOKER_CODE
+
+
+def get_deck_codes(deck: Union[StandardDeck, type]) -> np.ndarray:
+    """
+    Encode cards of a deck (or of a fresh deck of a deck class) as card codes
+    :param deck: <StandardDeck> instance or class
+    :return: <np.ndarray> 1-D array of card codes
+    """
+    if isinstance(deck, type):
+        cards = deck._get_template().cards
+    else:
+        cards = deck._cards
+
+    codes = [card.code for card in cards]
+    if None in codes:
+        raise exceptions.IncorrectDeckException(
+            "Only cards that belong to a deck can be used in a batch"
+        )
+    return np.array(codes, dtype=np.int8)
+
+
+class DealtCards(object):
+    """
+    Cards dealt from every deck of a `DeckBatch`, one row per deck.
+    Attribute columns are computed from the card codes on first access.
+    """
+
+    def __init__(self, codes: np.ndarray):
+        self.codes = codes
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @cached_property
+    def values(self) -> np.ndarray:
+        """
+        Card values, 1 (Ace) to 13 (King), `JOKER_VALUE_INDEX` for jokers
+        """
+        return CODE_VALUES[self.codes]
+
+    @cached_property
+    def suits(self) -> np.ndarray:
+        """
+        Indexes into `SUIT_INDEXES`, `JOKER_SUIT_INDEX` for jokers
+        """
+        return CODE_SUITS[self.codes]
+
+    @cached_property
+    def colours(self) -> np.ndarray:
+        """
+        Indexes into `COLOUR_INDEXES`, `JOKER_COLOUR_INDEX` for jokers
+        """
+        return CODE_COLOURS[self.codes]
+
+    @cached_property
+    def is_joker(self) -> np.ndarray:
+        return CODE_IS_JOKER[self.codes]
+
+    def to_cards(self) -> list[list[Card]]:
+        """
+        Decode the dealt cards back into `Card` objects
+        :return: <Card[][]>
+        """
+        return [[CARDS[code] for code in row] for row in self.codes.tolist()]
+
+
+class DeckBatch(object):
+    """
+    N independent copies of a deck stored as a 2-D array of card codes, one
+    row per deck. All decks are shuffled and dealt from at once.
+
+    Example usage:
+    ```
+    batch = DeckBatch(StandardDeck, size=100000)
+    hands = batch.pick_random_cards(5)
+    flushes = (hands.suits == hands.suits[:, :1]).all(axis=1)
+    ```
+    """
+
+    def __init__(
+        self,
+        deck: Union[StandardDeck, type],
+        size: int,
+        rng: Union[np.random.Generator, int, None] = None,
+    ):
+        """
+        :param deck: <StandardDeck> deck class or a deck instance (in its
+            current state) every deck of the batch starts as
+        :param size: <int> How many decks?
+        :param rng: <np.random.Generator> or a seed
+        """
+        self.rng = np.random.default_rng(rng)
+        self.codes = np.tile(get_deck_codes(deck), (size, 1))
+
+    @classmethod
+    def from_codes(
+        cls, codes: np.ndarray, rng: Union[np.random.Generator, int, None] = None
+    ) -> "DeckBatch":
+        """
+        Batch over existing card codes, one row per deck. The array is used
+        as it is, not copied.
+        :param codes: <np.ndarray> 2-D array of card codes
+        :param rng: <np.random.Generator> or a seed
+        :return: <DeckBatch>
+        """
+        batch = cls.__new__(cls)
+        batch.rng = np.random.default_rng(rng)
+        batch.codes = codes
+        return batch
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def number_of_cards(self) -> int:
+        """
+        Number of cards left in each deck
+        """
+        return self.codes.shape[1]
+
+    def shuffle(self) -> None:
+        """
+        Shuffle every deck of the batch independently
+        """
+        self.codes = self.rng.permuted(self.codes, axis=1)
+
+    def deal(self, number_of_cards: int) -> DealtCards:
+        """
+        Deal cards from the top of every deck, removing them from the decks
+        :param number_of_cards: <int> How many cards from each deck?
+        :return: <DealtCards>
+        """
+        if number_of_cards > self.number_of_cards:
+            raise exceptions.NotEnoughCardsException()
+
+        dealt = self.codes[:, :number_of_cards]
+        self.codes = self.codes[:, number_of_cards:]
+        return DealtCards(dealt)
+
+    def pick_random_cards(self, number_of_cards: int) -> DealtCards:
+        """
+        Pick random cards from every deck, removing them from the decks.
+
+        Same partial Fisher-Yates as `StandardDeck.pick_random_cards`, run
+        for all decks at once: every pick swaps a random card with the last
+        card of the deck and takes it from the end, so the picked cards and
+        the order of the cards left are the same as in a `StandardDeck`. It
+        costs O(number_of_cards) vectorized steps and the decks don't have to
+        be shuffled first.
+        :param number_of_cards: <int> How many cards from each deck?
+        :return: <DealtCards> in picking order
+        """
+        if number_of_cards > self.number_of_cards:
+            raise exceptions.NotEnoughCardsException()
+
+        codes = self.codes
+        rows = np.arange(len(self))
+        remaining = codes.shape[1] - number_of_cards
+        for last in range(codes.shape[1] - 1, remaining - 1, -1):
+            swap_with = self.rng.integers(0, last + 1, size=len(self))
+            picked = codes[rows, swap_with]
+            codes[rows, swap_with] = codes[:, last]
+            codes[:, last] = picked
+        # The first pick is the last column
+        dealt = codes[:, remaining:][:, ::-1].copy()
+        self.codes = codes[:, :remaining]
+        return DealtCards(dealt)
+
+
+# Number of card codes a single block of `ProbabilityTest.run_batch_probability_test`
+# may hold, this bounds the memory used by a block to a few MB
+MAX_BLOCK_CARDS = 2**22
+
+
+def get_block_size(deck: Union[StandardDeck, type], iteration_count: int) -> int:
+    """
+    How many decks can be simulated at once without exceeding `MAX_BLOCK_CARDS`
+    :param deck: <StandardDeck> instance or class
+    :param iteration_count: <int> Number of decks needed in total
+    :return: <int>
+    """
+    deck_size = max(1, len(get_deck_codes(deck)))
+    return max(1, min(iteration_count, MAX_BLOCK_CARDS // deck_size))
+
+
+def deal_blocks(
+    deck: Union[StandardDeck, type],
+    number_of_cards: int,
+    iteration_count: int,
+    block_size: Optional[int] = None,
+    rng: Union[np.random.Generator, int, None] = None,
+) -> Iterator[DealtCards]:
+    """
+    Deal `iteration_count` hands of random cards from independent decks, in
+    blocks of `block_size` hands
+    :param deck: <StandardDeck> deck class or instance to deal from
+    :param number_of_cards: <int> How many cards in a hand?
+    :param iteration_count: <int> How many hands in total?
+    :param block_size: <int> hands per block, see `get_block_size` if None
+    :param rng: <np.random.Generator> or a seed
+    :return: generator of <DealtCards>
+    """
+    rng = np.random.default_rng(rng)
+    block_size = block_size or get_block_size(deck, iteration_count)
+    remaining = iteration_count
+    while remaining > 0:
+        size = min(block_size, remaining)
+        yield DeckBatch(deck, size, rng=rng).pick_random_cards(number_of_cards)
+        remaining -= size
+
+
+def is_flush(hands: DealtCards) -> np.ndarray:
+    """
+    Are all cards of the hand of the same suit?
+    :param hands: <DealtCards>
+    :return: <np.ndarray> bool per hand
+    """
+    return (hands.suits == hands.suits[:, :1]).all(axis=1) & ~hands.is_joker.any(axis=1)
+
+
+def is_straight(hands: DealtCards) -> np.ndarray:
+    """
+    Do the card values form a sequence (Ace is low)?
+    :param hands: <DealtCards>
+    :return: <np.ndarray> bool per hand
+    """
+    values = np.sort(hands.values, axis=1)
+    return (np.diff(values, axis=1) == 1).all(axis=1) & ~hands.is_joker.any(axis=1)
+
+
+def count_values(hands: DealtCards) -> np.ndarray:
+    """
+    How many cards of each value are in the hand? Jokers are not counted.
+    :param hands: <DealtCards>
+    :return: <np.ndarray> (hands, 14) counts, column is the card value
+    """
+    values = np.arange(len(constants.CARD_VALUES_CONF) + 1)
+    counts = (hands.values[:, :, None] == values).sum(axis=1)
+    counts[:, JOKER_VALUE_INDEX] = 0
+    return counts
+
+
+def is_n_of_a_kind(hands: DealtCards, n: int) -> np.ndarray:
+    """
+    Is there a value that occurs exactly `n` times in the hand?
+    :param hands: <DealtCards>
+    :param n: <int>
+    :return: <np.ndarray> bool per hand
+    """
+    return (count_values(hands) == n).any(axis=1)
+
+
+def count_colour(hands: DealtCards, colour: str) -> np.ndarray:
+    """
+    How many cards of `colour` are in the hand?
+    :param hands: <DealtCards>
+    :param colour: <str> `constants.COLOUR_RED` or `constants.COLOUR_BLACK`
+    :return: <np.ndarray> count per hand
+    """
+    return (hands.colours == COLOUR_INDEXES[colour]).sum(axis=1)
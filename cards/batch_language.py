@@ -0,0 +1,345 @@
+import time
+from functools import lru_cache
+from typing import Optional, Union
+
+import numpy as np
+
+from . import exceptions
+from .batch import DeckBatch, get_block_size, get_deck_codes
+from .language import (
+    DECK,
+    LIST,
+    VALUE,
+    ExecutionPlan,
+    Language,
+    get_condition_mask,
+    get_condition_masks,
+)
+from .models import JOKER_CODE, NUMBER_OF_CARD_CODES, Card, EmptyDeck
+
+
+@lru_cache(maxsize=None)
+def get_mask_table(mask: int) -> np.ndarray:
+    """
+    Turn a condition bitmask into a lookup table, indexed by card code
+    """
+    return np.array(
+        [mask >> code & 1 for code in range(NUMBER_OF_CARD_CODES)], dtype=bool
+    )
+
+
+class BatchStorage(object):
+    """
+    A deck or a card list of every iteration, one row of card codes each.
+    Sequences sharing a deck share its storage. `deck_class` of a deck limits
+    which cards can be inserted to it. `shared` codes belong to another
+    sequence and are copied before they are changed in place.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        codes: np.ndarray,
+        deck_class: type = None,
+        shared: bool = False,
+    ):
+        self.kind = kind
+        self.codes = codes
+        self.deck_class = deck_class
+        self.shared = shared
+
+    def get_writable_codes(self) -> np.ndarray:
+        if self.shared:
+            self.codes = self.codes.copy()
+            self.shared = False
+        return self.codes
+
+
+class BatchExecutor(object):
+    """
+    Runs a `Language` program for many iterations at once over card code
+    arrays. Each iteration behaves like one `Language.execute`; the result of
+    a sequence is a 2-D array of card codes with one row per iteration, or a
+    bool per iteration for the match commands.
+
+    Example usage:
+    ```
+    executor = BatchExecutor(lan, rng=42)
+    successes = executor.run(result_sequence=3, size=100000)
+    ```
+    """
+
+    def __init__(
+        self,
+        program: Union[Language, ExecutionPlan],
+        rng: Union[np.random.Generator, int, None] = None,
+    ):
+        """
+        :param program: <Language> or its compiled <ExecutionPlan>
+        :param rng: <np.random.Generator> or a seed
+        """
+        self.plan = program.compile() if isinstance(program, Language) else program
+        self.rng = np.random.default_rng(rng)
+        for step in self.plan.steps:
+            if not hasattr(self, "batch_" + step.command):
+                raise exceptions.UnsupportedCommand(
+                    f"{step.command} is not supported by the batch backend"
+                )
+
+    def execute(self, result_sequence: int, size: int) -> dict:
+        """
+        Run `size` iterations of the steps `result_sequence` depends on
+        :param result_sequence: <int>
+        :param size: <int> number of iterations
+        :return: <dict> sequence number -> <BatchStorage>, for the sequences
+            still needed at the end of the program
+        """
+        schedule = self.plan.get_schedule(result_sequence)
+        results = {}
+        # The deterministic prefix is cheap on arrays, run all of it for
+        # every block and keep what the schedule needs
+        for step in self.plan.steps[: self.plan.prefix_length]:
+            results[step.sequence] = self._run_step(step, results, size)
+        results = {
+            sequence: results[sequence] for sequence in schedule.prefix_sequences
+        }
+        for step, released in schedule.steps:
+            results[step.sequence] = self._run_step(step, results, size)
+            for sequence in released:
+                results.pop(sequence, None)
+        return results
+
+    def _run_step(self, step, results: dict, size: int) -> BatchStorage:
+        sources = [results[source] for source in step.sources]
+        run = getattr(self, "batch_" + step.command)
+        tracer = self.plan.tracer
+        if tracer is None:
+            return run(size, *sources, **step.meta)
+
+        # A call runs the step for a whole block of iterations
+        start = time.perf_counter()
+        result = run(size, *sources, **step.meta)
+        tracer.record(step.sequence, step.command, time.perf_counter() - start)
+        return result
+
+    def run(self, result_sequence: int, size: int) -> np.ndarray:
+        """
+        Run `size` iterations and evaluate the result of `result_sequence`
+        like `bool(results[result_sequence])` would in each of them
+        :param result_sequence: <int>
+        :param size: <int> number of iterations
+        :return: <np.ndarray> bool per iteration
+        """
+        result = self.execute(result_sequence, size)[result_sequence]
+        if result.kind == DECK:
+            # A deck object is always true
+            return np.ones(size, dtype=bool)
+        if result.codes.dtype == bool:
+            return result.codes
+        return np.full(size, result.codes.shape[1] > 0)
+
+    def _get_deck_for_picking(self, source: BatchStorage) -> BatchStorage:
+        if source.kind == DECK:
+            return source
+        # Lists are used as a deck without copying them, like
+        # `Language._get_deck_for_picking`
+        return BatchStorage(DECK, source.codes, EmptyDeck, shared=True)
+
+    def _insert(
+        self,
+        deck: BatchStorage,
+        inserted: np.ndarray,
+        force: bool,
+        random_positions: bool,
+    ) -> None:
+        """
+        Insert a column of card codes per inserted card to every row of the
+        deck, see `StandardDeck.insert_cards`
+        """
+        codes = deck.codes
+        if not force:
+            deck_class = deck.deck_class
+            capacity = (
+                deck_class.NUMBER_OF_NON_JOKER_CARDS + deck_class.NUMBER_OF_JOKERS
+            )
+            if codes.shape[1] + inserted.shape[1] > capacity:
+                raise exceptions.DeckFullException()
+            for code in np.unique(inserted):
+                limit = (
+                    deck_class.NUMBER_OF_JOKERS
+                    if code == JOKER_CODE
+                    else deck_class.EACH_NON_JOKER_CARD_OCCURS
+                )
+                occurrences = (codes == code).sum(axis=1) + (inserted == code).sum(
+                    axis=1
+                )
+                if (occurrences > limit).any():
+                    raise exceptions.IncorrectDeckException(
+                        "Card `{}` is already in the deck".format(Card.from_code(code))
+                    )
+
+        start = codes.shape[1]
+        codes = np.concatenate([codes, inserted], axis=1)
+        if random_positions:
+            rows = np.arange(len(codes))
+            for column in range(start, codes.shape[1]):
+                idx = self.rng.integers(0, column + 1, size=len(codes))
+                card = codes[:, column].copy()
+                codes[:, column] = codes[rows, idx]
+                codes[rows, idx] = card
+        deck.codes = codes
+
+    def batch_init_deck(self, size: int, deck_type: str) -> BatchStorage:
+        deck_class = Language.DECK_TYPES[deck_type]
+        codes = get_deck_codes(deck_class)
+        return BatchStorage(DECK, np.tile(codes, (size, 1)), deck_class)
+
+    def batch_shuffle(self, size: int, source: BatchStorage, sequence: int):
+        deck = self._get_deck_for_picking(source)
+        deck.codes = self.rng.permuted(deck.codes, axis=1)
+        return deck
+
+    def batch_pick_random_cards(
+        self, size: int, source: BatchStorage, count: int, from_sequence: int
+    ) -> BatchStorage:
+        deck = self._get_deck_for_picking(source)
+        batch = DeckBatch.from_codes(deck.get_writable_codes(), rng=self.rng)
+        picked = batch.pick_random_cards(count)
+        deck.codes = batch.codes
+        return BatchStorage(LIST, picked.codes)
+
+    def batch_pick_specific_cards(
+        self, size: int, source: BatchStorage, cards: list, from_sequence: int
+    ) -> BatchStorage:
+        deck = self._get_deck_for_picking(source)
+        codes = deck.codes
+        picked = []
+        for card in cards:
+            code = Card(value=card["value"], suit=card["suit"]).code
+            matches = codes == code
+            if code is None or not matches.any(axis=1).all():
+                raise exceptions.CardIsNotInTheDeck()
+            # Remove the first occurrence from every row
+            first = np.zeros_like(matches)
+            first[np.arange(len(codes)), matches.argmax(axis=1)] = True
+            codes = codes[~first].reshape(len(codes), codes.shape[1] - 1)
+            picked.append(code)
+        deck.codes = codes
+        return BatchStorage(LIST, np.tile(np.array(picked, dtype=np.int8), (size, 1)))
+
+    def batch_insert_specific_cards(
+        self,
+        size: int,
+        source: BatchStorage,
+        cards: list,
+        to_sequence: int,
+        force: bool = False,
+        random_positions: bool = False,
+    ) -> BatchStorage:
+        codes = [Card(value=card["value"], suit=card["suit"]).code for card in cards]
+        if None in codes:
+            raise exceptions.UnsupportedAction(
+                "Only cards of the known decks can be inserted in a batch"
+            )
+        deck = self._get_deck_for_picking(source)
+        inserted = np.tile(np.array(codes, dtype=np.int8), (size, 1))
+        self._insert(deck, inserted, force, random_positions)
+        return deck
+
+    def batch_insert_random_cards(
+        self,
+        size: int,
+        from_source: BatchStorage,
+        to_source: BatchStorage,
+        count: int,
+        from_sequence: int,
+        to_sequence: int,
+        force: bool = False,
+    ) -> BatchStorage:
+        picked = self.batch_pick_random_cards(size, from_source, count, from_sequence)
+        deck = self._get_deck_for_picking(to_source)
+        self._insert(deck, picked.codes, force, True)
+        return deck
+
+    @staticmethod
+    def _get_codes(source: BatchStorage) -> np.ndarray:
+        if source.kind == VALUE:
+            raise exceptions.BadSource("This sequence doesn't have any cards")
+        return source.codes
+
+    def batch_any_match(
+        self,
+        size: int,
+        source: BatchStorage,
+        conditions: list,
+        from_sequence: int,
+        matches_required: int = 1,
+    ) -> BatchStorage:
+        mask = 0
+        for condition in conditions:
+            mask |= get_condition_mask(condition)
+        matched = get_mask_table(mask)[self._get_codes(source)]
+        return BatchStorage(VALUE, matched.sum(axis=1) >= matches_required)
+
+    def batch_all_match(
+        self, size: int, source: BatchStorage, conditions: list, from_sequence: int
+    ) -> BatchStorage:
+        codes = self._get_codes(source)
+        result = np.ones(size, dtype=bool)
+        for condition in conditions:
+            for mask, count in get_condition_masks(condition):
+                result &= get_mask_table(mask)[codes].sum(axis=1) >= count
+        return BatchStorage(VALUE, result)
+
+    def batch_order_match(
+        self, size: int, source: BatchStorage, conditions: list, from_sequence: int
+    ) -> BatchStorage:
+        codes = self._get_codes(source)
+        result = np.full(size, codes.shape[1] >= len(conditions))
+        if result.any():
+            for idx, condition in enumerate(conditions):
+                table = get_mask_table(get_condition_mask(condition))
+                result &= table[codes[:, idx]]
+        return BatchStorage(VALUE, result)
+
+
+def count_successes(
+    program: Union[Language, ExecutionPlan],
+    result_sequence: int,
+    iteration_count: int,
+    rng: Union[np.random.Generator, int, None] = None,
+    block_size: Optional[int] = None,
+) -> int:
+    """
+    Count iterations of a program whose `result_sequence` is true, running
+    them in blocks of `block_size` iterations
+    :param program: <Language> or its compiled <ExecutionPlan>
+    :param result_sequence: <int>
+    :param iteration_count: <int>
+    :param rng: <np.random.Generator> or a seed
+    :param block_size: <int> iterations per block, sized by the largest deck
+        of the program if None
+    :return: <int>
+    """
+    executor = BatchExecutor(program, rng=rng)
+    if block_size is None:
+        largest_deck = max(
+            [
+                Language.DECK_TYPES[step.meta["deck_type"]]
+                for step in executor.plan.steps
+                if step.command == "init_deck"
+            ],
+            key=lambda deck_class: len(deck_class._get_template().cards),
+            default=None,
+        )
+        block_size = iteration_count
+        if largest_deck is not None:
+            block_size = get_block_size(largest_deck, iteration_count)
+
+    successful_runs = 0
+    remaining = iteration_count
+    while remaining > 0:
+        size = min(block_size, remaining)
+        successful_runs += int(np.count_nonzero(executor.run(result_sequence, size)))
+        remaining -= size
+    return successful_runs
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from . import exceptions
+from .models import ProbabilityTest
+
+
+class ResultCache(object):
+    """
+    Persistent cache of `Language` probability test results, stored in a
+    sqlite database.
+
+    Results are keyed by a hash of the program (its sequence list), the
+    result sequence, the seed and the test arguments. The iteration count is
+    not part of the key, it is a target: a cached result with at least as many
+    iterations is a hit, a smaller one is topped up with the missing
+    iterations and merged. The least recently used results are evicted once
+    there are more than `max_entries`.
+
+    A cache can be shared by threads, its connection is used by one thread at
+    a time. Runs of the same question wait for each other, so the same
+    iterations are never counted twice.
+
+    Example usage:
+    ```
+    cache = ResultCache("results.sqlite3")
+    result = ProbabilityTest.run_language_probability_test(
+        lan.execute, result_sequence=3, cache=cache
+    )
+    ```
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        """
+        :param path: <str> sqlite database file, ":memory:" for a throwaway one
+        :param max_entries: <int> How many results to keep?
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.merges = 0
+        self._lock = threading.Lock()
+        # Key -> (lock, number of threads using it)
+        self._key_locks = {}
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, successes INTEGER, iterations INTEGER, "
+            "last_used INTEGER)"
+        )
+        self.connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    @property
+    def stats(self) -> dict:
+        """
+        Cache usage of this instance
+        :return: <dict> hits, misses (nothing cached) and merges (topped up)
+        """
+        return {"hits": self.hits, "misses": self.misses, "merges": self.merges}
+
+    @staticmethod
+    def make_key(
+        sequences: list,
+        result_sequence: int,
+        seed: Optional[int] = None,
+        kwargs: Optional[dict] = None,
+    ) -> str:
+        """
+        Canonical hash of a probability question
+        :param sequences: <list> `Language` sequence list
+        :param result_sequence: <int>
+        :param seed: <int>
+        :param kwargs: <dict> test arguments, they must be JSON serializable
+        :return: <str>
+        """
+        try:
+            canonical = json.dumps(
+                {
+                    "sequences": sequences,
+                    "result_sequence": result_sequence,
+                    "seed": seed,
+                    "kwargs": kwargs or {},
+                },
+                sort_keys=True,
+                separators=(",", ":"),
+            )
+        except (TypeError, ValueError) as e:
+            raise exceptions.UnsupportedAction(
+                f"Only JSON serializable questions can be cached: {e}"
+            )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def lock_key(self, key: str) -> Iterator[None]:
+        """
+        Hold the lock of one key, e.g. while a result is read, topped up and
+        added
+        :param key: <str>
+        """
+        with self._lock:
+            lock, users = self._key_locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._key_locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._key_locks[key]
+                if users == 1:
+                    del self._key_locks[key]
+                else:
+                    self._key_locks[key] = (lock, users - 1)
+
+    def get(self, key: str) -> Optional[tuple]:
+        """
+        :param key: <str>
+        :return: <(int, int)> successes and iterations, None if not cached
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT successes, iterations FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?",
+                (time.time_ns(), key),
+            )
+            self.connection.commit()
+            return row
+
+    def add(self, key: str, successes: int, iterations: int) -> None:
+        """
+        Merge new iterations into the cached result
+        :param key: <str>
+        :param successes: <int>
+        :param iterations: <int>
+        """
+        with self._lock:
+            self.connection.execute(
+                "INSERT INTO results (key, successes, iterations, last_used) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                "successes = successes + excluded.successes, "
+                "iterations = iterations + excluded.iterations, "
+                "last_used = excluded.last_used",
+                (key, successes, iterations, time.time_ns()),
+            )
+            self.connection.execute(
+                "DELETE FROM results WHERE key NOT IN "
+                "(SELECT key FROM results ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self.connection.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.connection.execute("DELETE FROM results")
+            self.connection.commit()
+
+    def run_language_probability_test(
+        self,
+        test_func,
+        result_sequence: int,
+        iteration_count: int = 20000,
+        workers: Optional[int] = None,
+        seed: Optional[int] = None,
+        backend: str = "scalar",
+        block_size: Optional[int] = None,
+        **kwargs,
+    ) -> float:
+        """
+        Cached version of `ProbabilityTest.run_language_probability_test`
+        :param test_func: <function> `execute` of a `Language` program
+        :return: <float> Percentage of chance of test happening
+        """
+        program = getattr(test_func, "__self__", None)
+        if not hasattr(program, "sequences"):
+            raise exceptions.UnsupportedAction(
+                "Only `Language` programs can be cached, pass `lan.execute`"
+            )
+
+        key_kwargs = kwargs
+        if backend != "scalar":
+            # Seeded runs of the backends draw different cards
+            key_kwargs = dict(kwargs, backend=backend)
+        key = self.make_key(program.sequences, result_sequence, seed, key_kwargs)
+        # Held until the new iterations are added, so a run of the same
+        # question in another thread doesn't count the same iterations again
+        with self.lock_key(key):
+            successes, iterations = self.get(key) or (0, 0)
+            if iterations >= iteration_count:
+                with self._lock:
+                    self.hits += 1
+                return ProbabilityTest._get_percentage(successes, iterations)
+
+            if iterations:
+                with self._lock:
+                    self.merges += 1
+                if seed is not None:
+                    # Topping up must not repeat the iterations we already have
+                    seed = random.Random(f"{seed}-{iterations}").getrandbits(64)
+            else:
+                with self._lock:
+                    self.misses += 1
+
+            missing = iteration_count - iterations
+            new_successes = ProbabilityTest._count_language_successes(
+                test_func,
+                result_sequence,
+                missing,
+                kwargs,
+                workers=workers,
+                seed=seed,
+                backend=backend,
+                block_size=block_size,
+            )
+            self.add(key, new_successes, missing)
+            return ProbabilityTest._get_percentage(
+                successes + new_successes, iteration_count
+            )
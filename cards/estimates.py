@@ -0,0 +1,290 @@
+import math
+from dataclasses import dataclass
+from statistics import NormalDist
+
+
+def wilson_interval(successes: int, iterations: int, confidence: float) -> tuple:
+    """
+    Wilson score interval of a binomial proportion
+    :param successes: <int>
+    :param iterations: <int>
+    :param confidence: <float> e.g. 0.95
+    :return: <(float, float)> lower and upper bound, as probabilities
+    """
+    if iterations == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / iterations
+    denominator = 1 + z * z / iterations
+    centre = (p + z * z / (2 * iterations)) / denominator
+    margin = (
+        z
+        * math.sqrt(p * (1 - p) / iterations + z * z / (4 * iterations * iterations))
+        / denominator
+    )
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def _beta_continued_fraction(a: float, b: float, x: float) -> float:
+    # Lentz's method, see Numerical Recipes 6.4
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 1000):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1.0) < 1e-15:
+            break
+    return fraction
+
+
+def regularized_beta(a: float, b: float, x: float) -> float:
+    """
+    Regularized incomplete beta function I_x(a, b), i.e. CDF of Beta(a, b)
+    """
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = (
+        math.lgamma(a + b)
+        - math.lgamma(a)
+        - math.lgamma(b)
+        + a * math.log(x)
+        + b * math.log1p(-x)
+    )
+    if x < (a + 1) / (a + b + 2):
+        return math.exp(log_front) * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _beta_continued_fraction(b, a, 1.0 - x) / b
+
+
+def beta_quantile(q: float, a: float, b: float) -> float:
+    """
+    Inverse of `regularized_beta`, found by bisection
+    """
+    lower, upper = 0.0, 1.0
+    for _ in range(100):
+        middle = (lower + upper) / 2
+        if regularized_beta(a, b, middle) < q:
+            lower = middle
+        else:
+            upper = middle
+    return (lower + upper) / 2
+
+
+def clopper_pearson_interval(
+    successes: int, iterations: int, confidence: float
+) -> tuple:
+    """
+    Exact (Clopper-Pearson) interval of a binomial proportion
+    :param successes: <int>
+    :param iterations: <int>
+    :param confidence: <float> e.g. 0.95
+    :return: <(float, float)> lower and upper bound, as probabilities
+    """
+    alpha = 1 - confidence
+    lower = 0.0
+    upper = 1.0
+    if successes > 0:
+        lower = beta_quantile(alpha / 2, successes, iterations - successes + 1)
+    if successes < iterations:
+        upper = beta_quantile(1 - alpha / 2, successes + 1, iterations - successes)
+    return lower, upper
+
+
+INTERVAL_METHODS = {
+    "wilson": wilson_interval,
+    "clopper_pearson": clopper_pearson_interval,
+}
+
+
+@dataclass(frozen=True)
+class ProbabilityResult:
+    """
+    Outcome of a probability test. `estimate` and `interval` are percentages,
+    like the results of the other `ProbabilityTest` runners.
+    """
+
+    successes: int
+    iterations: int
+    interval: tuple
+    confidence: float
+    elapsed: float
+
+    @property
+    def estimate(self) -> float:
+        if self.iterations == 0:
+            return 0.0
+        return self.successes / self.iterations * 100
+
+    @property
+    def half_width(self) -> float:
+        return (self.interval[1] - self.interval[0]) / 2
+
+    @property
+    def iterations_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return self.iterations / self.elapsed
+
+    @classmethod
+    def from_counts(
+        cls,
+        successes: int,
+        iterations: int,
+        confidence: float = 0.95,
+        method: str = "wilson",
+        elapsed: float = 0.0,
+    ) -> "ProbabilityResult":
+        """
+        :param successes: <int> Number of times desired event happened
+        :param iterations: <int> Number of times we've tried
+        :param confidence: <float> confidence level of the interval
+        :param method: <str> one of `INTERVAL_METHODS`
+        :param elapsed: <float> seconds it took to get the counts
+        :return: <ProbabilityResult>
+        """
+        lower, upper = INTERVAL_METHODS[method](successes, iterations, confidence)
+        return cls(
+            successes=successes,
+            iterations=iterations,
+            interval=(lower * 100, upper * 100),
+            confidence=confidence,
+            elapsed=elapsed,
+        )
+
+
+@dataclass(frozen=True)
+class WeightedProbabilityResult:
+    """
+    Outcome of a probability test whose iterations are weighted, e.g. by
+    importance or stratified sampling, so there is no plain success count.
+    `estimate`, `standard_error` and `interval` are percentages.
+    """
+
+    estimate: float
+    variance: float
+    iterations: int
+    interval: tuple
+    confidence: float
+    elapsed: float
+
+    @property
+    def standard_error(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def half_width(self) -> float:
+        return (self.interval[1] - self.interval[0]) / 2
+
+    @classmethod
+    def from_estimate(
+        cls,
+        probability: float,
+        variance: float,
+        iterations: int,
+        confidence: float = 0.95,
+        elapsed: float = 0.0,
+    ) -> "WeightedProbabilityResult":
+        """
+        :param probability: <float> unbiased estimate of the probability
+        :param variance: <float> variance of the estimate
+        :param iterations: <int> Number of times we've tried
+        :param confidence: <float> confidence level of the normal interval
+        :param elapsed: <float> seconds it took to get the estimate
+        :return: <WeightedProbabilityResult>
+        """
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        margin = z * math.sqrt(variance)
+        return cls(
+            estimate=probability * 100,
+            variance=variance * 100 * 100,
+            iterations=iterations,
+            interval=(
+                max(0.0, probability - margin) * 100,
+                min(1.0, probability + margin) * 100,
+            ),
+            confidence=confidence,
+            elapsed=elapsed,
+        )
+
+
+@dataclass(frozen=True)
+class MultiProbabilityResult:
+    """
+    Outcome of several questions asked about the same simulated deals.
+    `results` are the `ProbabilityResult` of every question and `correlation`
+    the correlation (phi coefficient) of every pair of answers, NaN when an
+    answer never changes.
+    """
+
+    results: dict
+    correlation: dict
+    iterations: int
+    elapsed: float
+
+    def __getitem__(self, name: str) -> ProbabilityResult:
+        return self.results[name]
+
+    @classmethod
+    def from_counts(
+        cls,
+        names: list,
+        joint_counts: list,
+        iterations: int,
+        confidence: float = 0.95,
+        method: str = "wilson",
+        elapsed: float = 0.0,
+    ) -> "MultiProbabilityResult":
+        """
+        :param names: <str[]> names of the questions
+        :param joint_counts: <int[][]> how many times questions i and j were
+            both true, the diagonal are the success counts
+        :param iterations: <int> Number of deals
+        :param confidence: <float> confidence level of the intervals
+        :param method: <str> one of `INTERVAL_METHODS`
+        :param elapsed: <float> seconds it took to get the counts
+        :return: <MultiProbabilityResult>
+        """
+        results = {
+            name: ProbabilityResult.from_counts(
+                joint_counts[idx][idx],
+                iterations,
+                confidence=confidence,
+                method=method,
+                elapsed=elapsed,
+            )
+            for idx, name in enumerate(names)
+        }
+        correlation = {}
+        for i, first in enumerate(names):
+            for j, second in enumerate(names):
+                first_count = joint_counts[i][i]
+                second_count = joint_counts[j][j]
+                spread = math.sqrt(
+                    first_count
+                    * (iterations - first_count)
+                    * second_count
+                    * (iterations - second_count)
+                )
+                correlation[first, second] = (
+                    (iterations * joint_counts[i][j] - first_count * second_count)
+                    / spread
+                    if spread
+                    else math.nan
+                )
+        return cls(
+            results=results,
+            correlation=correlation,
+            iterations=iterations,
+            elapsed=elapsed,
+        )
@@ -0,0 +1,116 @@
+from collections import Counter
+from fractions import Fraction
+from math import comb
+from typing import Callable, Union
+
+from . import exceptions
+from .models import Card, StandardDeck
+
+
+def by_colour(card: Card) -> str:
+    """
+    Group cards by colour, jokers are "*"
+    """
+    return card.colour
+
+
+def by_suit(card: Card) -> str:
+    """
+    Group cards by suit, jokers are `constants.JOKER_SUIT`
+    """
+    return card.suit
+
+
+def by_value(card: Card) -> Union[int, str]:
+    """
+    Group cards by value, jokers are `constants.JOKER_VALUE`
+    """
+    return card.value
+
+
+def by_joker(card: Card) -> bool:
+    """
+    Group cards into jokers (True) and the rest (False)
+    """
+    return card.is_joker
+
+
+def get_composition(deck: Union[StandardDeck, type], key: Callable) -> Counter:
+    """
+    How many cards of each group are in the deck?
+    :param deck: <StandardDeck> deck class or a deck instance in its current state
+    :param key: <function> Card -> group
+    :return: <Counter> group -> number of cards
+    """
+    if isinstance(deck, type):
+        card_counts = deck._get_template().card_counts
+    else:
+        card_counts = deck._get_card_counts()
+
+    composition = Counter()
+    for card, occurrences in card_counts.items():
+        if occurrences:
+            composition[key(card)] += occurrences
+    return composition
+
+
+def _iter_hands(sizes: list, number_of_cards: int):
+    """
+    Yield (counts, ways) for every way of splitting `number_of_cards` between
+    groups of the given sizes, with the number of hands having those counts
+    """
+    if not sizes:
+        if number_of_cards == 0:
+            yield (), 1
+        return
+
+    size, rest = sizes[0], sizes[1:]
+    rest_capacity = sum(rest)
+    for count in range(
+        max(0, number_of_cards - rest_capacity), min(size, number_of_cards) + 1
+    ):
+        ways = comb(size, count)
+        for counts, rest_ways in _iter_hands(rest, number_of_cards - count):
+            yield (count,) + counts, ways * rest_ways
+
+
+def probability(
+    deck: Union[StandardDeck, type],
+    number_of_cards: int,
+    predicate: Callable,
+    key: Callable = by_colour,
+) -> Fraction:
+    """
+    Exact probability that `number_of_cards` cards drawn without replacement
+    from the deck satisfy `predicate`.
+
+    Cards are grouped by `key` and the predicate gets a Counter with the number
+    of drawn cards in each group, so it can only look at counts, not at
+    individual cards. Every possible split of the hand between the groups is
+    weighted by its multivariate hypergeometric probability, so the cost
+    depends on the number of groups, not on the number of hands.
+
+    :param deck: <StandardDeck> deck class or a deck instance in its current state
+    :param number_of_cards: <int> How many cards are drawn?
+    :param predicate: <function> Counter -> bool
+    :param key: <function> Card -> group, e.g. `by_colour`, `by_suit`
+    :return: <Fraction>
+
+    Example usage:
+    ```
+    # Chance of at least one joker in 3 cards, ~11.1%
+    probability(JokerDeck, 3, lambda drawn: drawn[True] >= 1, key=by_joker)
+    ```
+    """
+    composition = get_composition(deck, key)
+    total = sum(composition.values())
+    if number_of_cards > total:
+        raise exceptions.NotEnoughCardsException()
+
+    groups = list(composition)
+    sizes = [composition[group] for group in groups]
+    successful_hands = 0
+    for counts, ways in _iter_hands(sizes, number_of_cards):
+        if predicate(Counter(dict(zip(groups, counts)))):
+            successful_hands += ways
+    return Fraction(successful_hands, comb(total, number_of_cards))
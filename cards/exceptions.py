@@ -28,3 +28,7 @@ class UnsupportedCommand(Exception):
 
 class BadSource(Exception):
     pass
+
+
+class UnsupportedCondition(Exception):
+    pass
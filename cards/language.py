@@ -1,17 +1,399 @@
-from typing import Union, Iterable
+import copy
+import operator
+import threading
+from typing import Callable, Iterable, NamedTuple, Optional, Union
 
 from .exceptions import (
     UnsupportedCommand,
+    UnsupportedCondition,
     UnsupportedDeckType,
     BadSource,
 )
-from .models import EmptyDeck, StandardDeck, StandardDeckWithJokers, JokerDeck, Card
+from .models import (
+    CARDS,
+    DeckView,
+    EmptyDeck,
+    StandardDeck,
+    StandardDeckWithJokers,
+    JokerDeck,
+    Card,
+)
 
 
-class Language(object):
-    sequence_results = {}
+DECK = "deck"
+LIST = "list"
+VALUE = "value"
+
+# Condition type -> the attribute of a card it looks at
+CONDITION_TYPES = {
+    "colours": lambda card: card.colour,
+    "suits": lambda card: card.suit,
+    "values": lambda card: card.value,
+    "specific_cards": lambda card: {"value": card.value, "suit": card.suit},
+}
+
+
+def get_condition_mask(condition: dict) -> int:
+    """
+    Compile a match condition, e.g. `{"type": "suits", "values": ["hearts"]}`,
+    into a bitmask of the codes of the cards matching any of its values
+    :param condition: <dict>
+    :return: <int>
+    """
+    get_attribute = CONDITION_TYPES.get(condition.get("type"))
+    if get_attribute is None:
+        raise UnsupportedCondition(f"{condition.get('type')} is not supported")
+    values = condition["values"]
+    mask = 0
+    for card in CARDS:
+        if get_attribute(card) in values:
+            mask |= 1 << card.code
+    return mask
+
+
+def get_condition_masks(condition: dict) -> list:
+    """
+    Compile a condition into one (bitmask, count) pair per distinct value,
+    a card can only match one of them
+    :param condition: <dict>
+    :return: <[(int, int)]>
+    """
+    masks = []
+    values = []
+    for value in condition["values"]:
+        if value in values:
+            continue
+        values.append(value)
+        mask = get_condition_mask({"type": condition["type"], "values": [value]})
+        masks.append((mask, condition["values"].count(value)))
+    return masks
+
+
+class CommandInfo(NamedTuple):
+    """
+    How a command uses other sequences:
+    - `sources`: meta keys referencing other sequences
+    - `result`: kind of the result, `DECK`, `LIST` or `VALUE`
+    - `deterministic`: the result depends only on the sources
+    - `mutates_sources`: deck sources are changed in place
+    - `returns_source`: meta key of the source deck that is returned as the
+      result (list sources are turned into a new deck instead)
+    """
+
+    sources: tuple = ()
+    result: str = DECK
+    deterministic: bool = False
+    mutates_sources: bool = False
+    returns_source: Optional[str] = None
+
+
+class CompiledStep(object):
+    """
+    One sequence of a program, validated and bound to its arguments.
+    `run` takes the results of the previous sequences and returns the result
+    of this one. `sources` are the numbers of the sequences it reads.
+    """
+
+    __slots__ = (
+        "sequence",
+        "command",
+        "meta",
+        "run",
+        "info",
+        "sources",
+        "returns_source",
+    )
+
+    def __init__(
+        self,
+        sequence: int,
+        command: str,
+        meta: dict,
+        run: Callable,
+        info: CommandInfo,
+        sources: tuple = (),
+        returns_source: Optional[int] = None,
+    ):
+        self.sequence = sequence
+        self.command = command
+        self.meta = meta
+        self.run = run
+        self.info = info
+        self.sources = sources
+        self.returns_source = returns_source
+
+    @property
+    def deterministic(self) -> bool:
+        return self.info.deterministic
+
+
+def clone_results(results: dict) -> dict:
+    """
+    Copy results of a program so they can be changed without affecting the
+    originals. Sequences sharing a deck keep sharing its copy.
+    :param results: <dict> sequence number -> result
+    :return: <dict>
+    """
+    clones = {}
+    cloned_results = {}
+    for sequence, result in results.items():
+        clone = clones.get(id(result))
+        if clone is None:
+            if isinstance(result, StandardDeck):
+                clone = result.fork()
+            elif isinstance(result, list):
+                clone = list(result)
+            else:
+                clone = result
+            clones[id(result)] = clone
+        cloned_results[sequence] = clone
+    return cloned_results
+
+
+class Schedule(NamedTuple):
+    """
+    What has to run to get the result of one sequence, see
+    `ExecutionPlan.get_schedule`
+    """
+
+    # Sequences of the deterministic prefix that are still needed
+    prefix_sequences: tuple
+    # (step, sequences that are not needed once the step has run)
+    steps: tuple
+
+
+class ExecutionPlan(object):
+    """
+    Compiled `Language` program, see `Language.compile`.
+
+    The leading deterministic steps of the program (e.g. `init_deck` and
+    `pick_specific_cards` from it) give the same results on every execution,
+    so they are only run once. Each execution starts from a copy of their
+    results and runs the remaining steps.
+
+    When only the result of one sequence is wanted, steps it doesn't depend
+    on are skipped and results are dropped as soon as no other step needs
+    them, see `get_schedule`.
+    """
+
+    def __init__(self, steps: list):
+        self.steps = steps
+        self.prefix_length = 0
+        for step in steps:
+            if not step.deterministic:
+                break
+            self.prefix_length += 1
+        if all(step.command == "init_deck" for step in steps[: self.prefix_length]):
+            # A new deck is built from its class template, which is as cheap as
+            # cloning it, so there is nothing to gain
+            self.prefix_length = 0
+        self.tracer = None
+        self._prefix_results = None
+        self._remaining_steps = steps[self.prefix_length :]
+        self._schedules = {}
+        self._lock = threading.Lock()
+        self._analyse_storage()
+
+    def with_tracer(self, tracer) -> "ExecutionPlan":
+        """
+        Copy of the plan recording every step it runs
+        :param tracer: <StepTracer> see `tracing.StepTracer`
+        :return: <ExecutionPlan>
+        """
+        plan = ExecutionPlan(
+            [
+                CompiledStep(
+                    step.sequence,
+                    step.command,
+                    step.meta,
+                    tracer.wrap(step),
+                    step.info,
+                    sources=step.sources,
+                    returns_source=step.returns_source,
+                )
+                for step in self.steps
+            ]
+        )
+        plan.tracer = tracer
+        return plan
+
+    def _analyse_storage(self) -> None:
+        """
+        Work out which steps create, read and change each deck or card list.
+        Decks are changed in place and some commands return their source deck,
+        so several sequences can share one storage.
+        """
+        self._storage = {}  # sequence -> storage
+        self._creator = []  # storage -> index of the step creating it
+        self._writers = []  # storage -> indexes of steps changing it
+        self._reads = []  # step index -> storages it reads
+        kinds = []
+        for idx, step in enumerate(self.steps):
+            reads = tuple(self._storage[source] for source in step.sources)
+            self._reads.append(reads)
+            if step.info.mutates_sources:
+                for storage in set(reads):
+                    if kinds[storage] == DECK:
+                        self._writers[storage].append(idx)
+
+            if (
+                step.returns_source is not None
+                and kinds[self._storage[step.returns_source]] == DECK
+            ):
+                self._storage[step.sequence] = self._storage[step.returns_source]
+            else:
+                self._storage[step.sequence] = len(kinds)
+                kinds.append(step.info.result)
+                self._creator.append(idx)
+                self._writers.append([])
+
+    def get_schedule(self, result_sequence: int) -> Schedule:
+        """
+        Find the steps the result of `result_sequence` depends on, and when
+        the results of the other sequences can be dropped.
+
+        A step depends on the steps creating the decks / lists it reads and on
+        the earlier steps changing them. The wanted result depends on every
+        step changing its storage, as its final state is returned.
+        :param result_sequence: <int>
+        :return: <Schedule>
+        """
+        schedule = self._schedules.get(result_sequence)
+        if schedule is not None:
+            return schedule
+        with self._lock:
+            schedule = self._build_schedule(result_sequence)
+            self._schedules[result_sequence] = schedule
+        return schedule
+
+    def _build_schedule(self, result_sequence: int) -> Schedule:
+        if result_sequence not in self._storage:
+            raise BadSource(f"There is no sequence {result_sequence}")
+
+        target = self._storage[result_sequence]
+        pending = [result_sequence - 1, self._creator[target]]
+        pending += self._writers[target]
+        needed = set()
+        while pending:
+            idx = pending.pop()
+            if idx in needed:
+                continue
+            needed.add(idx)
+            for storage in self._reads[idx]:
+                pending.append(self._creator[storage])
+                pending += [writer for writer in self._writers[storage] if writer < idx]
+
+        needed_steps = [idx for idx in sorted(needed) if idx >= self.prefix_length]
+        last_use = {}
+        for idx in needed_steps:
+            for storage in self._reads[idx] + (self._storage[idx + 1],):
+                last_use[storage] = idx
+        last_use[target] = len(self.steps)
+
+        prefix_sequences = tuple(
+            sequence
+            for sequence in range(1, self.prefix_length + 1)
+            if self._storage[sequence] in last_use
+        )
+        steps = tuple(
+            (
+                self.steps[idx],
+                tuple(
+                    sequence
+                    for sequence, storage in self._storage.items()
+                    if last_use.get(storage) == idx and sequence <= idx + 1
+                ),
+            )
+            for idx in needed_steps
+        )
+        return Schedule(prefix_sequences, steps)
+
+    def _get_prefix_results(self) -> dict:
+        if self._prefix_results is None:
+            with self._lock:
+                if self._prefix_results is None:
+                    results = {}
+                    for step in self.steps[: self.prefix_length]:
+                        results[step.sequence] = step.run(results)
+                    self._prefix_results = results
+        return self._prefix_results
+
+    def execute(self, result_sequence: Optional[int] = None) -> "ExecutionContext":
+        """
+        Run the program once. All state of the run lives in the returned
+        context, so a plan can be executed from several threads at once.
+        :param result_sequence: <int> only the result of this sequence is
+            needed, skip everything it doesn't depend on
+        :return: <ExecutionContext> sequence number -> result
+        """
+        if result_sequence is not None:
+            return self._execute_schedule(self.get_schedule(result_sequence))
+
+        context = ExecutionContext()
+        if self.prefix_length:
+            context.update(clone_results(self._get_prefix_results()))
+        for step in self._remaining_steps:
+            context.current_sequence = step.sequence
+            context[step.sequence] = step.run(context)
+        context.current_sequence = None
+        return context
+
+    def _execute_schedule(self, schedule: Schedule) -> "ExecutionContext":
+        context = ExecutionContext()
+        if schedule.prefix_sequences:
+            prefix_results = self._get_prefix_results()
+            context.update(
+                clone_results(
+                    {
+                        sequence: prefix_results[sequence]
+                        for sequence in schedule.prefix_sequences
+                    }
+                )
+            )
+        for step, released in schedule.steps:
+            context.current_sequence = step.sequence
+            context[step.sequence] = step.run(context)
+            for sequence in released:
+                context.pop(sequence, None)
+        context.current_sequence = None
+        return context
+
+
+class ExecutionContext(dict):
+    """
+    State of one execution of a program: results by sequence number and the
+    sequence being executed (None once the execution is finished)
+    """
+
     current_sequence = None
 
+
+class ProgramTask(object):
+    """
+    Test function running the steps of a program one result depends on,
+    see `ExecutionPlan.execute`. It is compiled once and can be sent to
+    worker processes, which compile it again on first use, so every process
+    runs the same pruned plan and draws the same cards for a seed.
+    """
+
+    def __init__(self, program: "Language", result_sequence: int):
+        self.program = program
+        self.result_sequence = result_sequence
+        self._plan = program.compile()
+
+    def __getstate__(self):
+        return {"program": self.program, "result_sequence": self.result_sequence}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, _plan=None)
+
+    def __call__(self) -> ExecutionContext:
+        if self._plan is None:
+            self._plan = self.program.compile()
+        return self._plan.execute(self.result_sequence)
+
+
+class Language(object):
     AVAILABLE_COMMANDS = [
         "init_deck",
         "pick_random_cards",
@@ -19,66 +401,377 @@ class Language(object):
         "shuffle",
         "insert_specific_cards",
         "insert_random_cards",
+        "any_match",
+        "all_match",
+        "order_match",
     ]
 
+    COMMANDS = {
+        "init_deck": CommandInfo(deterministic=True),
+        "pick_random_cards": CommandInfo(
+            sources=("from_sequence",), result=LIST, mutates_sources=True
+        ),
+        "pick_specific_cards": CommandInfo(
+            sources=("from_sequence",),
+            result=LIST,
+            deterministic=True,
+            mutates_sources=True,
+        ),
+        "shuffle": CommandInfo(
+            sources=("sequence",), mutates_sources=True, returns_source="sequence"
+        ),
+        "insert_specific_cards": CommandInfo(
+            sources=("to_sequence",),
+            deterministic=True,
+            mutates_sources=True,
+            returns_source="to_sequence",
+        ),
+        "insert_random_cards": CommandInfo(
+            sources=("from_sequence", "to_sequence"),
+            mutates_sources=True,
+            returns_source="to_sequence",
+        ),
+        "any_match": CommandInfo(
+            sources=("from_sequence",), result=VALUE, deterministic=True
+        ),
+        "all_match": CommandInfo(
+            sources=("from_sequence",), result=VALUE, deterministic=True
+        ),
+        "order_match": CommandInfo(
+            sources=("from_sequence",), result=VALUE, deterministic=True
+        ),
+    }
+
+    DECK_TYPES = {
+        "standard_deck": StandardDeck,
+        "standard_deck_with_jokers": StandardDeckWithJokers,
+        "canasta_deck": JokerDeck,
+        "empty_deck": EmptyDeck,
+    }
+
     def __init__(self, sequences):
+        self._version = 0
         self.sequences = sequences
+        # Results of the latest `execute` call, kept for convenience. Use the
+        # context returned by `execute` when running a program concurrently.
+        self.sequence_results = ExecutionContext()
+        # Set to a `tracing.StepTracer` to record the steps of every execution
+        self.tracer = None
+        # (plan, version of the sequences, tracer, the sequence dicts), replaced
+        # as a whole so `execute` can read it without the lock
+        self._compiled = None
+        self._compiled_sequences = None
+        self._lock = threading.Lock()
+
+    @property
+    def sequences(self) -> list:
+        return self._sequences
+
+    @sequences.setter
+    def sequences(self, sequences: list) -> None:
+        self._sequences = sequences
+        self._version += 1
+
+    def __getstate__(self):
+        # Sent to worker processes without the compiled plan, which is rebuilt
+        # on first use. Steps run by workers aren't traced.
+        state = self.__dict__.copy()
+        state.update(
+            _compiled=None,
+            _compiled_sequences=None,
+            _lock=None,
+            tracer=None,
+        )
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def compile(self) -> ExecutionPlan:
+        """
+        Validate the sequences and turn them into an execution plan. The plan
+        is cached until the sequences or the tracer change, sequences changed
+        in place are compared with the compiled ones.
+        :return: <ExecutionPlan>
+        """
+        with self._lock:
+            compiled = self._compiled
+            if (
+                compiled is None
+                or compiled[2] is not self.tracer
+                or self._compiled_sequences != self.sequences
+            ):
+                version = self._version
+                steps = [
+                    self.compile_sequence(idx, sequence)
+                    for idx, sequence in enumerate(self.sequences, start=1)
+                ]
+                plan = ExecutionPlan(steps)
+                if self.tracer is not None:
+                    plan = plan.with_tracer(self.tracer)
+                self._compiled_sequences = copy.deepcopy(self.sequences)
+                compiled = (plan, version, self.tracer, tuple(self.sequences))
+                self._compiled = compiled
+            return compiled[0]
+
+    def _get_plan(self) -> ExecutionPlan:
+        """
+        The cached plan, taking the lock only to recompile: when `sequences`
+        has been assigned, sequences were added, removed or replaced in the
+        list, or the tracer changed since it was compiled. Changes inside a
+        sequence dict are only noticed by `compile`.
+        """
+        compiled = self._compiled
+        sequences = self._sequences
+        if (
+            compiled is None
+            or compiled[1] != self._version
+            or compiled[2] is not self.tracer
+            or len(compiled[3]) != len(sequences)
+            or not all(map(operator.is_, compiled[3], sequences))
+        ):
+            return self.compile()
+        return compiled[0]
+
+    def compile_sequence(self, sequence_number: int, sequence: dict) -> CompiledStep:
+        """
+        Compile one sequence
+        :param sequence_number: <int> number of the sequence, starting from 1
+        :param sequence: <dict> command and its meta
+        :return: <CompiledStep>
+        """
+        command = sequence["command"]
+        info = self.COMMANDS.get(command)
+        if command not in self.AVAILABLE_COMMANDS or info is None:
+            raise UnsupportedCommand(f"{command} is not supported")
+
+        meta = sequence.get("meta", {})
+        if meta.get("random_positions"):
+            info = info._replace(deterministic=False)
+        sources = tuple(meta.get(key) for key in info.sources)
+        for source in sources:
+            self._check_reference(sequence_number, source)
+        run = getattr(self, "compile_" + command)(sequence_number, **meta)
+        return CompiledStep(
+            sequence_number,
+            command,
+            copy.deepcopy(meta),
+            run,
+            info,
+            sources=sources,
+            returns_source=meta.get(info.returns_source),
+        )
 
     def execute_sequence(self, command: AVAILABLE_COMMANDS, **kwargs):
-        if command not in self.AVAILABLE_COMMANDS:
-            raise UnsupportedCommand()
-        return getattr(self, "command_" + command)(**kwargs)
-
-    def execute(self):
-        self.current_sequence = 1
-        self.sequence_results = {}
-        for sequence in self.sequences:
-            self.sequence_results[self.current_sequence] = self.execute_sequence(
-                command=sequence["command"], **sequence.get("meta", {})
+        """
+        Run a single command against the results of the latest execution
+        """
+        sequence_number = len(self.sequence_results) + 1
+        step = self.compile_sequence(
+            sequence_number, {"command": command, "meta": kwargs}
+        )
+        run = step.run if self.tracer is None else self.tracer.wrap(step)
+        return run(self.sequence_results)
+
+    def execute(self, result_sequence: Optional[int] = None) -> ExecutionContext:
+        """
+        Run the program once, see `ExecutionPlan.execute`. Concurrent calls
+        don't wait for each other. Call `compile` after changing the meta of
+        a sequence in place.
+        :param result_sequence: <int> only the result of this sequence is needed
+        :return: <ExecutionContext> sequence number -> result
+        """
+        context = self._get_plan().execute(result_sequence)
+        self.sequence_results = context
+        return context
+
+    @staticmethod
+    def _check_reference(sequence_number: int, reference: int) -> None:
+        """
+        Make sure `reference` points to one of the previous sequences
+        """
+        if not isinstance(reference, int) or not 1 <= reference < sequence_number:
+            raise BadSource(
+                f"Sequence {sequence_number} can't use sequence {reference}"
             )
-            self.current_sequence += 1
-        return self.sequence_results
-
-    def command_init_deck(self, deck_type):
-        if deck_type == "standard_deck":
-            return StandardDeck()
-        elif deck_type == "standard_deck_with_jokers":
-            return StandardDeckWithJokers()
-        elif deck_type == "canasta_deck":
-            return JokerDeck()
-        elif deck_type == "empty_deck":
-            return EmptyDeck()
-        raise UnsupportedDeckType(f"{deck_type} is not supported")
-
-    def _get_deck_for_picking(self, source: Union[list, StandardDeck]) -> StandardDeck:
+
+    def compile_init_deck(self, sequence_number: int, deck_type: str) -> Callable:
+        deck_class = self.DECK_TYPES.get(deck_type)
+        if deck_class is None:
+            raise UnsupportedDeckType(f"{deck_type} is not supported")
+
+        def init_deck(results):
+            return deck_class()
+
+        return init_deck
+
+    @staticmethod
+    def _get_deck_for_picking(source: Union[list, StandardDeck]) -> StandardDeck:
         if isinstance(source, list):
-            # We have a list not a deck, lets create a deck from `from_sequence`
-            # and then pick cards from it
-            deck = EmptyDeck()
-            for card in source:
-                deck.insert_card(card, force=True)
+            # We have a list not a deck, lets use it as a deck. The list is
+            # only copied once the deck is changed.
+            deck = DeckView(source)
         elif StandardDeck in type.mro(source.__class__):
             deck = source
         else:
             raise BadSource("This sequence can't be used for picking card")
         return deck
 
-    def command_pick_random_cards(self, count: int, from_sequence: int) -> list[Card]:
-        source = self.sequence_results[from_sequence]
-        deck = self._get_deck_for_picking(source)
-        return deck.pick_random_cards(count)
-
-    def command_pick_specific_cards(self, cards: Iterable[Card], from_sequence: int):
-        source = self.sequence_results[from_sequence]
-        deck = self._get_deck_for_picking(source)
-        picked_cards = []
-        for card in cards:
-            card = Card(value=card["value"], suit=card["suit"])
-            picked_cards.append(deck.pick_card(card))
-        return picked_cards
-
-    def command_shuffle(self, sequence: int) -> StandardDeck:
-        source = self.sequence_results[sequence]
-        deck = self._get_deck_for_picking(source)
-        deck.shuffle()
-        return deck
+    def compile_pick_random_cards(
+        self, sequence_number: int, count: int, from_sequence: int
+    ) -> Callable:
+        get_deck = self._get_deck_for_picking
+
+        def pick_random_cards(results) -> list[Card]:
+            return get_deck(results[from_sequence]).pick_random_cards(count)
+
+        return pick_random_cards
+
+    def compile_pick_specific_cards(
+        self, sequence_number: int, cards: Iterable[dict], from_sequence: int
+    ) -> Callable:
+        get_deck = self._get_deck_for_picking
+        cards = [Card(value=card["value"], suit=card["suit"]) for card in cards]
+
+        def pick_specific_cards(results) -> list[Card]:
+            deck = get_deck(results[from_sequence])
+            return [deck.pick_card(card) for card in cards]
+
+        return pick_specific_cards
+
+    def compile_shuffle(self, sequence_number: int, sequence: int) -> Callable:
+        get_deck = self._get_deck_for_picking
+
+        def shuffle(results) -> StandardDeck:
+            deck = get_deck(results[sequence])
+            deck.shuffle()
+            return deck
+
+        return shuffle
+
+    def compile_insert_specific_cards(
+        self,
+        sequence_number: int,
+        cards: Iterable[dict],
+        to_sequence: int,
+        force: bool = False,
+        random_positions: bool = False,
+    ) -> Callable:
+        get_deck = self._get_deck_for_picking
+        cards = [Card(value=card["value"], suit=card["suit"]) for card in cards]
+
+        def insert_specific_cards(results) -> StandardDeck:
+            deck = get_deck(results[to_sequence])
+            deck.insert_cards(cards, force=force, random_positions=random_positions)
+            return deck
+
+        return insert_specific_cards
+
+    def compile_insert_random_cards(
+        self,
+        sequence_number: int,
+        count: int,
+        from_sequence: int,
+        to_sequence: int,
+        force: bool = False,
+    ) -> Callable:
+        get_deck = self._get_deck_for_picking
+
+        def insert_random_cards(results) -> StandardDeck:
+            cards = get_deck(results[from_sequence]).pick_random_cards(count)
+            deck = get_deck(results[to_sequence])
+            deck.insert_cards(cards, force=force, random_positions=True)
+            return deck
+
+        return insert_random_cards
+
+    @staticmethod
+    def _get_cards(source: Union[list, StandardDeck]) -> list[Card]:
+        if isinstance(source, list):
+            return source
+        if isinstance(source, StandardDeck):
+            return source._cards
+        raise BadSource("This sequence doesn't have any cards")
+
+    def compile_any_match(
+        self,
+        sequence_number: int,
+        conditions: Iterable[dict],
+        from_sequence: int,
+        matches_required: int = 1,
+    ) -> Callable:
+        """
+        Are at least `matches_required` cards matching any of the conditions?
+        """
+        get_cards = self._get_cards
+        mask = 0
+        for condition in conditions:
+            mask |= get_condition_mask(condition)
+
+        def any_match(results) -> bool:
+            if matches_required <= 0:
+                return True
+            found = 0
+            for card in get_cards(results[from_sequence]):
+                if card.code is not None and mask >> card.code & 1:
+                    found += 1
+                    if found == matches_required:
+                        return True
+            return False
+
+        return any_match
+
+    def compile_all_match(
+        self, sequence_number: int, conditions: Iterable[dict], from_sequence: int
+    ) -> Callable:
+        """
+        Is every condition met? The values of a condition are a multiset, each
+        of them has to be matched by a different card, e.g. suits
+        `["hearts", "hearts"]` needs two hearts.
+        """
+        get_cards = self._get_cards
+        # Values of one condition match disjoint sets of cards, so matching
+        # them to different cards only needs enough cards for each value
+        masks = [
+            pair for condition in conditions for pair in get_condition_masks(condition)
+        ]
+
+        def all_match(results) -> bool:
+            codes = [
+                card.code
+                for card in get_cards(results[from_sequence])
+                if card.code is not None
+            ]
+            for mask, count in masks:
+                found = 0
+                for code in codes:
+                    if mask >> code & 1:
+                        found += 1
+                        if found == count:
+                            break
+                else:
+                    return False
+            return True
+
+        return all_match
+
+    def compile_order_match(
+        self, sequence_number: int, conditions: Iterable[dict], from_sequence: int
+    ) -> Callable:
+        """
+        Does the n-th card match the n-th condition?
+        """
+        get_cards = self._get_cards
+        masks = [get_condition_mask(condition) for condition in conditions]
+
+        def order_match(results) -> bool:
+            cards = get_cards(results[from_sequence])
+            if len(cards) < len(masks):
+                return False
+            for mask, card in zip(masks, cards):
+                if card.code is None or not mask >> card.code & 1:
+                    return False
+            return True
+
+        return order_match
@@ -1,40 +1,94 @@
 import random
+import time
+from collections import Counter
 from dataclasses import dataclass
-
 from itertools import product
+from typing import Iterable
 
 from . import constants
+from . import estimates
 from . import exceptions
+from . import parallel
+
+
+class Card(object):
+    """
+    A playing card.
+
+    Cards are interned: every known (value, suit) pair maps to one shared
+    instance identified by a compact integer `code`, so equality is an
+    identity check and the colour / symbol / joker attributes are served from
+    tables precomputed from `constants`. Cards that are not part of any deck
+    (e.g. `Card(33, "spades")`) are still allowed, they are just not interned
+    and have no `code`.
+    """
+
+    __slots__ = ("value", "suit", "code")
 
+    def __new__(cls, value, suit):
+        code = CARD_CODES.get((value, suit))
+        if code is not None:
+            return CARDS[code]
+        return cls._create(value, suit, None)
 
-@dataclass
-class Card:
-    value: int
-    suit: str
+    @classmethod
+    def _create(cls, value, suit, code):
+        card = object.__new__(cls)
+        object.__setattr__(card, "value", value)
+        object.__setattr__(card, "suit", suit)
+        object.__setattr__(card, "code", code)
+        return card
+
+    @staticmethod
+    def from_code(code: int) -> "Card":
+        """
+        Get the interned card for an integer code
+        :param code: <int> 0..NUMBER_OF_CARD_CODES - 1
+        :return: <Card>
+        """
+        return CARDS[code]
 
     @property
     def colour(self):
-        if self.is_joker:
-            return "*"
-        return constants.CARD_SUITS_CONF[self.suit]["colour"]
+        if self.code is None:
+            return constants.CARD_SUITS_CONF[self.suit]["colour"]
+        return CARD_COLOURS[self.code]
 
     @property
     def suit_symbol(self):
-        if self.is_joker:
-            return "*"
-        return constants.CARD_SUITS_CONF[self.suit]["symbol"]
+        if self.code is None:
+            return constants.CARD_SUITS_CONF[self.suit]["symbol"]
+        return CARD_SUIT_SYMBOLS[self.code]
 
     @property
     def value_symbol(self):
-        if self.is_joker:
-            return "*"
-        return constants.CARD_VALUES_CONF[self.value]["symbol"]
+        if self.code is None:
+            return constants.CARD_VALUES_CONF[self.value]["symbol"]
+        return CARD_VALUE_SYMBOLS[self.code]
 
     @property
     def is_joker(self):
-        return self == Joker() or (
-            self.suit == constants.JOKER_SUIT and self.value == constants.JOKER_VALUE
-        )
+        return self.code == JOKER_CODE
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards are immutable")
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Card):
+            return NotImplemented
+        return self.value == other.value and self.suit == other.suit
+
+    def __hash__(self):
+        if self.code is None:
+            return hash((self.value, self.suit))
+        return self.code
+
+    def __reduce__(self):
+        # Unpickling / copying goes through the constructor, so it yields the
+        # interned instance again
+        return Card, (self.value, self.suit)
 
     def __str__(self):
         return "{}{}".format(
@@ -42,36 +96,104 @@ class Card:
             self.suit_symbol,
         )
 
-    def __hash__(self):
-        return hash((self.value, self.suit))
-
     def __repr__(self):
         return "{}".format(self.__str__())
 
 
-@dataclass
 class Joker(Card):
-    value: str = constants.JOKER_VALUE
-    suit: str = constants.JOKER_SUIT
+    __slots__ = ()
+
+    def __new__(cls, value=constants.JOKER_VALUE, suit=constants.JOKER_SUIT):
+        return Card.__new__(cls, value, suit)
+
+    def __reduce__(self):
+        return Joker, ()
+
+
+def _build_card_tables():
+    """
+    Intern every card that can appear in a deck. Codes are assigned in
+    suit / value order (the same order `StandardDeck.reset` uses), the joker
+    comes last.
+    """
+    cards = []
+    for suit, value in product(
+        constants.CARD_SUITS_CONF.keys(),
+        constants.CARD_VALUES_CONF.keys(),
+    ):
+        cards.append(Card._create(value, suit, len(cards)))
+    cards.append(Joker._create(constants.JOKER_VALUE, constants.JOKER_SUIT, len(cards)))
+    return tuple(cards)
+
+
+CARD_CODES = {}
+CARDS = _build_card_tables()
+CARD_CODES.update({(card.value, card.suit): card.code for card in CARDS})
+NUMBER_OF_CARD_CODES = len(CARDS)
+JOKER_CODE = NUMBER_OF_CARD_CODES - 1
+CARD_COLOURS = tuple(
+    constants.CARD_SUITS_CONF[card.suit]["colour"] for card in CARDS[:JOKER_CODE]
+) + ("*",)
+CARD_SUIT_SYMBOLS = tuple(
+    constants.CARD_SUITS_CONF[card.suit]["symbol"] for card in CARDS[:JOKER_CODE]
+) + ("*",)
+CARD_VALUE_SYMBOLS = tuple(
+    constants.CARD_VALUES_CONF[card.value]["symbol"] for card in CARDS[:JOKER_CODE]
+) + ("*",)
+
+
+@dataclass(frozen=True)
+class DeckSnapshot:
+    """
+    State of a deck captured by `StandardDeck.snapshot`
+    """
+
+    cards: tuple
+    card_counts: Counter
 
 
 class StandardDeck(object):
     NUMBER_OF_NON_JOKER_CARDS = 52
     EACH_NON_JOKER_CARD_OCCURS = 1
     NUMBER_OF_JOKERS = 0
-    cards = None
+    _cards = None
+    # Multiset index of `cards`, kept up to date by the deck's own methods.
+    # `_counted_cards` / `_counted_length` remember which list the index
+    # describes, so it is rebuilt when the list is replaced or resized.
+    _card_counts = None
+    _counted_cards = None
+    _counted_length = 0
 
     def __init__(self):
         # Always start with fresh, ordered deck of cards
         self.reset()
 
+    @property
+    def cards(self) -> list[Card]:
+        """
+        Cards of the deck, top first. The list handed out can be changed
+        directly, so the count index is rebuilt the next time it is needed.
+        Code of this package that only reads the cards uses `_cards`, which
+        keeps the index. Don't change a list kept from before the deck was
+        last used, get it again.
+        :return: <Card[]>
+        """
+        self._counted_cards = None
+        return self._cards
+
+    @cards.setter
+    def cards(self, cards: list[Card]) -> None:
+        self._cards = cards
+
     @property
     def is_full(self) -> bool:
         """
         Is this deck full?
         :return: <bool>
         """
-        return len(self.cards) == self.NUMBER_OF_NON_JOKER_CARDS + self.NUMBER_OF_JOKERS
+        return (
+            len(self._cards) == self.NUMBER_OF_NON_JOKER_CARDS + self.NUMBER_OF_JOKERS
+        )
 
     @property
     def is_over_filled(self) -> bool:
@@ -79,7 +201,7 @@ class StandardDeck(object):
         Is this deck overfilled?
         :return: <bool>
         """
-        return len(self.cards) > self.NUMBER_OF_NON_JOKER_CARDS + self.NUMBER_OF_JOKERS
+        return len(self._cards) > self.NUMBER_OF_NON_JOKER_CARDS + self.NUMBER_OF_JOKERS
 
     @property
     def is_full_or_overfilled(self) -> bool:
@@ -94,43 +216,100 @@ class StandardDeck(object):
         if not self.is_full:
             return False
 
-        for p in product(
-            constants.CARD_SUITS_CONF.keys(),
-            constants.CARD_VALUES_CONF.keys(),
-        ):
-            card = Card(suit=p[0], value=p[1])
-            if self.card_occurrence_count(card) != self.EACH_NON_JOKER_CARD_OCCURS:
+        counts = self._get_card_counts()
+        for card in CARDS[:JOKER_CODE]:
+            if counts[card] != self.EACH_NON_JOKER_CARD_OCCURS:
                 return False
         return True
 
+    def _get_card_counts(self) -> Counter:
+        """
+        Get the per-card count index, rebuilding it if `cards` has been changed
+        behind the deck's back
+        :return: <Counter>
+        """
+        if self._counted_cards is not self._cards or self._counted_length != len(
+            self._cards
+        ):
+            self._card_counts = Counter(self._cards)
+            self._counted_cards = self._cards
+            self._counted_length = len(self._cards)
+        return self._card_counts
+
     def card_occurrence_count(self, card: Card) -> int:
         """
         How many times is this card in the deck?
         :param card: <Card>
         :return: <int> number of occurrences
         """
-        return self.cards.count(card)
+        return self._get_card_counts()[card]
+
+    @classmethod
+    def _get_template(cls) -> "DeckSnapshot":
+        """
+        Get the full, ordered deck of this class. It is built once per deck
+        class and then only copied.
+        :return: <DeckSnapshot>
+        """
+        template = cls.__dict__.get("_template")
+        if template is None:
+            cards = []
+            for _ in range(0, cls.EACH_NON_JOKER_CARD_OCCURS):
+                for p in product(
+                    constants.CARD_SUITS_CONF.keys(),
+                    constants.CARD_VALUES_CONF.keys(),
+                ):
+                    cards.append(Card(value=p[1], suit=p[0]))
+
+            for _ in range(0, cls.NUMBER_OF_JOKERS):
+                cards.append(Joker())
+            template = DeckSnapshot(cards=tuple(cards), card_counts=Counter(cards))
+            cls._template = template
+        return template
 
     def reset(self) -> None:
         """
         Reset the deck so it contains all cards in suit / value order
         """
-        self.cards = []
-        for _ in range(0, self.EACH_NON_JOKER_CARD_OCCURS):
-            for p in product(
-                constants.CARD_SUITS_CONF.keys(),
-                constants.CARD_VALUES_CONF.keys(),
-            ):
-                self.cards.append(Card(value=p[1], suit=p[0]))
+        self.restore(self._get_template())
+
+    def snapshot(self) -> "DeckSnapshot":
+        """
+        Capture the current state of the deck, so it can be restored later
+        :return: <DeckSnapshot>
+        """
+        return DeckSnapshot(
+            cards=tuple(self._cards), card_counts=self._get_card_counts().copy()
+        )
 
-        for _ in range(0, self.NUMBER_OF_JOKERS):
-            self.cards.append(Joker())
+    def restore(self, snapshot: "DeckSnapshot") -> None:
+        """
+        Put the deck back into a state captured by `snapshot`
+        :param snapshot: <DeckSnapshot>
+        """
+        self._cards = list(snapshot.cards)
+        self._card_counts = snapshot.card_counts.copy()
+        self._counted_cards = self._cards
+        self._counted_length = len(self._cards)
+
+    def fork(self) -> "StandardDeck":
+        """
+        Create an independent copy of this deck, with the same cards in the
+        same order. Much cheaper than building and filling a new deck.
+        :return: <StandardDeck>
+        """
+        deck = self.__class__.__new__(self.__class__)
+        deck._cards = list(self._cards)
+        deck._card_counts = self._get_card_counts().copy()
+        deck._counted_cards = deck._cards
+        deck._counted_length = len(deck._cards)
+        return deck
 
     def shuffle(self) -> None:
         """
         Shuffle all cards in this deck
         """
-        random.shuffle(self.cards)
+        random.shuffle(self._cards)
 
     def pick_random_card(self) -> Card:
         """
@@ -140,19 +319,49 @@ class StandardDeck(object):
         """
         return self.pick_random_cards(number_of_cards=1)[0]
 
-    def pick_random_cards(self, number_of_cards: int) -> list[Card]:
+    def pick_random_cards(
+        self, number_of_cards: int, preserve_order: bool = False
+    ) -> list[Card]:
         """
         Pick random cards from the deck, it will also removed it from self.cards
 
+        Every card is picked uniformly from the cards still in the deck (a
+        partial Fisher-Yates shuffle), so each ordered selection of
+        `number_of_cards` cards is equally likely. The picked card's slot is
+        filled with the last card of the deck, which makes a pick O(1) but
+        changes the order of the remaining cards. Use `preserve_order` when
+        the order of the remaining cards matters, that costs one O(n) pass.
+
         :param number_of_cards: <int> How many cards to pick?
+        :param preserve_order: <bool> Keep the remaining cards in their order
         :return: <Card[]>
         """
-        if number_of_cards > len(self.cards):
+        cards = self._cards
+        if number_of_cards > len(cards):
             raise exceptions.NotEnoughCardsException()
 
-        picked_cards = list()
-        for _ in range(0, number_of_cards):
-            picked_cards.append(self.cards.pop(random.randrange(len(self.cards))))
+        counts = self._get_card_counts()
+        if preserve_order:
+            indexes = random.sample(range(len(cards)), number_of_cards)
+            picked_cards = [cards[idx] for idx in indexes]
+            picked_indexes = set(indexes)
+            cards[:] = [
+                card for idx, card in enumerate(cards) if idx not in picked_indexes
+            ]
+        else:
+            picked_cards = list()
+            randrange = random.randrange
+            for remaining in range(len(cards), len(cards) - number_of_cards, -1):
+                idx = randrange(remaining)
+                last_card = cards.pop()
+                if idx == remaining - 1:
+                    picked_cards.append(last_card)
+                else:
+                    picked_cards.append(cards[idx])
+                    cards[idx] = last_card
+
+        counts.subtract(picked_cards)
+        self._counted_length = len(cards)
         return picked_cards
 
     def pick_card(self, card: Card) -> Card:
@@ -161,12 +370,14 @@ class StandardDeck(object):
         :param card: <Card>
         :return: <Card>
         """
-        if self.card_occurrence_count(card) == 0:
+        counts = self._get_card_counts()
+        if counts[card] == 0:
             raise exceptions.CardIsNotInTheDeck()
 
-        for idx, existing_card in enumerate(self.cards):
-            if existing_card == card:
-                return self.cards.pop(idx)
+        picked_card = self._cards.pop(self._cards.index(card))
+        counts[picked_card] -= 1
+        self._counted_length -= 1
+        return picked_card
 
     def insert_card(self, card: Card, force: bool = False) -> None:
         """
@@ -176,24 +387,62 @@ class StandardDeck(object):
         :param card: <Card>
         :param force: <bool> Force the card insertion
         """
-        if self.is_full_or_overfilled and not force:
-            raise exceptions.DeckFullException()
+        self.insert_cards([card], force=force)
+
+    def insert_cards(
+        self, cards: Iterable[Card], force: bool = False, random_positions: bool = False
+    ) -> None:
+        """
+        Insert several cards to a deck, checking them all before the deck is
+        changed, see `insert_card`.
 
+        Cards are added to the bottom of the deck unless `random_positions` is
+        set. Then every card is swapped with a random card of the deck after
+        it is added (an inside-out Fisher-Yates step), so an insertion is O(1)
+        and a shuffled deck stays shuffled, but the swapped cards are moved
+        to the bottom.
+
+        :param cards: <Card[]>
+        :param force: <bool> Force the card insertion
+        :param random_positions: <bool> Insert each card at a random position
+        """
+        cards = list(cards)
+        counts = self._get_card_counts()
         if not force:
-            occurrences = self.card_occurrence_count(card)
-            if any(
-                [
-                    card.is_joker and occurrences > self.NUMBER_OF_JOKERS - 1,
-                    not card.is_joker
-                    and occurrences > self.EACH_NON_JOKER_CARD_OCCURS - 1,
-                ]
-            ):
-                raise exceptions.IncorrectDeckException(
-                    "Card `{}` is already in the deck {} time(s)".format(
-                        str(card), occurrences
-                    )
+            capacity = self.NUMBER_OF_NON_JOKER_CARDS + self.NUMBER_OF_JOKERS
+            if len(self._cards) + len(cards) > capacity:
+                raise exceptions.DeckFullException()
+
+            for card, inserted in Counter(cards).items():
+                occurrences = counts[card]
+                limit = (
+                    self.NUMBER_OF_JOKERS
+                    if card.is_joker
+                    else self.EACH_NON_JOKER_CARD_OCCURS
                 )
-        self.cards.append(card)
+                if occurrences + inserted > limit:
+                    raise exceptions.IncorrectDeckException(
+                        "Card `{}` is already in the deck {} time(s)".format(
+                            str(card), occurrences
+                        )
+                    )
+
+        deck_cards = self._cards
+        if random_positions:
+            randrange = random.randrange
+            for card in cards:
+                deck_cards.append(card)
+                idx = randrange(len(deck_cards))
+                deck_cards[-1] = deck_cards[idx]
+                deck_cards[idx] = card
+        else:
+            deck_cards.extend(cards)
+        counts.update(cards)
+        self._counted_length = len(deck_cards)
+
+
+# How many times `iter_probability_test` checks the clock between reports by time
+CLOCK_CHECKS_PER_REPORT = 10
 
 
 class ProbabilityTest(object):
@@ -207,9 +456,117 @@ class ProbabilityTest(object):
         """
         return (float(success_count) / float(iterations)) * 100
 
+    @staticmethod
+    def _count_successes(
+        test_func,
+        iteration_count,
+        kwargs,
+        result_sequence=None,
+        workers=None,
+        seed=None,
+    ):
+        """
+        Run test_func `iteration_count` times and count the successful runs
+        :param test_func: <function>
+        :param iteration_count: <int> how many iterations?
+        :param kwargs: <dict> arguments for test_func
+        :param result_sequence: <int> which item of the result is the Bool?
+        :param workers: <int> run in a pool of this many processes
+        :param seed: <int> seed to make the run reproducible
+        :return: <int> Number of times desired event happened
+        """
+        if workers is not None or seed is not None:
+            return parallel.count_successes(
+                test_func,
+                iteration_count,
+                kwargs,
+                result_sequence=result_sequence,
+                workers=workers,
+                seed=seed,
+            )
+
+        successful_runs = 0
+        if result_sequence is None:
+            for _ in range(0, iteration_count):
+                if test_func(**kwargs):
+                    successful_runs += 1
+        else:
+            for _ in range(0, iteration_count):
+                if test_func(**kwargs)[result_sequence]:
+                    successful_runs += 1
+        return successful_runs
+
+    @staticmethod
+    def _count_language_successes(
+        test_func,
+        result_sequence,
+        iteration_count,
+        kwargs,
+        workers=None,
+        seed=None,
+        backend="scalar",
+        block_size=None,
+    ):
+        """
+        `_count_successes` for `Language` programs
+        :param backend: <str> "scalar" or "batch", see
+            `ProbabilityTest.run_language_probability_test`
+        :param block_size: <int> iterations per block of the batch backend
+        :return: <int> Number of times desired event happened
+        """
+        program = getattr(test_func, "__self__", None)
+        if backend == "batch":
+            if not hasattr(program, "compile"):
+                raise exceptions.UnsupportedAction(
+                    "The batch backend runs `Language` programs only, "
+                    "pass `lan.execute`"
+                )
+            if kwargs or workers is not None:
+                raise exceptions.UnsupportedAction(
+                    "The batch backend doesn't take test arguments or workers"
+                )
+            from . import batch_language
+
+            return batch_language.count_successes(
+                program,
+                result_sequence,
+                iteration_count,
+                rng=seed,
+                block_size=block_size,
+            )
+        if backend != "scalar":
+            raise exceptions.UnsupportedAction(f"Unknown backend {backend}")
+
+        if getattr(test_func, "__name__", None) == "execute" and hasattr(
+            program, "compile"
+        ):
+            # Compile the `Language` program once instead of on every execution.
+            # Only steps the result depends on are run, in this process and in
+            # worker processes alike.
+            from .language import ProgramTask
+
+            test_func = ProgramTask(program, result_sequence)
+
+        return ProbabilityTest._count_successes(
+            test_func,
+            iteration_count,
+            kwargs,
+            result_sequence=result_sequence,
+            workers=workers,
+            seed=seed,
+        )
+
     @staticmethod
     def run_language_probability_test(
-        test_func, result_sequence, iteration_count=20000, **kwargs
+        test_func,
+        result_sequence,
+        iteration_count=20000,
+        workers=None,
+        seed=None,
+        cache=None,
+        backend="scalar",
+        block_size=None,
+        **kwargs,
     ):
         """
         Run test_func over `iteration_count` times and return the probability
@@ -217,6 +574,15 @@ class ProbabilityTest(object):
         :param test_func: <function>
         :param result_sequence: <int> which sequence returns the final Bool?
         :param iteration_count: <int> how many iterations?
+        :param workers: <int> run in a pool of this many processes, see
+            `parallel.count_successes`
+        :param seed: <int> seed to make the run reproducible
+        :param cache: <ResultCache> reuse (and extend) earlier results of the
+            same program, see `cache.ResultCache`
+        :param backend: <str> "scalar" executes the program once per iteration,
+            "batch" runs whole blocks of iterations over numpy arrays, see
+            `batch_language.BatchExecutor`. It needs numpy and `lan.execute`.
+        :param block_size: <int> iterations per block of the "batch" backend
         :return: <float> Percentage of chance of test happening
 
         Example usage:
@@ -236,19 +602,42 @@ class ProbabilityTest(object):
         print 'Chance of a red card is {}%'.format(result)
         ```
         """
-        successful_runs = 0
-        for _ in range(0, iteration_count):
-            if test_func(**kwargs)[result_sequence]:
-                successful_runs += 1
+        if cache is not None:
+            return cache.run_language_probability_test(
+                test_func,
+                result_sequence,
+                iteration_count=iteration_count,
+                workers=workers,
+                seed=seed,
+                backend=backend,
+                block_size=block_size,
+                **kwargs,
+            )
+
+        successful_runs = ProbabilityTest._count_language_successes(
+            test_func,
+            result_sequence,
+            iteration_count,
+            kwargs,
+            workers=workers,
+            seed=seed,
+            backend=backend,
+            block_size=block_size,
+        )
         return ProbabilityTest._get_percentage(successful_runs, iteration_count)
 
     @staticmethod
-    def run_probability_test(test_func, iteration_count=20000, **kwargs):
+    def run_probability_test(
+        test_func, iteration_count=20000, workers=None, seed=None, **kwargs
+    ):
         """
         Run test_func over `iteration_count` times and return the probability
         in percent of the event happening
-        :param test_func: <function>
+        :param test_func: <function> or "module:function" import path
         :param iteration_count: <int> how many iterations?
+        :param workers: <int> run in a pool of this many processes, see
+            `parallel.count_successes`
+        :param seed: <int> seed to make the run reproducible
         :return: <float> Percentage of chance of test happening
 
         Example usage:
@@ -267,10 +656,389 @@ class ProbabilityTest(object):
         print 'Chance of a red card is {}%'.format(result)
         ```
         """
+        successful_runs = ProbabilityTest._count_successes(
+            test_func, iteration_count, kwargs, workers=workers, seed=seed
+        )
+        return ProbabilityTest._get_percentage(successful_runs, iteration_count)
+
+    @staticmethod
+    def run_sequential_probability_test(
+        test_func,
+        half_width=0.5,
+        relative=False,
+        confidence=0.95,
+        max_iterations=1000000,
+        check_every=1000,
+        method="wilson",
+        result_sequence=None,
+        **kwargs,
+    ):
+        """
+        Run test_func until the confidence interval of the probability is
+        narrow enough, or `max_iterations` is reached.
+
+        The interval is checked every `check_every` iterations. Easy questions
+        stop after a few thousand iterations, hard ones run until they are
+        precise enough. Note that checking repeatedly makes the real coverage
+        slightly lower than `confidence`.
+
+        :param test_func: <function>
+        :param half_width: <float> target half-width of the interval, in
+            percentage points, or as a fraction of the estimate if `relative`
+        :param relative: <bool> is `half_width` relative to the estimate?
+        :param confidence: <float> confidence level of the interval
+        :param max_iterations: <int> iteration budget
+        :param check_every: <int> how often to check the interval?
+        :param method: <str> "wilson" or "clopper_pearson"
+        :param result_sequence: <int> for Language programs, which sequence
+            returns the final Bool?
+        :return: <ProbabilityResult>
+
+        Example usage:
+        ```
+        result = ProbabilityTest.run_sequential_probability_test(
+            test_func, half_width=0.1
+        )
+        print("{:.2f}% ({:.2f}% - {:.2f}%) after {} iterations".format(
+            result.estimate, *result.interval, result.iterations
+        ))
+        ```
+        """
+        for result in ProbabilityTest.iter_probability_test(
+            test_func,
+            iteration_count=max_iterations,
+            report_every=check_every,
+            confidence=confidence,
+            method=method,
+            result_sequence=result_sequence,
+            **kwargs,
+        ):
+            target = half_width * result.estimate if relative else half_width
+            if result.half_width <= target:
+                return result
+        return result
+
+    @staticmethod
+    def iter_probability_test(
+        test_func,
+        iteration_count=None,
+        report_every=1000,
+        report_seconds=None,
+        confidence=0.95,
+        method="wilson",
+        result_sequence=None,
+        **kwargs,
+    ):
+        """
+        Run test_func and yield the running estimate every `report_every`
+        iterations and/or every `report_seconds`, whichever comes first. The
+        last estimate is always yielded when `iteration_count` is reached.
+        Stopping the iteration (`break`, `close()`) stops the run, nothing is
+        computed ahead.
+
+        :param test_func: <function>
+        :param iteration_count: <int> iteration budget, None runs until stopped
+        :param report_every: <int> iterations between estimates, None to
+            report by time only
+        :param report_seconds: <float> seconds between estimates
+        :param confidence: <float> confidence level of the interval
+        :param method: <str> "wilson" or "clopper_pearson"
+        :param result_sequence: <int> for Language programs, which sequence
+            returns the final Bool?
+        :return: generator of <ProbabilityResult>, with the totals so far
+
+        Example usage:
+        ```
+        for result in ProbabilityTest.iter_probability_test(
+            test_func, report_seconds=0.5
+        ):
+            print("{:.2f}% after {} iterations, {:.0f}/s".format(
+                result.estimate, result.iterations, result.iterations_per_second
+            ))
+            if result.half_width < 0.1:
+                break
+        ```
+        """
+        if method not in estimates.INTERVAL_METHODS:
+            raise exceptions.UnsupportedAction(f"Unknown interval method {method}")
+        if not report_every and not report_seconds:
+            raise exceptions.UnsupportedAction(
+                "Either report_every or report_seconds is needed"
+            )
+
+        # Iterations between clock checks, sized by the measured speed when
+        # reporting by time
+        chunk = 1 if report_seconds else report_every
+
+        start = time.perf_counter()
+        last_report = start
         successful_runs = 0
-        for _ in range(0, iteration_count):
-            if test_func(**kwargs):
-                successful_runs += 1
+        iterations = 0
+        unreported = 0
+        while True:
+            count = chunk
+            if report_every:
+                count = min(count, report_every - unreported)
+            if iteration_count is not None:
+                count = min(count, iteration_count - iterations)
+            successful_runs += ProbabilityTest._count_successes(
+                test_func, count, kwargs, result_sequence=result_sequence
+            )
+            iterations += count
+            unreported += count
+
+            now = time.perf_counter()
+            if report_seconds and now > start:
+                chunk = max(
+                    1,
+                    int(
+                        iterations
+                        / (now - start)
+                        * report_seconds
+                        / CLOCK_CHECKS_PER_REPORT
+                    ),
+                )
+            if (
+                (report_every and unreported >= report_every)
+                or (report_seconds and now - last_report >= report_seconds)
+                or iterations == iteration_count
+            ):
+                last_report = now
+                unreported = 0
+                yield estimates.ProbabilityResult.from_counts(
+                    successful_runs,
+                    iterations,
+                    confidence=confidence,
+                    method=method,
+                    elapsed=now - start,
+                )
+            if iterations == iteration_count:
+                return
+
+    @staticmethod
+    def run_multi_probability_test(
+        deal_func,
+        predicates,
+        iteration_count=20000,
+        confidence=0.95,
+        method="wilson",
+        seed=None,
+        **kwargs,
+    ):
+        """
+        Ask several questions about the same deals: every iteration calls
+        `deal_func` once and evaluates all `predicates` on its result, so the
+        deals are simulated once instead of once per question (common random
+        numbers), and the answers can be compared.
+        :param deal_func: <function> returns a deal, e.g. a list of cards or
+            `lan.execute`
+        :param predicates: <dict> name -> <function> deal -> bool, or the
+            number of a `Language` sequence returning the Bool
+        :param iteration_count: <int> how many deals?
+        :param confidence: <float> confidence level of the intervals
+        :param method: <str> "wilson" or "clopper_pearson"
+        :param seed: <int> seed to make the run reproducible, the state of
+            the global `random` generator is restored after the run
+        :return: <MultiProbabilityResult>
+
+        Example usage:
+        ```
+        result = ProbabilityTest.run_multi_probability_test(
+            lambda: StandardDeck().pick_random_cards(5),
+            {"flush": is_flush, "straight": is_straight},
+        )
+        print(result["flush"].estimate, result.correlation["flush", "straight"])
+        ```
+        """
+        if method not in estimates.INTERVAL_METHODS:
+            raise exceptions.UnsupportedAction(f"Unknown interval method {method}")
+
+        names = list(predicates)
+        checks = [
+            (
+                (lambda deal, sequence=predicate: deal[sequence])
+                if isinstance(predicate, int)
+                else predicate
+            )
+            for predicate in predicates.values()
+        ]
+        start = time.perf_counter()
+        outcomes = Counter()
+        state = None
+        if seed is not None:
+            # The decks draw from the global generator, it is seeded for the
+            # run and put back afterwards
+            state = random.getstate()
+            random.seed(seed)
+        try:
+            for _ in range(0, iteration_count):
+                deal = deal_func(**kwargs)
+                outcomes[tuple(bool(check(deal)) for check in checks)] += 1
+        finally:
+            if state is not None:
+                random.setstate(state)
+
+        joint_counts = [[0] * len(names) for _ in names]
+        for outcome, occurrences in outcomes.items():
+            for i, first in enumerate(outcome):
+                if first:
+                    for j, second in enumerate(outcome):
+                        if second:
+                            joint_counts[i][j] += occurrences
+        return estimates.MultiProbabilityResult.from_counts(
+            names,
+            joint_counts,
+            iteration_count,
+            confidence=confidence,
+            method=method,
+            elapsed=time.perf_counter() - start,
+        )
+
+    @staticmethod
+    def run_batch_multi_probability_test(
+        predicates,
+        deck,
+        number_of_cards,
+        iteration_count=1000000,
+        confidence=0.95,
+        method="wilson",
+        block_size=None,
+        rng=None,
+    ):
+        """
+        `run_multi_probability_test` over whole blocks of hands at once, see
+        `run_batch_probability_test`
+        :param predicates: <dict> name -> <function> DealtCards -> bool per hand
+        :param deck: <StandardDeck> deck class or instance to deal from
+        :param number_of_cards: <int> How many cards are dealt to each hand?
+        :param iteration_count: <int> how many hands?
+        :param confidence: <float> confidence level of the intervals
+        :param method: <str> "wilson" or "clopper_pearson"
+        :param block_size: <int> hands per block, see `batch.get_block_size`
+        :param rng: <np.random.Generator> or a seed
+        :return: <MultiProbabilityResult>
+        """
+        import numpy as np
+
+        from .batch import deal_blocks
+
+        if method not in estimates.INTERVAL_METHODS:
+            raise exceptions.UnsupportedAction(f"Unknown interval method {method}")
+
+        start = time.perf_counter()
+        names = list(predicates)
+        joint_counts = np.zeros((len(names), len(names)), dtype=np.int64)
+        for hands in deal_blocks(
+            deck, number_of_cards, iteration_count, block_size=block_size, rng=rng
+        ):
+            answers = np.column_stack(
+                [np.asarray(predicates[name](hands), dtype=bool) for name in names]
+            ).astype(np.int64)
+            joint_counts += answers.T @ answers
+        return estimates.MultiProbabilityResult.from_counts(
+            names,
+            joint_counts.tolist(),
+            iteration_count,
+            confidence=confidence,
+            method=method,
+            elapsed=time.perf_counter() - start,
+        )
+
+    @staticmethod
+    def run_importance_sampling_test(
+        test_func, deck, number_of_cards, weights, iteration_count=20000, **kwargs
+    ):
+        """
+        Probability of a rare event of a deal, drawing the cards it needs more
+        often and correcting for it, see `sampling.importance_sampling`
+        :param test_func: <function> list of cards -> bool
+        :param deck: <StandardDeck> deck class or instance to deal from
+        :param number_of_cards: <int> How many cards are dealt?
+        :param weights: <dict> group of cards -> how much more often to draw it
+        :param iteration_count: <int> how many iterations?
+        :return: <WeightedProbabilityResult>
+
+        Example usage:
+        ```
+        # No black card in 14 cards of a canasta deck, ~0.004%
+        result = ProbabilityTest.run_importance_sampling_test(
+            lambda cards: all(card.colour != COLOUR_BLACK for card in cards),
+            JokerDeck, 14, weights={COLOUR_BLACK: 0.1},
+        )
+        ```
+        """
+        from . import sampling
+
+        return sampling.importance_sampling(
+            test_func,
+            deck,
+            number_of_cards,
+            weights,
+            iteration_count=iteration_count,
+            **kwargs,
+        )
+
+    @staticmethod
+    def run_stratified_probability_test(
+        test_func, deck, number_of_cards, iteration_count=20000, **kwargs
+    ):
+        """
+        Probability of an event of a deal, sampling every possible number of
+        cards per group separately, see `sampling.stratified_sampling`
+        :param test_func: <function> list of cards -> bool
+        :param deck: <StandardDeck> deck class or instance to deal from
+        :param number_of_cards: <int> How many cards are dealt?
+        :param iteration_count: <int> how many iterations?
+        :return: <WeightedProbabilityResult>
+        """
+        from . import sampling
+
+        return sampling.stratified_sampling(
+            test_func, deck, number_of_cards, iteration_count=iteration_count, **kwargs
+        )
+
+    @staticmethod
+    def run_batch_probability_test(
+        test_func,
+        deck,
+        number_of_cards,
+        iteration_count=20000,
+        block_size=None,
+        rng=None,
+        **kwargs,
+    ):
+        """
+        Vectorized version of `run_probability_test`. Instead of one deal per
+        call, test_func gets a whole block of hands dealt from independent
+        decks and returns a bool array with one item per hand. Blocks are
+        sized so they fit `batch.MAX_BLOCK_CARDS`.
+        :param test_func: <function> (DealtCards, **kwargs) -> bool array
+        :param deck: <StandardDeck> deck class or instance to deal from
+        :param number_of_cards: <int> how many cards in a hand?
+        :param iteration_count: <int> how many iterations?
+        :param block_size: <int> how many hands per block?
+        :param rng: <np.random.Generator> or a seed
+        :return: <float> Percentage of chance of test happening
+
+        Example usage:
+        ```
+        def test_func(hands):
+            return batch.is_flush(hands)
+
+        result = ProbabilityTest.run_batch_probability_test(
+            test_func, StandardDeck, number_of_cards=5
+        )
+        ```
+        """
+        import numpy as np
+
+        from .batch import deal_blocks
+
+        successful_runs = 0
+        for hands in deal_blocks(
+            deck, number_of_cards, iteration_count, block_size=block_size, rng=rng
+        ):
+            successful_runs += int(np.count_nonzero(test_func(hands, **kwargs)))
         return ProbabilityTest._get_percentage(successful_runs, iteration_count)
 
 
@@ -297,3 +1065,49 @@ class EmptyDeck(StandardDeck):
     NUMBER_OF_NON_JOKER_CARDS = 0
     EACH_NON_JOKER_CARD_OCCURS = 0
     NUMBER_OF_JOKERS = 0
+
+
+class DeckView(EmptyDeck):
+    """
+    Deck over an existing list of cards, e.g. cards picked by a `Language`
+    sequence. The list isn't copied until the deck is changed (copy-on-write),
+    so the list the view was created from is never changed by the deck's own
+    methods. Changing `cards` directly changes the original list.
+    """
+
+    _shared_cards = None
+
+    def __init__(self, cards: list):
+        self._cards = cards
+        self._shared_cards = cards
+
+    def _own_cards(self) -> None:
+        """
+        Copy the shared list before it is changed
+        """
+        if self._cards is self._shared_cards:
+            cards = list(self._cards)
+            if self._counted_cards is self._cards:
+                self._counted_cards = cards
+            self._cards = cards
+            self._shared_cards = None
+
+    def shuffle(self) -> None:
+        self._own_cards()
+        super().shuffle()
+
+    def pick_random_cards(
+        self, number_of_cards: int, preserve_order: bool = False
+    ) -> list[Card]:
+        self._own_cards()
+        return super().pick_random_cards(number_of_cards, preserve_order)
+
+    def pick_card(self, card: Card) -> Card:
+        self._own_cards()
+        return super().pick_card(card)
+
+    def insert_cards(
+        self, cards: Iterable[Card], force: bool = False, random_positions: bool = False
+    ) -> None:
+        self._own_cards()
+        super().insert_cards(cards, force=force, random_positions=random_positions)
@@ -0,0 +1,156 @@
+import importlib
+import multiprocessing
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from typing import Callable, Optional, Union
+
+from . import exceptions
+
+# Runs smaller than this (per worker) are not worth starting processes for
+MIN_ITERATIONS_PER_WORKER = 1000
+# Iterations are always split into this many shards, whatever the number of
+# workers, so a seed gives the same result on any machine. There are more
+# shards than workers, so a slow shard doesn't leave the other workers idle.
+SHARD_COUNT = 64
+
+# Tasks that can't be pickled (closures, lambdas) are handed to forked workers
+# through this registry instead, workers inherit it from the parent process
+_INHERITED_TASKS = {}
+_inherited_task_ids = count()
+
+
+class _InheritedTask(object):
+    def __init__(self, task_id: int):
+        self.task_id = task_id
+
+
+def resolve_function(path: str) -> Callable:
+    """
+    Import a function from a "package.module:qualified.name" path
+    :param path: <str>
+    :return: <function>
+    """
+    module_name, _, qualified_name = path.partition(":")
+    if not qualified_name:
+        raise exceptions.BadSource(
+            f"`{path}` is not a path in `module:function` format"
+        )
+    obj = importlib.import_module(module_name)
+    for attribute in qualified_name.split("."):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+def get_shard_seeds(seed: Optional[int], shard_count: int) -> list:
+    """
+    Derive an independent seed for every shard from the master `seed`
+    :param seed: <int> master seed, random one if None
+    :param shard_count: <int>
+    :return: <int[]>
+    """
+    master = random.Random(seed)
+    return [master.getrandbits(64) for _ in range(shard_count)]
+
+
+def split_iterations(iteration_count: int, shard_count: int) -> list:
+    """
+    Split `iteration_count` into `shard_count` nearly equal parts
+    :param iteration_count: <int>
+    :param shard_count: <int>
+    :return: <int[]>
+    """
+    size, remainder = divmod(iteration_count, shard_count)
+    return [size + 1 if idx < remainder else size for idx in range(shard_count)]
+
+
+def run_shard(task, iteration_count: int, seed: Optional[int]) -> int:
+    """
+    Run `iteration_count` iterations of a task and count the successful ones.
+    Seeds the global `random` generator, as that's what the decks use.
+    :param task: (test_func, result_sequence, kwargs) or its `_InheritedTask`
+    :param iteration_count: <int>
+    :param seed: <int>
+    :return: <int> number of successful iterations
+    """
+    if isinstance(task, _InheritedTask):
+        task = _INHERITED_TASKS[task.task_id]
+    test_func, result_sequence, kwargs = task
+    if isinstance(test_func, str):
+        test_func = resolve_function(test_func)
+    if seed is not None:
+        random.seed(seed)
+
+    successful_runs = 0
+    for _ in range(0, iteration_count):
+        result = test_func(**kwargs)
+        if result_sequence is not None:
+            result = result[result_sequence]
+        if result:
+            successful_runs += 1
+    return successful_runs
+
+
+def count_successes(
+    test_func: Union[Callable, str],
+    iteration_count: int,
+    kwargs: dict,
+    result_sequence: Optional[int] = None,
+    workers: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> int:
+    """
+    Run test_func `iteration_count` times, sharded across a pool of `workers`
+    processes, and count the successful runs.
+
+    The iterations are split into `SHARD_COUNT` shards, each with its own
+    seed derived from `seed`, so a run is reproducible for the same seed
+    whatever the number of workers. Runs too small to benefit from processes
+    execute the same shards in this process.
+
+    test_func can be a function or a "module:function" import path. Functions
+    that can't be pickled (closures, lambdas) are only supported where worker
+    processes are forked.
+
+    :param test_func: <function> or <str> import path
+    :param iteration_count: <int>
+    :param kwargs: <dict> arguments for test_func
+    :param result_sequence: <int> index into the result of test_func to check
+    :param workers: <int> number of processes, None runs in this process
+    :param seed: <int> master seed
+    :return: <int> number of successful iterations
+    """
+    workers = workers or 1
+    shards = zip(
+        split_iterations(iteration_count, SHARD_COUNT),
+        get_shard_seeds(seed, SHARD_COUNT),
+    )
+    task = (test_func, result_sequence, kwargs)
+
+    if workers == 1 or iteration_count < workers * MIN_ITERATIONS_PER_WORKER:
+        return sum(run_shard(task, size, shard_seed) for size, shard_seed in shards)
+
+    context = None
+    try:
+        pickle.dumps(task)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise exceptions.UnsupportedAction(
+                "test_func can't be pickled, pass it as a `module:function` path"
+            )
+        context = multiprocessing.get_context("fork")
+        task_id = next(_inherited_task_ids)
+        _INHERITED_TASKS[task_id] = task
+        task = _InheritedTask(task_id)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(run_shard, task, size, shard_seed)
+                for size, shard_seed in shards
+            ]
+            return sum(future.result() for future in futures)
+    finally:
+        if isinstance(task, _InheritedTask):
+            del _INHERITED_TASKS[task.task_id]
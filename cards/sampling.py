@@ -0,0 +1,226 @@
+"""
+Variance reduction for deals from a deck: importance sampling and stratified
+sampling. Cards are grouped by a key (see `exact.by_colour` etc.), which is
+what the sampling is biased or stratified by.
+"""
+import random
+import time
+from collections import defaultdict
+from math import comb
+from typing import Callable, Optional, Union
+
+from . import exceptions
+from .estimates import WeightedProbabilityResult
+from .exact import _iter_hands, by_colour
+from .models import StandardDeck
+
+
+def _group_cards(deck: Union[StandardDeck, type], key: Callable) -> dict:
+    """
+    :param deck: <StandardDeck> deck class or a deck instance in its current state
+    :param key: <function> Card -> group
+    :return: <dict> group -> cards of the group
+    """
+    cards = deck._get_template().cards if isinstance(deck, type) else deck._cards
+    groups = defaultdict(list)
+    for card in cards:
+        groups[key(card)].append(card)
+    return dict(groups)
+
+
+def _allocate_samples(ways: list, iteration_count: int, min_samples: int) -> list:
+    """
+    Split `iteration_count` between strata, `min_samples` each and the rest in
+    proportion to their number of hands
+    :param ways: <int[]> number of hands of every stratum
+    :param iteration_count: <int>
+    :param min_samples: <int>
+    :return: <int[]> iterations of every stratum, adding up to `iteration_count`
+    """
+    if min_samples < 1:
+        raise exceptions.UnsupportedAction("Every stratum needs a sample")
+    if len(ways) * min_samples > iteration_count:
+        raise exceptions.UnsupportedAction(
+            f"{len(ways)} strata need at least {len(ways) * min_samples} "
+            "iterations, raise iteration_count or lower min_samples"
+        )
+    spare = iteration_count - len(ways) * min_samples
+    hands = sum(ways)
+    shares = [divmod(spare * stratum_ways, hands) for stratum_ways in ways]
+    samples = [min_samples + share for share, _ in shares]
+    # Hand what rounding down left over to the largest remainders
+    leftover = iteration_count - sum(samples)
+    by_remainder = sorted(range(len(ways)), key=lambda idx: -shares[idx][1])
+    for idx in by_remainder[:leftover]:
+        samples[idx] += 1
+    return samples
+
+
+def importance_sampling(
+    test_func: Callable,
+    deck: Union[StandardDeck, type],
+    number_of_cards: int,
+    weights: dict,
+    key: Callable = by_colour,
+    iteration_count: int = 20000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> WeightedProbabilityResult:
+    """
+    Estimate the probability that `number_of_cards` cards drawn from the deck
+    satisfy `test_func`, drawing cards of some groups more often.
+
+    Every draw picks a group with probability proportional to its weight times
+    the number of its cards left, then a uniformly random card of the group.
+    Each hand is weighted by its likelihood ratio (the real probability of the
+    draws over the biased one), so the estimate is unbiased for any weights.
+    Weights that make the event common give the lowest variance.
+
+    :param test_func: <function> list of cards (in drawing order) -> bool
+    :param deck: <StandardDeck> deck class or a deck instance in its current state
+    :param number_of_cards: <int> How many cards are drawn?
+    :param weights: <dict> group -> weight, groups not listed weigh 1
+    :param key: <function> Card -> group, e.g. `exact.by_joker`
+    :param iteration_count: <int> how many hands?
+    :param confidence: <float> confidence level of the interval
+    :param seed: <int> seed to make the run reproducible
+    :return: <WeightedProbabilityResult>
+
+    Example usage:
+    ```
+    # At least 2 jokers in 3 cards, jokers drawn 20 times more often
+    result = importance_sampling(
+        lambda cards: sum(card.is_joker for card in cards) >= 2,
+        JokerDeck, 3, weights={True: 20}, key=exact.by_joker,
+    )
+    ```
+    """
+    start = time.perf_counter()
+    groups = _group_cards(deck, key)
+    if number_of_cards > sum(len(cards) for cards in groups.values()):
+        raise exceptions.NotEnoughCardsException()
+    group_weights = {group: weights.get(group, 1) for group in groups}
+    if any(weight <= 0 for weight in group_weights.values()):
+        raise exceptions.UnsupportedAction("Weights must be positive")
+
+    rng = random.Random(seed)
+    total = 0.0
+    total_squares = 0.0
+    for _ in range(iteration_count):
+        remaining = {group: len(cards) for group, cards in groups.items()}
+        cards_left = sum(remaining.values())
+        ratio = 1.0
+        drawn_groups = []
+        for _ in range(number_of_cards):
+            weighted_left = sum(
+                group_weights[group] * left for group, left in remaining.items()
+            )
+            point = rng.random() * weighted_left
+            for group, left in remaining.items():
+                if left:
+                    # The last group with cards left, in case of rounding errors
+                    chosen = group
+                    point -= group_weights[group] * left
+                    if point < 0:
+                        break
+            ratio *= weighted_left / (group_weights[chosen] * cards_left)
+            remaining[chosen] -= 1
+            cards_left -= 1
+            drawn_groups.append(chosen)
+
+        picked = {
+            group: rng.sample(groups[group], len(groups[group]) - left)
+            for group, left in remaining.items()
+            if left < len(groups[group])
+        }
+        hand = [picked[group].pop() for group in drawn_groups]
+        if test_func(hand):
+            total += ratio
+            total_squares += ratio * ratio
+
+    mean = total / iteration_count
+    variance = 0.0
+    if iteration_count > 1:
+        variance = (total_squares / iteration_count - mean * mean) / (
+            iteration_count - 1
+        )
+    return WeightedProbabilityResult.from_estimate(
+        mean,
+        max(0.0, variance),
+        iteration_count,
+        confidence=confidence,
+        elapsed=time.perf_counter() - start,
+    )
+
+
+def stratified_sampling(
+    test_func: Callable,
+    deck: Union[StandardDeck, type],
+    number_of_cards: int,
+    key: Callable = by_colour,
+    iteration_count: int = 20000,
+    min_samples: int = 10,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> WeightedProbabilityResult:
+    """
+    Estimate the probability that `number_of_cards` cards drawn from the deck
+    satisfy `test_func`, sampling each possible number of cards per group
+    (stratum) separately.
+
+    The probability of every stratum is known exactly (see `exact.probability`),
+    so only the chance of the event within a stratum is simulated. Every
+    stratum gets `min_samples` iterations, so rare strata are never left out,
+    and the rest of the budget is split in proportion to their probability.
+    When the event depends only on the number of cards per group the estimate
+    is exact.
+
+    :param test_func: <function> list of cards (in random order) -> bool
+    :param deck: <StandardDeck> deck class or a deck instance in its current state
+    :param number_of_cards: <int> How many cards are drawn?
+    :param key: <function> Card -> group, e.g. `exact.by_colour`
+    :param iteration_count: <int> iteration budget, shared by the strata
+    :param min_samples: <int> least iterations of a stratum, the budget must
+        cover it for every stratum
+    :param confidence: <float> confidence level of the interval
+    :param seed: <int> seed to make the run reproducible
+    :return: <WeightedProbabilityResult>
+    """
+    start = time.perf_counter()
+    groups = _group_cards(deck, key)
+    names = list(groups)
+    sizes = [len(groups[group]) for group in names]
+    total_cards = sum(sizes)
+    if number_of_cards > total_cards:
+        raise exceptions.NotEnoughCardsException()
+
+    rng = random.Random(seed)
+    hands = comb(total_cards, number_of_cards)
+    strata = list(_iter_hands(sizes, number_of_cards))
+    allocation = _allocate_samples(
+        [ways for _, ways in strata], iteration_count, min_samples
+    )
+    estimate = 0.0
+    variance = 0.0
+    for (counts, ways), samples in zip(strata, allocation):
+        weight = ways / hands
+        successes = 0
+        for _ in range(samples):
+            hand = []
+            for group, count in zip(names, counts):
+                if count:
+                    hand += rng.sample(groups[group], count)
+            rng.shuffle(hand)
+            if test_func(hand):
+                successes += 1
+        probability = successes / samples
+        estimate += weight * probability
+        variance += weight * weight * probability * (1 - probability) / samples
+
+    return WeightedProbabilityResult.from_estimate(
+        estimate,
+        variance,
+        iteration_count,
+        confidence=confidence,
+        elapsed=time.perf_counter() - start,
+    )
@@ -0,0 +1,452 @@
+"""
+Corpus of probability questions with known exact answers, used to track the
+speed and the accuracy of the simulation engines, see `run_scenarios`.
+"""
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from fractions import Fraction
+from functools import partial
+from math import comb
+from typing import Callable, Iterable, Optional
+
+from . import batch
+from . import constants
+from .language import Language
+from .models import Card, EmptyDeck, Joker, JokerDeck, ProbabilityTest, StandardDeck
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    A probability question with its exact answer. It can be asked as a
+    Python `test_func`, as `Language` sequences and / or as a batch predicate
+    (`predicate`, deck class, number of cards), engines skip the forms they
+    don't support.
+    """
+
+    name: str
+    question: str
+    reference: Fraction
+    test_func: Optional[Callable] = None
+    sequences: Optional[list] = None
+    result_sequence: Optional[int] = None
+    batch_test: Optional[tuple] = None
+
+
+@dataclass(frozen=True)
+class ScenarioResult:
+    """
+    Outcome of one scenario run by one engine, `estimate` and `reference` are
+    percentages
+    """
+
+    scenario: str
+    engine: str
+    iterations: int
+    estimate: float
+    reference: float
+    elapsed: float
+
+    @property
+    def iterations_per_second(self) -> float:
+        return self.iterations / self.elapsed if self.elapsed else math.inf
+
+    @property
+    def error(self) -> float:
+        """
+        Absolute error in percentage points
+        """
+        return abs(self.estimate - self.reference)
+
+    @property
+    def z_score(self) -> float:
+        """
+        Error in standard errors of the estimate, values above ~3 are suspect
+        """
+        p = self.reference / 100
+        standard_error = math.sqrt(p * (1 - p) / self.iterations) * 100
+        if standard_error == 0:
+            return 0.0 if self.error == 0 else math.inf
+        return self.error / standard_error
+
+    def as_dict(self) -> dict:
+        return {
+            "scenario": self.scenario,
+            "engine": self.engine,
+            "iterations": self.iterations,
+            "estimate": self.estimate,
+            "reference": self.reference,
+            "elapsed": self.elapsed,
+            "iterations_per_second": self.iterations_per_second,
+            "error": self.error,
+            "z_score": self.z_score,
+        }
+
+
+def _high_card() -> bool:
+    deck = StandardDeck()
+    for card in deck.pick_random_cards(5):
+        # 1 is Ace
+        if card.value in [1, 10, 11, 12, 13]:
+            return True
+    return False
+
+
+def _same_card_turned_up() -> bool:
+    deck1 = StandardDeck()
+    deck2 = StandardDeck()
+    deck1.shuffle()
+    deck2.shuffle()
+    return any(card1 == card2 for card1, card2 in zip(deck1.cards, deck2.cards))
+
+
+def _red_card() -> bool:
+    return StandardDeck().pick_random_card().colour == constants.COLOUR_RED
+
+
+def _joker_cut(jokers_wanted: int) -> Callable:
+    def joker_cut() -> bool:
+        cards = JokerDeck().pick_random_cards(3)
+        return sum(card.is_joker for card in cards) >= jokers_wanted
+
+    return joker_cut
+
+
+def _monty_hall_switch() -> bool:
+    deck = EmptyDeck()
+    goat = Card(12, constants.SUIT_HEARTS)
+    deck.insert_cards([Joker(), goat, goat], force=True)
+    cards = deck.pick_random_cards(3)
+    # The host opens a goat door, switching wins unless the first choice won
+    return not cards[0].is_joker
+
+
+def _no_black_card() -> bool:
+    cards = JokerDeck().pick_random_cards(14)
+    return all(card.colour != constants.COLOUR_BLACK for card in cards)
+
+
+def _flush() -> bool:
+    cards = StandardDeck().pick_random_cards(5)
+    return all(card.suit == cards[0].suit for card in cards)
+
+
+def _straight() -> bool:
+    values = sorted(card.value for card in StandardDeck().pick_random_cards(5))
+    return all(value - 1 == values[idx] for idx, value in enumerate(values[1:]))
+
+
+def _ace_of_hearts() -> bool:
+    return StandardDeck().pick_random_card() == Card(1, constants.SUIT_HEARTS)
+
+
+def _spade_and_heart() -> bool:
+    suits = {card.suit for card in StandardDeck().pick_random_cards(2)}
+    return suits == {constants.SUIT_SPADES, constants.SUIT_HEARTS}
+
+
+def _redraw_to_flush() -> bool:
+    deck = StandardDeck()
+    suit_count = defaultdict(int)
+    for card in deck.pick_random_cards(5):
+        suit_count[card.suit] += 1
+    suit, count = max(suit_count.items(), key=lambda item: item[1])
+    if count < 3:
+        return False
+    return all(card.suit == suit for card in deck.pick_random_cards(5 - count))
+
+
+def _three_of_a_kind() -> bool:
+    value_count = defaultdict(int)
+    for card in StandardDeck().pick_random_cards(5):
+        value_count[card.value] += 1
+    return 3 in value_count.values()
+
+
+def _same_top_cards_after_shuffle() -> bool:
+    deck = StandardDeck()
+    deck.shuffle()
+    top_cards = deck.cards[:3]
+    deck.shuffle()
+    return deck.cards[:3] == top_cards
+
+
+def _at_least_one_match_probability(number_of_cards: int) -> Fraction:
+    # 1 - derangements / permutations = sum of (-1)^(k+1) / k!
+    return sum(
+        Fraction((-1) ** (k + 1), math.factorial(k))
+        for k in range(1, number_of_cards + 1)
+    )
+
+
+def _redraw_to_flush_probability() -> Fraction:
+    probability = Fraction(0)
+    for count in range(3, 6):
+        hands = 4 * comb(13, count) * comb(39, 5 - count)
+        redraws = Fraction(comb(13 - count, 5 - count), comb(47, 5 - count))
+        probability += Fraction(hands, comb(52, 5)) * redraws
+    return probability
+
+
+def _pick_and_match(deck_type: str, count: int, command: str, meta: dict) -> list:
+    return [
+        {"command": "init_deck", "meta": {"deck_type": deck_type}},
+        {"command": "pick_random_cards", "meta": {"count": count, "from_sequence": 1}},
+        {"command": command, "meta": dict(meta, from_sequence=2)},
+    ]
+
+
+def _get_scenarios() -> list:
+    high_values = [1, 10, 11, 12, 13]
+    hands = comb(52, 5)
+    return [
+        Scenario(
+            "high_card",
+            "At least one ace or picture card in 5 cards",
+            1 - Fraction(comb(32, 5), hands),
+            test_func=_high_card,
+            sequences=_pick_and_match(
+                "standard_deck",
+                5,
+                "any_match",
+                {"conditions": [{"type": "values", "values": high_values}]},
+            ),
+            result_sequence=3,
+        ),
+        Scenario(
+            "same_card_turned_up",
+            "Two shuffled decks show the same card at the same position",
+            _at_least_one_match_probability(52),
+            test_func=_same_card_turned_up,
+        ),
+        Scenario(
+            "red_card",
+            "A red card",
+            Fraction(1, 2),
+            test_func=_red_card,
+            sequences=_pick_and_match(
+                "standard_deck",
+                1,
+                "any_match",
+                {"conditions": [{"type": "colours", "values": ["red"]}]},
+            ),
+            result_sequence=3,
+        ),
+        Scenario(
+            "joker_cut",
+            "At least one joker in 3 cards of a canasta deck",
+            1 - Fraction(comb(104, 3), comb(108, 3)),
+            test_func=_joker_cut(1),
+            sequences=_pick_and_match(
+                "canasta_deck",
+                3,
+                "any_match",
+                {"conditions": [{"type": "values", "values": ["*"]}]},
+            ),
+            result_sequence=3,
+        ),
+        Scenario(
+            "two_jokers_cut",
+            "At least two jokers in 3 cards of a canasta deck",
+            Fraction(comb(4, 2) * 104 + comb(4, 3), comb(108, 3)),
+            test_func=_joker_cut(2),
+            sequences=_pick_and_match(
+                "canasta_deck",
+                3,
+                "any_match",
+                {
+                    "conditions": [{"type": "values", "values": ["*"]}],
+                    "matches_required": 2,
+                },
+            ),
+            result_sequence=3,
+        ),
+        Scenario(
+            "monty_hall_switch",
+            "Switching wins the 3 card Monty Hall game",
+            Fraction(2, 3),
+            test_func=_monty_hall_switch,
+        ),
+        Scenario(
+            "no_black_card",
+            "No black card in 14 cards of a canasta deck",
+            Fraction(comb(56, 14), comb(108, 14)),
+            test_func=_no_black_card,
+            sequences=_pick_and_match(
+                "canasta_deck",
+                14,
+                "any_match",
+                {
+                    "conditions": [{"type": "colours", "values": ["red", "*"]}],
+                    "matches_required": 14,
+                },
+            ),
+            result_sequence=3,
+        ),
+        Scenario(
+            "flush",
+            "5 cards of the same suit, straight flushes included",
+            Fraction(4 * comb(13, 5), hands),
+            test_func=_flush,
+            batch_test=(batch.is_flush, StandardDeck, 5),
+        ),
+        Scenario(
+            "straight",
+            "5 cards of consecutive values, ace is low",
+            Fraction(9 * 4**5, hands),
+            test_func=_straight,
+            batch_test=(batch.is_straight, StandardDeck, 5),
+        ),
+        Scenario(
+            "ace_of_hearts",
+            "The ace of hearts",
+            Fraction(1, 52),
+            test_func=_ace_of_hearts,
+            sequences=_pick_and_match(
+                "standard_deck",
+                1,
+                "any_match",
+                {
+                    "conditions": [
+                        {
+                            "type": "specific_cards",
+                            "values": [{"value": 1, "suit": "hearts"}],
+                        }
+                    ]
+                },
+            ),
+            result_sequence=3,
+        ),
+        Scenario(
+            "spade_and_heart",
+            "One spade and one heart in 2 cards",
+            Fraction(2 * 13 * 13, 52 * 51),
+            test_func=_spade_and_heart,
+            sequences=_pick_and_match(
+                "standard_deck",
+                2,
+                "all_match",
+                {"conditions": [{"type": "suits", "values": ["spades", "hearts"]}]},
+            ),
+            result_sequence=3,
+        ),
+        Scenario(
+            "redraw_to_flush",
+            "At least 3 of a suit in 5 cards, then redrawing the rest to a flush",
+            _redraw_to_flush_probability(),
+            test_func=_redraw_to_flush,
+        ),
+        Scenario(
+            "three_of_a_kind",
+            "Exactly 3 cards of a value in 5 cards, full houses included",
+            Fraction(13 * 4 * comb(48, 2), hands),
+            test_func=_three_of_a_kind,
+            batch_test=(partial(batch.is_n_of_a_kind, n=3), StandardDeck, 5),
+        ),
+        Scenario(
+            "same_top_cards_after_shuffle",
+            "The same 3 top cards after shuffling the deck again",
+            Fraction(1, 52 * 51 * 50),
+            test_func=_same_top_cards_after_shuffle,
+        ),
+    ]
+
+
+def _run_python(scenario: Scenario, iteration_count: int, seed: Optional[int]):
+    if scenario.test_func is None:
+        return None
+    return ProbabilityTest.run_probability_test(
+        scenario.test_func, iteration_count=iteration_count, seed=seed
+    )
+
+
+def _run_language(backend: str) -> Callable:
+    def run_language(scenario: Scenario, iteration_count: int, seed: Optional[int]):
+        if scenario.sequences is None:
+            return None
+        lan = Language(sequences=scenario.sequences)
+        return ProbabilityTest.run_language_probability_test(
+            lan.execute,
+            scenario.result_sequence,
+            iteration_count=iteration_count,
+            seed=seed,
+            backend=backend,
+        )
+
+    return run_language
+
+
+def _run_batch(scenario: Scenario, iteration_count: int, seed: Optional[int]):
+    if scenario.batch_test is None:
+        return None
+    predicate, deck, number_of_cards = scenario.batch_test
+    return ProbabilityTest.run_batch_probability_test(
+        predicate, deck, number_of_cards, iteration_count=iteration_count, rng=seed
+    )
+
+
+# Engine name -> function(scenario, iteration_count, seed) returning the
+# estimate in percent, or None if the engine can't ask the scenario
+ENGINES = {
+    "python": _run_python,
+    "language": _run_language("scalar"),
+    "language_batch": _run_language("batch"),
+    "batch": _run_batch,
+}
+
+SCENARIOS = _get_scenarios()
+
+
+def run_scenarios(
+    scenarios: Iterable[Scenario] = None,
+    engines: Iterable[str] = None,
+    iteration_count: int = 20000,
+    seed: Optional[int] = None,
+) -> list:
+    """
+    Ask every scenario with every engine that supports it
+    :param scenarios: <Scenario[]> `SCENARIOS` if None
+    :param engines: <str[]> names of `ENGINES`, all of them if None
+    :param iteration_count: <int> iterations of each run
+    :param seed: <int> seed to make the runs reproducible
+    :return: <ScenarioResult[]>
+    """
+    results = []
+    for scenario in SCENARIOS if scenarios is None else scenarios:
+        for engine in ENGINES if engines is None else engines:
+            start = time.perf_counter()
+            estimate = ENGINES[engine](scenario, iteration_count, seed)
+            elapsed = time.perf_counter() - start
+            if estimate is None:
+                continue
+            results.append(
+                ScenarioResult(
+                    scenario=scenario.name,
+                    engine=engine,
+                    iterations=iteration_count,
+                    estimate=estimate,
+                    reference=float(scenario.reference) * 100,
+                    elapsed=elapsed,
+                )
+            )
+    return results
+
+
+def format_report(results: Iterable[ScenarioResult]) -> str:
+    """
+    :param results: <ScenarioResult[]>
+    :return: <str> one line per result
+    """
+    lines = [
+        f"{'scenario':30} {'engine':15} {'reference %':>12} {'estimate %':>12} "
+        f"{'error':>8} {'z':>6} {'it/s':>12}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.scenario:30} {result.engine:15} {result.reference:12.4f} "
+            f"{result.estimate:12.4f} {result.error:8.4f} {result.z_score:6.2f} "
+            f"{result.iterations_per_second:12.0f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,177 @@
+import json
+import random
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+
+class StepStats(object):
+    """
+    Timings of one sequence of a program. Latencies are kept in a fixed size
+    random sample, so percentiles of long runs are estimates.
+    """
+
+    def __init__(self, sequence: int, command: str, max_samples: int):
+        self.sequence = sequence
+        self.command = command
+        self._max_samples = max_samples
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.allocated_blocks = 0
+        self.samples = []
+        # Own generator, tracing must not change seeded runs
+        self._random = random.Random(self.sequence)
+
+    def add(self, seconds: float, allocated_blocks: int = 0) -> None:
+        self.calls += 1
+        self.total_seconds += seconds
+        self.allocated_blocks += allocated_blocks
+        if len(self.samples) < self._max_samples:
+            self.samples.append(seconds)
+        else:
+            idx = self._random.randrange(self.calls)
+            if idx < self._max_samples:
+                self.samples[idx] = seconds
+
+    def percentile(self, percent: float) -> float:
+        """
+        :param percent: <float> e.g. 99
+        :return: <float> seconds
+        """
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        idx = round(percent / 100 * (len(samples) - 1))
+        return samples[idx]
+
+    def as_dict(self) -> dict:
+        return {
+            "sequence": self.sequence,
+            "command": self.command,
+            "calls": self.calls,
+            "total_seconds": self.total_seconds,
+            "mean_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "p50_seconds": self.percentile(50),
+            "p90_seconds": self.percentile(90),
+            "p99_seconds": self.percentile(99),
+            "allocated_blocks": self.allocated_blocks,
+        }
+
+
+class StepTracer(object):
+    """
+    Records how many times each step of a `Language` program ran and how
+    long it took, aggregated over every execution it traces. Nothing is
+    recorded (and nothing slows down) unless the program has a tracer. Steps
+    run in worker processes aren't recorded; the batch backend records one
+    call per block of iterations.
+
+    With `track_allocations` the net number of memory blocks each step leaves
+    allocated is counted as well, see `sys.getallocatedblocks`.
+
+    Example usage:
+    ```
+    lan.tracer = StepTracer()
+    ProbabilityTest.run_language_probability_test(lan.execute, result_sequence=3)
+    lan.tracer.save_report("trace.json")
+    ```
+    """
+
+    def __init__(self, track_allocations: bool = False, max_samples: int = 10000):
+        """
+        :param track_allocations: <bool> count memory blocks allocated by steps
+        :param max_samples: <int> latencies kept per step for the percentiles
+        """
+        self.track_allocations = track_allocations
+        self.max_samples = max_samples
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get_stats(self, sequence: int, command: str) -> StepStats:
+        key = (sequence, command)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(
+                    key, StepStats(sequence, command, self.max_samples)
+                )
+        return stats
+
+    def record(
+        self, sequence: int, command: str, seconds: float, allocated_blocks: int = 0
+    ) -> None:
+        """
+        Add one run of a step
+        """
+        stats = self.get_stats(sequence, command)
+        with self._lock:
+            stats.add(seconds, allocated_blocks)
+
+    def wrap(self, step) -> Callable:
+        """
+        Wrap the `run` function of a compiled step so every call is recorded
+        :param step: <CompiledStep>
+        :return: <function> results -> result
+        """
+        run = step.run
+        stats = self.get_stats(step.sequence, step.command)
+        lock = self._lock
+        perf_counter = time.perf_counter
+
+        if self.track_allocations:
+            get_allocated_blocks = sys.getallocatedblocks
+
+            def traced_run(results):
+                blocks = get_allocated_blocks()
+                start = perf_counter()
+                result = run(results)
+                seconds = perf_counter() - start
+                blocks = get_allocated_blocks() - blocks
+                with lock:
+                    stats.add(seconds, blocks)
+                return result
+
+        else:
+
+            def traced_run(results):
+                start = perf_counter()
+                result = run(results)
+                seconds = perf_counter() - start
+                with lock:
+                    stats.add(seconds)
+                return result
+
+        return traced_run
+
+    def clear(self) -> None:
+        # Stats are reset in place, wrapped steps keep recording to them
+        with self._lock:
+            for stats in self._stats.values():
+                stats.reset()
+
+    def report(self) -> dict:
+        """
+        :return: <dict> stats of every traced step, in sequence order
+        """
+        with self._lock:
+            steps = [self._stats[key].as_dict() for key in sorted(self._stats)]
+        return {
+            "track_allocations": self.track_allocations,
+            "total_seconds": sum(step["total_seconds"] for step in steps),
+            "steps": steps,
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.report(), indent=indent)
+
+    def save_report(self, path: str) -> None:
+        """
+        Write the report to a JSON file
+        :param path: <str>
+        """
+        with open(path, "w") as report_file:
+            report_file.write(self.to_json())
@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ..cards import constants
+from ..cards.aio import AsyncProbabilityRunner
+from ..cards.exceptions import UnsupportedAction
+from ..cards.language import Language
+from ..cards.models import ProbabilityTest, StandardDeck
+
+
+def pick_red_card():
+    deck = StandardDeck()
+    return deck.pick_random_card().colour == constants.COLOUR_RED
+
+
+def test_async_probability_test():
+    async def run():
+        async with AsyncProbabilityRunner(max_workers=2, chunk_size=500) as runner:
+            return await runner.run_probability_test(
+                pick_red_card, iteration_count=4000
+            )
+
+    assert 45 < asyncio.run(run()) < 55
+
+
+def test_async_probability_test_with_arguments():
+    async def run():
+        async with AsyncProbabilityRunner(max_workers=2, chunk_size=10) as runner:
+            return await runner.run_probability_test(
+                lambda argument: argument, iteration_count=25, argument=True
+            )
+
+    assert asyncio.run(run()) == 100
+
+
+def test_async_language_probability_test():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 1}},
+            {
+                "command": "any_match",
+                "meta": {
+                    "conditions": [{"type": "colours", "values": ["red"]}],
+                    "from_sequence": 2,
+                },
+            },
+        ]
+    )
+
+    async def run():
+        async with AsyncProbabilityRunner(max_workers=2) as runner:
+            return await runner.run_language_probability_test(
+                lan.execute, result_sequence=3, iteration_count=4000
+            )
+
+    assert 45 < asyncio.run(run()) < 55
+
+
+def test_async_seeded_probability_test():
+    async def run():
+        async with AsyncProbabilityRunner(
+            max_workers=2, processes=True, chunk_size=1000
+        ) as runner:
+            path = "{}:pick_red_card".format(__name__)
+            return [
+                await runner.run_probability_test(path, iteration_count=3000, seed=7)
+                for _ in range(2)
+            ]
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert 45 < first < 55
+    # The same as the other runners with this seed
+    assert first == ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=3000, seed=7
+    )
+
+    async def run_with_other_chunks():
+        async with AsyncProbabilityRunner(
+            max_workers=1, processes=True, chunk_size=50
+        ) as runner:
+            path = "{}:pick_red_card".format(__name__)
+            return await runner.run_probability_test(path, iteration_count=3000, seed=7)
+
+    assert asyncio.run(run_with_other_chunks()) == first
+
+
+def test_async_seeded_probability_test_needs_processes():
+    async def run():
+        async with AsyncProbabilityRunner(max_workers=1) as runner:
+            await runner.run_probability_test(pick_red_card, seed=1)
+
+    with pytest.raises(UnsupportedAction):
+        asyncio.run(run())
+
+
+def test_async_probability_test_timeout():
+    calls = []
+
+    def test_func():
+        calls.append(1)
+        time.sleep(0.001)
+        return True
+
+    async def run():
+        async with AsyncProbabilityRunner(max_workers=1, chunk_size=10) as runner:
+            with pytest.raises(asyncio.TimeoutError):
+                await runner.run_probability_test(
+                    test_func, iteration_count=100000, timeout=0.05
+                )
+            await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    # No chunks are submitted after the timeout
+    assert len(calls) < 1000
+
+
+def test_async_probability_tests_share_the_pool_fairly():
+    finished = []
+    lock = threading.Lock()
+
+    def slow_test():
+        time.sleep(0.001)
+        return True
+
+    async def run_test(runner, name, iteration_count):
+        await runner.run_probability_test(slow_test, iteration_count=iteration_count)
+        with lock:
+            finished.append(name)
+
+    async def run():
+        async with AsyncProbabilityRunner(max_workers=1, chunk_size=10) as runner:
+            big = asyncio.ensure_future(run_test(runner, "big", 500))
+            await asyncio.sleep(0.02)
+            await run_test(runner, "small", 20)
+            await big
+
+    asyncio.run(run())
+    # The small test doesn't wait for the big one started before it
+    assert finished == ["small", "big"]
+
+
+def test_async_seeded_language_probability_test():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 2}},
+            {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 1}},
+            {
+                "command": "any_match",
+                "meta": {
+                    "conditions": [{"type": "colours", "values": ["red"]}],
+                    "from_sequence": 4,
+                },
+            },
+        ]
+    )
+
+    async def run():
+        async with AsyncProbabilityRunner(max_workers=2, processes=True) as runner:
+            return await runner.run_language_probability_test(
+                lan.execute, result_sequence=5, iteration_count=2000, seed=3
+            )
+
+    assert asyncio.run(run()) == ProbabilityTest.run_language_probability_test(
+        lan.execute, result_sequence=5, iteration_count=2000, seed=3
+    )
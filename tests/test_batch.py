@@ -0,0 +1,178 @@
+import random
+
+import numpy as np
+import pytest
+
+from ..cards.batch import (
+    DeckBatch,
+    DealtCards,
+    is_flush,
+    is_straight,
+    is_n_of_a_kind,
+    count_colour,
+    SUIT_INDEXES,
+    COLOUR_INDEXES,
+    JOKER_VALUE_INDEX,
+)
+from ..cards.models import (
+    StandardDeck,
+    StandardDeckWithJokers,
+    JokerDeck,
+    EmptyDeck,
+    Card,
+    Joker,
+)
+from ..cards import constants
+from ..cards import exceptions
+
+
+def test_batch_from_deck_classes():
+    assert DeckBatch(StandardDeck, 10).codes.shape == (10, 52)
+    assert DeckBatch(StandardDeckWithJokers, 10).codes.shape == (10, 54)
+    assert DeckBatch(JokerDeck, 10).codes.shape == (10, 108)
+    assert DeckBatch(EmptyDeck, 10).codes.shape == (10, 0)
+
+
+def test_batch_from_deck_instance():
+    deck = EmptyDeck()
+    deck.insert_card(Joker(), force=True)
+    deck.insert_card(Card(12, constants.SUIT_HEARTS), force=True)
+    deck.insert_card(Card(12, constants.SUIT_HEARTS), force=True)
+
+    batch = DeckBatch(deck, 4)
+    assert batch.number_of_cards == 3
+    assert batch.deal(3).to_cards() == [deck.cards] * 4
+
+
+def test_batch_with_unknown_card():
+    deck = EmptyDeck()
+    deck.insert_card(Card(33, constants.SUIT_SPADES), force=True)
+    with pytest.raises(exceptions.IncorrectDeckException):
+        DeckBatch(deck, 4)
+
+
+def test_batch_shuffle():
+    batch = DeckBatch(StandardDeck, 1000, rng=1)
+    batch.shuffle()
+
+    # Every deck still has all the cards...
+    assert (np.sort(batch.codes, axis=1) == np.arange(52)).all()
+    # ...and the decks are shuffled independently
+    assert len(set(map(tuple, batch.codes[:, :5].tolist()))) > 990
+
+
+def test_batch_pick_random_cards():
+    batch = DeckBatch(StandardDeck, 5000, rng=2)
+    picked = batch.pick_random_cards(5)
+
+    assert picked.codes.shape == (5000, 5)
+    assert batch.number_of_cards == 47
+    all_cards = np.concatenate([picked.codes, batch.codes], axis=1)
+    assert (np.sort(all_cards, axis=1) == np.arange(52)).all()
+
+    # Each card should be the last picked one in roughly 1/52 of decks
+    counts = np.bincount(picked.codes[:, 4], minlength=52)
+    assert counts.min() > 50 and counts.max() < 150
+
+    with pytest.raises(exceptions.NotEnoughCardsException):
+        batch.pick_random_cards(48)
+
+
+class _ReplayedIndexes(object):
+    """
+    Stands in for the generator of a single deck batch, drawing the same
+    indexes as `random.randrange` would
+    """
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+    def integers(self, low, high, size):
+        return np.array([low + self.random.randrange(high - low)] * size)
+
+
+def test_batch_pick_random_cards_matches_deck(monkeypatch):
+    for seed in range(20):
+        batch = DeckBatch.from_codes(
+            np.tile(np.arange(52, dtype=np.int8), (1, 1)), rng=0
+        )
+        batch.rng = _ReplayedIndexes(seed)
+        picked = batch.pick_random_cards(7)
+
+        deck = StandardDeck()
+        monkeypatch.setattr(random, "randrange", random.Random(seed).randrange)
+        expected = deck.pick_random_cards(7)
+
+        assert picked.codes[0].tolist() == [card.code for card in expected]
+        # The cards left are in the same order too
+        assert batch.codes[0].tolist() == [card.code for card in deck.cards]
+
+
+def test_dealt_card_columns():
+    batch = DeckBatch(StandardDeckWithJokers, 3)
+    dealt = batch.deal(54)
+
+    for row, cards in zip(range(len(dealt)), dealt.to_cards()):
+        for column, card in enumerate(cards):
+            if card.is_joker:
+                assert dealt.is_joker[row, column]
+                assert dealt.values[row, column] == JOKER_VALUE_INDEX
+                continue
+            assert not dealt.is_joker[row, column]
+            assert dealt.values[row, column] == card.value
+            assert dealt.suits[row, column] == SUIT_INDEXES[card.suit]
+            assert dealt.colours[row, column] == COLOUR_INDEXES[card.colour]
+
+
+def _hands(*hands):
+    return DealtCards(np.array([[card.code for card in hand] for hand in hands]))
+
+
+def test_is_flush():
+    hands = _hands(
+        [Card(value, constants.SUIT_HEARTS) for value in [1, 3, 5, 7, 9]],
+        [Card(value, constants.SUIT_HEARTS) for value in [1, 3, 5, 7]]
+        + [Card(9, constants.SUIT_SPADES)],
+        [Card(value, constants.SUIT_HEARTS) for value in [1, 3, 5, 7]] + [Joker()],
+    )
+    assert is_flush(hands).tolist() == [True, False, False]
+
+
+def test_is_straight():
+    hands = _hands(
+        [Card(value, constants.SUIT_HEARTS) for value in [3, 1, 2, 5, 4]],
+        [Card(value, constants.SUIT_CLUBS) for value in [9, 10, 11, 12, 13]],
+        [Card(value, constants.SUIT_CLUBS) for value in [10, 11, 12, 13, 1]],
+        [Card(value, constants.SUIT_CLUBS) for value in [2, 3, 4, 5]] + [Joker()],
+    )
+    assert is_straight(hands).tolist() == [True, True, False, False]
+
+
+def test_is_n_of_a_kind():
+    hands = _hands(
+        [
+            Card(5, constants.SUIT_HEARTS),
+            Card(5, constants.SUIT_CLUBS),
+            Card(5, constants.SUIT_SPADES),
+            Card(1, constants.SUIT_SPADES),
+            Card(2, constants.SUIT_SPADES),
+        ],
+        [
+            Card(5, constants.SUIT_HEARTS),
+            Card(5, constants.SUIT_CLUBS),
+            Card(1, constants.SUIT_SPADES),
+            Joker(),
+            Joker(),
+        ],
+    )
+    assert is_n_of_a_kind(hands, 3).tolist() == [True, False]
+    assert is_n_of_a_kind(hands, 2).tolist() == [False, True]
+
+
+def test_count_colour():
+    hands = _hands(
+        [Card(5, constants.SUIT_HEARTS), Card(5, constants.SUIT_DIAMONDS), Joker()],
+        [Card(5, constants.SUIT_SPADES), Card(5, constants.SUIT_DIAMONDS), Joker()],
+    )
+    assert count_colour(hands, constants.COLOUR_RED).tolist() == [2, 1]
+    assert count_colour(hands, constants.COLOUR_BLACK).tolist() == [0, 1]
@@ -0,0 +1,319 @@
+import numpy as np
+import pytest
+
+from ..cards.batch_language import BatchExecutor, BatchStorage, count_successes
+from ..cards.exceptions import (
+    CardIsNotInTheDeck,
+    DeckFullException,
+    UnsupportedAction,
+)
+from ..cards.language import LIST, Language
+from ..cards.models import JOKER_CODE, Card, ProbabilityTest
+
+ACE_OF_SPADES = {"value": 1, "suit": "spades"}
+
+
+def _red_card_program():
+    return Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 1}},
+        ]
+    )
+
+
+def test_execute_shapes():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "canasta_deck"}},
+            {"command": "shuffle", "meta": {"sequence": 1}},
+            {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 2}},
+        ]
+    )
+    results = BatchExecutor(lan, rng=1).execute(result_sequence=3, size=20)
+    assert results[3].codes.shape == (20, 5)
+    assert set(results) == {3}
+
+
+def test_picked_cards_leave_the_deck():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 1}},
+            {"command": "shuffle", "meta": {"sequence": 1}},
+        ]
+    )
+    executor = BatchExecutor(lan, rng=2)
+    results = executor.execute(result_sequence=3, size=10)
+    # Sequence 2 isn't needed for the result anymore, but it emptied the deck
+    deck = results[3].codes
+    assert deck.shape == (10, 47)
+
+    results = BatchExecutor(lan, rng=2).execute(result_sequence=2, size=10)
+    assert results[2].codes.shape == (10, 5)
+
+
+def test_pick_specific_cards():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {
+                "command": "pick_specific_cards",
+                "meta": {"cards": [ACE_OF_SPADES], "from_sequence": 1},
+            },
+            {"command": "shuffle", "meta": {"sequence": 1}},
+        ]
+    )
+    executor = BatchExecutor(lan, rng=3)
+    results = executor.execute(result_sequence=3, size=4)
+    ace = Card(value=1, suit="spades").code
+    assert results[3].codes.shape == (4, 51)
+    assert not (results[3].codes == ace).any()
+
+    results = executor.execute(result_sequence=2, size=4)
+    assert (results[2].codes == ace).all()
+
+
+def test_pick_specific_card_not_in_the_deck():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {
+                "command": "pick_specific_cards",
+                "meta": {"cards": [ACE_OF_SPADES, ACE_OF_SPADES], "from_sequence": 1},
+            },
+        ]
+    )
+    with pytest.raises(CardIsNotInTheDeck):
+        BatchExecutor(lan).execute(result_sequence=2, size=4)
+
+
+def test_run_list_result_is_truthiness():
+    lan = _red_card_program()
+    assert BatchExecutor(lan).run(result_sequence=2, size=7).tolist() == [True] * 7
+    assert BatchExecutor(lan).run(result_sequence=1, size=3).all()
+
+
+def test_execute_is_reproducible():
+    lan = _red_card_program()
+    first = BatchExecutor(lan, rng=5).execute(result_sequence=2, size=50)
+    second = BatchExecutor(lan, rng=5).execute(result_sequence=2, size=50)
+    assert (first[2].codes == second[2].codes).all()
+
+
+def test_picked_cards_are_uniform():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 1}},
+        ]
+    )
+    picked = BatchExecutor(lan, rng=6).execute(result_sequence=2, size=40000)[2]
+    # Chance of the ace of spades in 5 cards is 5/52, ~9.6%
+    ace = Card(value=1, suit="spades").code
+    assert 9 < (picked.codes == ace).any(axis=1).mean() * 100 < 10.3
+
+
+def test_count_successes():
+    lan = _red_card_program()
+    assert count_successes(lan, 2, 1000, rng=5, block_size=64) == 1000
+    assert count_successes(lan.compile(), 2, 10) == 10
+
+
+def test_batch_backend_matches_scalar():
+    lan = _red_card_program()
+    for backend in ("scalar", "batch"):
+        result = ProbabilityTest.run_language_probability_test(
+            lan.execute, result_sequence=2, iteration_count=100, backend=backend
+        )
+        assert result == 100
+
+
+def test_batch_backend_leaves_the_deck_like_scalar():
+    # The ace of spades stays on top unless one of 5 picks takes it or the
+    # last card of the deck, which then takes its place
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 1}},
+            {
+                "command": "order_match",
+                "meta": {
+                    "conditions": [
+                        {"type": "specific_cards", "values": [ACE_OF_SPADES]}
+                    ],
+                    "from_sequence": 1,
+                },
+            },
+        ]
+    )
+    results = [
+        ProbabilityTest.run_language_probability_test(
+            lan.execute,
+            result_sequence=3,
+            iteration_count=20000,
+            seed=4,
+            backend=backend,
+        )
+        for backend in ("scalar", "batch")
+    ]
+    for result in results:
+        assert 88.5 < result < 92
+    assert abs(results[0] - results[1]) < 1.5
+
+
+def test_unknown_backend():
+    with pytest.raises(UnsupportedAction):
+        ProbabilityTest.run_language_probability_test(
+            _red_card_program().execute, result_sequence=2, backend="gpu"
+        )
+    with pytest.raises(UnsupportedAction):
+        ProbabilityTest.run_language_probability_test(
+            lambda: [True], result_sequence=0, backend="batch"
+        )
+
+
+def test_block_codes_dtype():
+    results = BatchExecutor(_red_card_program(), rng=0).execute(2, size=3)
+    assert results[2].codes.dtype == np.int8
+
+
+def test_insert_specific_cards():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {
+                "command": "pick_specific_cards",
+                "meta": {"cards": [ACE_OF_SPADES], "from_sequence": 1},
+            },
+            {
+                "command": "insert_specific_cards",
+                "meta": {"cards": [ACE_OF_SPADES], "to_sequence": 1},
+            },
+        ]
+    )
+    deck = BatchExecutor(lan).execute(result_sequence=3, size=4)[3]
+    assert deck.codes.shape == (4, 52)
+    assert (deck.codes[:, -1] == Card(value=1, suit="spades").code).all()
+
+    lan.sequences.append(lan.sequences[-1])
+    with pytest.raises(DeckFullException):
+        BatchExecutor(lan).execute(result_sequence=4, size=4)
+    lan.sequences[-1] = {
+        "command": "insert_specific_cards",
+        "meta": {"cards": [ACE_OF_SPADES], "to_sequence": 2},
+    }
+    # The picked list becomes an empty deck, which takes forced cards only
+    with pytest.raises(DeckFullException):
+        BatchExecutor(lan).execute(result_sequence=4, size=4)
+
+
+def test_insert_cards_at_random_positions():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {
+                "command": "insert_specific_cards",
+                "meta": {
+                    "cards": [{"value": "*", "suit": "*"}],
+                    "to_sequence": 1,
+                    "force": True,
+                    "random_positions": True,
+                },
+            },
+        ]
+    )
+    deck = BatchExecutor(lan, rng=7).execute(result_sequence=2, size=4000)[2]
+    assert deck.codes.shape == (4000, 53)
+    # The joker is at a uniformly random position of the 53 cards
+    positions = np.argmax(deck.codes == JOKER_CODE, axis=1)
+    assert 24 < positions.mean() < 28
+    assert positions.min() == 0 and positions.max() == 52
+
+
+def test_insert_random_cards():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "init_deck", "meta": {"deck_type": "empty_deck"}},
+            {
+                "command": "insert_random_cards",
+                "meta": {"count": 3, "from_sequence": 1, "to_sequence": 2},
+            },
+        ]
+    )
+    with pytest.raises(DeckFullException):
+        BatchExecutor(lan).execute(result_sequence=3, size=10)
+
+    lan.sequences[-1]["meta"]["force"] = True
+    results = BatchExecutor(lan, rng=8).execute(result_sequence=3, size=10)
+    assert results[3].codes.shape == (10, 3)
+    results = BatchExecutor(lan, rng=8).execute(result_sequence=1, size=10)
+    assert results[1].codes.shape == (10, 49)
+
+
+def _hand_program(command, conditions, count=3, **meta):
+    return Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {
+                "command": "pick_random_cards",
+                "meta": {"count": count, "from_sequence": 1},
+            },
+            {
+                "command": command,
+                "meta": dict(meta, conditions=conditions, from_sequence=2),
+            },
+        ]
+    )
+
+
+def test_match_commands_agree_with_scalar():
+    hearts = {"type": "suits", "values": ["hearts"]}
+    diamonds = {"type": "suits", "values": ["diamonds"]}
+    programs = [
+        _hand_program("any_match", [{"type": "values", "values": [1]}], count=5),
+        _hand_program(
+            "all_match",
+            [
+                {"type": "suits", "values": ["hearts", "diamonds", "clubs"]},
+                {"type": "colours", "values": ["red", "black", "red"]},
+            ],
+        ),
+        _hand_program("order_match", [hearts, diamonds], count=2),
+        _hand_program("any_match", [hearts, diamonds], matches_required=3),
+    ]
+    for lan in programs:
+        matched = BatchExecutor(lan, rng=9).run(result_sequence=3, size=2000)
+        assert matched.dtype == bool
+
+        # Replay the same rows through the scalar matcher
+        codes = BatchExecutor(lan, rng=9).execute(result_sequence=2, size=2000)[2].codes
+        match = lan.compile().steps[2].run
+        expected = [match({2: [Card.from_code(code) for code in row]}) for row in codes]
+        assert matched.tolist() == expected
+
+
+def test_match_probability():
+    lan = _hand_program(
+        "any_match",
+        [{"type": "specific_cards", "values": [ACE_OF_SPADES]}],
+        count=5,
+    )
+    # Chance of the ace of spades in 5 cards is 5/52, ~9.6%
+    result = ProbabilityTest.run_language_probability_test(
+        lan.execute, result_sequence=3, iteration_count=40000, backend="batch"
+    )
+    assert 9 < result < 10.3
+
+
+def test_picking_from_a_list_keeps_the_list():
+    executor = BatchExecutor(_red_card_program(), rng=10)
+    cards = BatchStorage(LIST, np.tile(np.arange(10, dtype=np.int8), (50, 1)))
+    original = cards.codes.copy()
+
+    picked = executor.batch_pick_random_cards(50, cards, 4, from_sequence=1)
+    shuffled = executor.batch_shuffle(50, cards, sequence=1)
+    assert picked.codes.shape == (50, 4)
+    assert shuffled.codes.shape == (50, 10)
+    assert (cards.codes == original).all()
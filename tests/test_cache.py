@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ..cards.cache import ResultCache
+from ..cards.exceptions import UnsupportedAction
+from ..cards.language import Language
+from ..cards.models import ProbabilityTest
+
+
+@pytest.fixture
+def red_card_program():
+    return Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 1}},
+        ]
+    )
+
+
+def test_make_key_is_canonical():
+    key = ResultCache.make_key([{"command": "shuffle", "meta": {"sequence": 1}}], 1)
+    assert key == ResultCache.make_key(
+        [{"meta": {"sequence": 1}, "command": "shuffle"}], 1
+    )
+    assert key != ResultCache.make_key(
+        [{"command": "shuffle", "meta": {"sequence": 1}}], 1, seed=1
+    )
+    assert key != ResultCache.make_key(
+        [{"command": "shuffle", "meta": {"sequence": 1}}], 2
+    )
+
+
+def test_cached_language_probability_test(red_card_program):
+    cache = ResultCache(":memory:")
+    result = ProbabilityTest.run_language_probability_test(
+        red_card_program.execute, result_sequence=2, iteration_count=100, cache=cache
+    )
+    assert result == 100
+    assert cache.stats == {"hits": 0, "misses": 1, "merges": 0}
+
+    # Same or fewer iterations are served from the cache
+    for iteration_count in [100, 50]:
+        ProbabilityTest.run_language_probability_test(
+            red_card_program.execute,
+            result_sequence=2,
+            iteration_count=iteration_count,
+            cache=cache,
+        )
+    assert cache.stats == {"hits": 2, "misses": 1, "merges": 0}
+
+    # More iterations only run the missing ones
+    ProbabilityTest.run_language_probability_test(
+        red_card_program.execute, result_sequence=2, iteration_count=300, cache=cache
+    )
+    assert cache.stats == {"hits": 2, "misses": 1, "merges": 1}
+    key = ResultCache.make_key(red_card_program.sequences, 2)
+    assert cache.get(key) == (300, 300)
+
+
+def test_cache_is_persistent(tmp_path, red_card_program):
+    path = str(tmp_path / "results.sqlite3")
+    ProbabilityTest.run_language_probability_test(
+        red_card_program.execute,
+        result_sequence=2,
+        iteration_count=100,
+        cache=ResultCache(path),
+    )
+
+    cache = ResultCache(path)
+    ProbabilityTest.run_language_probability_test(
+        red_card_program.execute,
+        result_sequence=2,
+        iteration_count=100,
+        cache=cache,
+    )
+    assert cache.stats["hits"] == 1
+
+
+def test_cache_eviction():
+    cache = ResultCache(":memory:", max_entries=2)
+    cache.add("a", 1, 1)
+    cache.add("b", 1, 1)
+    cache.get("a")
+    cache.add("c", 1, 1)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == (1, 1)
+
+
+def test_only_language_programs_are_cached():
+    with pytest.raises(UnsupportedAction):
+        ProbabilityTest.run_language_probability_test(
+            lambda: {1: True}, result_sequence=1, cache=ResultCache(":memory:")
+        )
+
+
+def test_cache_can_be_shared_by_threads(red_card_program):
+    cache = ResultCache(":memory:")
+
+    def run(seed):
+        return cache.run_language_probability_test(
+            red_card_program.execute,
+            result_sequence=2,
+            iteration_count=200,
+            seed=seed,
+        )
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(run, range(8)))
+    assert len(cache) == 8
+    assert results == [run(seed) for seed in range(8)]
+    assert cache.stats["hits"] == 8
+
+
+def test_same_question_from_threads_is_counted_once(red_card_program):
+    cache = ResultCache(":memory:")
+
+    def run(_):
+        return cache.run_language_probability_test(
+            red_card_program.execute, result_sequence=2, iteration_count=500, seed=1
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(run, range(8)))
+    assert len(set(results)) == 1
+    key = ResultCache.make_key(red_card_program.sequences, 2, 1)
+    assert cache.get(key) == (500, 500)
+    assert cache.stats == {"hits": 7, "misses": 1, "merges": 0}
+    assert cache._key_locks == {}
+
+
+def test_make_key_rejects_arguments_that_are_not_json():
+    with pytest.raises(UnsupportedAction):
+        ResultCache.make_key([], 1, kwargs={"func": lambda: True})
@@ -1,5 +1,16 @@
 # -*- coding: utf-8 -*-
-from ..cards.models import Card, Joker
+import copy
+import pickle
+
+import pytest
+
+from ..cards.models import (
+    Card,
+    Joker,
+    StandardDeckWithJokers,
+    NUMBER_OF_CARD_CODES,
+    JOKER_CODE,
+)
 from ..cards import constants
 
 
@@ -63,3 +74,39 @@ def test_joker_card_with_joker():
 def test_joker_card_with_joker_card():
     card = Card(value=constants.JOKER_VALUE, suit=constants.JOKER_SUIT)
     assert card.is_joker
+
+
+def test_cards_are_interned():
+    assert Card(3, constants.SUIT_SPADES) is Card(3, constants.SUIT_SPADES)
+    assert Card(value=constants.JOKER_VALUE, suit=constants.JOKER_SUIT) is Joker()
+    assert Card(3, constants.SUIT_SPADES) is not Card(3, constants.SUIT_HEARTS)
+
+
+def test_card_codes():
+    codes = [card.code for card in StandardDeckWithJokers().cards]
+    assert sorted(set(codes)) == list(range(NUMBER_OF_CARD_CODES))
+    assert Joker().code == JOKER_CODE
+    for code in range(NUMBER_OF_CARD_CODES):
+        assert Card.from_code(code).code == code
+
+
+def test_card_outside_of_deck():
+    card = Card(33, constants.SUIT_SPADES)
+    assert card.code is None
+    assert not card.is_joker
+    assert card.colour == constants.COLOUR_BLACK
+    assert card == Card(33, constants.SUIT_SPADES)
+    assert card != Card(3, constants.SUIT_SPADES)
+
+
+def test_card_is_immutable():
+    card = Card(3, constants.SUIT_SPADES)
+    with pytest.raises(AttributeError):
+        card.value = 4
+
+
+def test_card_copy_and_pickle_keep_interning():
+    card = Card(12, constants.SUIT_HEARTS)
+    assert copy.deepcopy(card) is card
+    assert pickle.loads(pickle.dumps(card)) is card
+    assert pickle.loads(pickle.dumps(Joker())) is Joker()
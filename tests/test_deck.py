@@ -1,9 +1,22 @@
+from collections import defaultdict
+
 import pytest
 
-from ..cards.models import StandardDeck, Card, StandardDeckWithJokers, Joker
+from ..cards.models import (
+    StandardDeck,
+    Card,
+    StandardDeckWithJokers,
+    Joker,
+    JokerDeck,
+    DeckView,
+)
 
 from ..cards import constants
+from ..cards import exact
 from ..cards import exceptions
+from ..cards.batch import get_deck_codes
+from ..cards.language import Language
+from ..cards.sampling import _group_cards
 
 
 def test_shuffle_deck():
@@ -169,6 +182,41 @@ def test_insert_existing_card():
     assert not deck.is_valid_deck
 
 
+def test_insert_cards():
+    deck = StandardDeck()
+    picked_cards = deck.pick_random_cards(5)
+
+    # Nothing is inserted if one of the cards can't be
+    with pytest.raises(exceptions.IncorrectDeckException):
+        deck.insert_cards(picked_cards[:4] + [picked_cards[0]])
+    assert len(deck.cards) == 47
+    with pytest.raises(exceptions.DeckFullException):
+        deck.insert_cards(picked_cards + [Joker()])
+    assert len(deck.cards) == 47
+
+    deck.insert_cards(picked_cards)
+    assert deck.cards[-5:] == picked_cards
+    assert deck.is_valid_deck
+
+    deck.insert_cards([Joker()] * 3, force=True)
+    assert deck.card_occurrence_count(Joker()) == 3
+
+
+def test_insert_cards_at_random_positions():
+    positions = defaultdict(int)
+    ace_of_spades = Card(1, constants.SUIT_SPADES)
+    for _ in range(2000):
+        deck = StandardDeck()
+        deck.pick_card(ace_of_spades)
+        deck.insert_cards([ace_of_spades], random_positions=True)
+        positions[deck.cards.index(ace_of_spades) // 13] += 1
+        assert deck.is_valid_deck
+
+    # Every quarter of the deck gets ~500 aces
+    assert all(400 < count < 600 for count in positions.values())
+    assert len(positions) == 4
+
+
 def test_insert_existing_card_joker_deck():
     deck = StandardDeckWithJokers()
     # Pick 1 joker
@@ -241,3 +289,144 @@ def test_is_valid_deck_with_jokers():
 
     deck.insert_card(picked_card, force=True)
     assert not deck.is_valid_deck
+
+
+def test_pick_random_cards_preserve_order():
+    deck = StandardDeck()
+    picked_cards = deck.pick_random_cards(10, preserve_order=True)
+
+    assert len(picked_cards) == 10
+    assert len(deck.cards) == StandardDeck.NUMBER_OF_NON_JOKER_CARDS - 10
+    expected = [card for card in StandardDeck().cards if card not in picked_cards]
+    assert deck.cards == expected
+
+
+def test_pick_random_cards_keeps_all_cards():
+    deck = StandardDeck()
+    picked_cards = deck.pick_random_cards(20)
+    picked_cards += deck.pick_random_cards(32)
+
+    assert deck.cards == []
+    assert len(set(picked_cards)) == StandardDeck.NUMBER_OF_NON_JOKER_CARDS
+
+
+def test_pick_random_cards_is_uniform():
+    # Every card should be picked roughly 1/52 of the time, at any position
+    picks = defaultdict(int)
+    sample_size = 5200
+    for _ in range(sample_size):
+        deck = StandardDeck()
+        picks[deck.pick_random_cards(3)[2]] += 1
+
+    assert len(picks) == StandardDeck.NUMBER_OF_NON_JOKER_CARDS
+    for count in picks.values():
+        assert 50 < count < 160
+
+
+def test_card_occurrence_count_follows_deck_operations():
+    deck = StandardDeckWithJokers()
+    assert 2 == deck.card_occurrence_count(Joker())
+
+    picked_cards = deck.pick_random_cards(30)
+    picked_cards += deck.pick_random_cards(10, preserve_order=True)
+    for card in StandardDeckWithJokers().cards:
+        assert deck.card_occurrence_count(card) == deck.cards.count(card)
+
+    for card in picked_cards:
+        deck.insert_card(card)
+    assert deck.is_valid_deck
+
+
+def test_card_occurrence_count_after_direct_changes():
+    deck = StandardDeck()
+    card = Card(1, constants.SUIT_SPADES)
+
+    deck.cards.append(card)
+    assert 2 == deck.card_occurrence_count(card)
+
+    deck.cards = [card]
+    assert 1 == deck.card_occurrence_count(card)
+    assert 0 == deck.card_occurrence_count(Card(2, constants.SUIT_SPADES))
+
+    deck = StandardDeck()
+    deck.cards[0] = Joker()
+    assert 1 == deck.card_occurrence_count(Joker())
+    assert not deck.is_valid_deck
+
+
+def test_reading_cards_internally_keeps_the_index():
+    deck = StandardDeck()
+    deck.pick_random_cards(5)
+    counts = deck._get_card_counts()
+
+    get_deck_codes(deck)
+    _group_cards(deck, exact.by_colour)
+    Language._get_cards(deck)
+    assert deck._get_card_counts() is counts
+
+
+def test_reset_uses_a_fresh_copy_of_the_template():
+    deck = JokerDeck()
+    deck.pick_random_cards(10)
+    deck.reset()
+
+    assert deck.is_valid_deck
+    assert len(deck.cards) == 108
+    assert deck.cards == JokerDeck().cards
+    assert deck.cards is not JokerDeck().cards
+
+
+def test_fork_deck():
+    deck = StandardDeck()
+    deck.insert_card(Joker(), force=True)
+    deck.shuffle()
+
+    forked_deck = deck.fork()
+    assert forked_deck.__class__ == StandardDeck
+    assert forked_deck.cards == deck.cards
+
+    forked_deck.pick_card(Joker())
+    assert 0 == forked_deck.card_occurrence_count(Joker())
+    assert 1 == deck.card_occurrence_count(Joker())
+    assert len(deck.cards) == 53
+
+
+def test_snapshot_and_restore_deck():
+    deck = StandardDeck()
+    deck.pick_card(Card(1, constants.SUIT_HEARTS))
+    snapshot = deck.snapshot()
+
+    deck.pick_random_cards(20)
+    deck.restore(snapshot)
+    assert len(deck.cards) == 51
+    assert 0 == deck.card_occurrence_count(Card(1, constants.SUIT_HEARTS))
+    assert 1 == deck.card_occurrence_count(Card(2, constants.SUIT_HEARTS))
+
+    # Snapshot can be restored again, it is not changed by the deck
+    deck.pick_random_cards(51)
+    deck.restore(snapshot)
+    assert len(deck.cards) == 51
+
+
+def test_deck_view_copies_on_write():
+    cards = StandardDeck().pick_random_cards(10)
+    original = list(cards)
+
+    view = DeckView(cards)
+    assert view.cards is cards
+    assert view.card_occurrence_count(original[0]) == 1
+
+    picked = view.pick_random_cards(3)
+    assert view.cards is not cards
+    assert cards == original
+    assert len(view.cards) == 7
+    assert view.card_occurrence_count(picked[0]) == 0
+
+    for change in (
+        lambda deck: deck.shuffle(),
+        lambda deck: deck.pick_card(original[0]),
+        lambda deck: deck.insert_card(original[0], force=True),
+    ):
+        view = DeckView(cards)
+        change(view)
+        assert cards == original
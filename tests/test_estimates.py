@@ -0,0 +1,43 @@
+import pytest
+
+from ..cards.estimates import (
+    ProbabilityResult,
+    wilson_interval,
+    clopper_pearson_interval,
+    regularized_beta,
+)
+
+
+def test_wilson_interval():
+    lower, upper = wilson_interval(5, 100, 0.95)
+    assert lower == pytest.approx(0.0215, abs=1e-4)
+    assert upper == pytest.approx(0.1118, abs=1e-4)
+    assert wilson_interval(0, 0, 0.95) == (0.0, 1.0)
+
+
+def test_clopper_pearson_interval():
+    lower, upper = clopper_pearson_interval(5, 100, 0.95)
+    assert lower == pytest.approx(0.0164, abs=1e-4)
+    assert upper == pytest.approx(0.1128, abs=1e-4)
+
+    assert clopper_pearson_interval(0, 100, 0.95)[0] == 0.0
+    assert clopper_pearson_interval(100, 100, 0.95)[1] == 1.0
+
+
+def test_regularized_beta():
+    # Beta(1, 1) is uniform, Beta(2, 1) has CDF x^2
+    assert regularized_beta(1, 1, 0.3) == pytest.approx(0.3)
+    assert regularized_beta(2, 1, 0.3) == pytest.approx(0.09)
+    assert regularized_beta(2, 1, 0) == 0.0
+    assert regularized_beta(2, 1, 1) == 1.0
+
+
+def test_probability_result():
+    result = ProbabilityResult.from_counts(25, 100, confidence=0.9)
+    assert result.estimate == 25
+    assert result.interval[0] < 25 < result.interval[1]
+    assert result.half_width == pytest.approx(
+        (result.interval[1] - result.interval[0]) / 2
+    )
+    # Higher confidence means wider interval
+    assert ProbabilityResult.from_counts(25, 100).half_width > result.half_width
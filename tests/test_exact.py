@@ -0,0 +1,61 @@
+from fractions import Fraction
+
+import pytest
+
+from ..cards import exact
+from ..cards.constants import COLOUR_RED, SUIT_SPADES, SUIT_HEARTS
+from ..cards.exceptions import NotEnoughCardsException
+from ..cards.models import StandardDeck, JokerDeck, EmptyDeck, Card, Joker
+
+
+def test_red_card():
+    assert exact.probability(
+        StandardDeck, 1, lambda drawn: drawn[COLOUR_RED] == 1
+    ) == Fraction(1, 2)
+
+
+def test_joker_cut():
+    def at_least_one_joker(drawn):
+        return drawn[True] >= 1
+
+    result = exact.probability(JokerDeck, 3, at_least_one_joker, key=exact.by_joker)
+    assert result == 1 - Fraction(104 * 103 * 102, 108 * 107 * 106)
+
+
+def test_one_spade_and_one_heart():
+    result = exact.probability(
+        StandardDeck,
+        2,
+        lambda drawn: drawn[SUIT_SPADES] == 1 and drawn[SUIT_HEARTS] == 1,
+        key=exact.by_suit,
+    )
+    assert float(result) == pytest.approx(0.1275, abs=1e-4)
+
+
+def test_all_red_in_joker_deck():
+    result = exact.probability(JokerDeck, 14, lambda drawn: drawn[COLOUR_RED] == 14)
+    assert float(result) == pytest.approx(1.3e-5, rel=0.05)
+
+
+def test_flush():
+    result = exact.probability(
+        StandardDeck, 5, lambda drawn: 5 in drawn.values(), key=exact.by_suit
+    )
+    assert result == Fraction(4 * 1287, 2598960)
+
+
+def test_deck_state():
+    deck = EmptyDeck()
+    deck.insert_card(Joker(), force=True)
+    deck.insert_card(Card(12, SUIT_HEARTS), force=True)
+    deck.insert_card(Card(12, SUIT_HEARTS), force=True)
+    assert exact.probability(
+        deck, 1, lambda drawn: drawn[True] == 1, key=exact.by_joker
+    ) == Fraction(1, 3)
+
+    deck = StandardDeck()
+    deck.pick_random_cards(3)
+    assert exact.probability(deck, 49, lambda drawn: True) == 1
+
+    with pytest.raises(NotEnoughCardsException):
+        exact.probability(deck, 50, lambda drawn: True)
@@ -12,6 +12,7 @@ from ..cards.models import (
     ProbabilityTest,
     Joker,
 )
+from ..cards import batch
 from ..cards import constants
 
 ITERATION_COUNT = 15000
@@ -118,13 +119,15 @@ def test_exploding_kittens_dying_in_the_first_round():
     amount of cards
     """
 
+    prepared_deck = StandardDeck()
+    # there are 40 + 20 cards roughly
+    king_of_spades = Card(13, constants.SUIT_SPADES)
+    # so lets fill the deck with fluff - king of spades
+    for x in range(60 - len(prepared_deck.cards)):
+        prepared_deck.insert_card(king_of_spades, force=True)
+
     def fn():
-        deck = StandardDeck()
-        # there are 40 + 20 cards roughly
-        king_of_spades = Card(13, constants.SUIT_SPADES)
-        # so lets fill the deck with fluff - king of spades
-        for x in range(60 - len(deck.cards)):
-            deck.insert_card(king_of_spades, force=True)
+        deck = prepared_deck.fork()
 
         defuse = Card(11, constants.SUIT_HEARTS)
         exploding_kitten = Card(12, constants.SUIT_HEARTS)
@@ -382,3 +385,27 @@ def test_probability_that_first_three_cards_of_shuffled_deck_are_the_same():
     print(
         "Probability of picking 3 cards being the same after shuffle {}%".format(result)
     )
+
+
+def test_poker_hands_with_batch_probability_test():
+    """
+    Same questions as the flush / straight / three of a kind tests above, asked
+    over a million hands at once
+    """
+    result = ProbabilityTest.run_batch_probability_test(
+        batch.is_flush, StandardDeck, 5, iteration_count=1000000
+    )
+    assert 0.18 < result < 0.22  # real result 0.198%
+    print("Probability of a flush in 5 card poker {}%".format(result))
+
+    result = ProbabilityTest.run_batch_probability_test(
+        batch.is_straight, StandardDeck, 5, iteration_count=1000000
+    )
+    assert 0.33 < result < 0.38  # real result 0.355% (Ace is low only)
+    print("Probability of a straight in poker {}%".format(result))
+
+    result = ProbabilityTest.run_batch_probability_test(
+        batch.is_n_of_a_kind, StandardDeck, 5, iteration_count=1000000, n=3
+    )
+    assert 2.15 < result < 2.35  # real result 2.257%, full houses count too
+    print("Probability of picking 3 of a kind is {}%".format(result))
@@ -1,12 +1,21 @@
+import pickle
+from collections import Counter
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from ..cards.exceptions import (
+    BadSource,
+    UnsupportedCommand,
     UnsupportedDeckType,
     NotEnoughCardsException,
     CardIsNotInTheDeck,
+    DeckFullException,
+    UnsupportedCondition,
 )
-from ..cards.language import Language
-from ..cards.models import StandardDeck, JokerDeck, Card
+from ..cards.language import Language, ExecutionContext
+from ..cards.models import StandardDeck, JokerDeck, Card, ProbabilityTest
 
 ITERATION_COUNT = 15000
 
@@ -259,3 +268,458 @@ def test_shuffle_sequence(standard_deck_sequence):
             third_card != third_card_2,
         ]
     )
+
+
+def test_picking_from_sequence_keeps_the_list(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 10, "from_sequence": 1}},
+        {"command": "pick_random_cards", "meta": {"count": 4, "from_sequence": 2}},
+        {"command": "shuffle", "meta": {"sequence": 2}},
+    ]
+    results = Language(sequences=sequences).execute()
+    assert len(results[2]) == 10
+    assert len(results[3]) == 4
+    assert set(results[3]) <= set(results[2])
+    assert Counter(results[4].cards) == Counter(results[2])
+
+
+def test_insert_specific_cards(standard_deck_sequence):
+    ace_of_spades = {"value": 1, "suit": "spades"}
+    sequences = standard_deck_sequence + [
+        {
+            "command": "pick_specific_cards",
+            "meta": {"cards": [ace_of_spades], "from_sequence": 1},
+        },
+        {
+            "command": "insert_specific_cards",
+            "meta": {"cards": [ace_of_spades], "to_sequence": 1},
+        },
+    ]
+    lan = Language(sequences=sequences)
+    results = lan.execute()
+    assert results[3] is results[1]
+    assert results[3].is_valid_deck
+    assert results[3].cards[-1] == Card(1, "spades")
+    # Inserting specific cards to the bottom is deterministic
+    assert lan.compile().prefix_length == 3
+
+    # The deck is full now
+    sequences.append(sequences[-1])
+    with pytest.raises(DeckFullException):
+        Language(sequences=sequences).execute()
+
+
+def test_insert_specific_cards_at_random_positions(standard_deck_sequence):
+    fluff = [{"value": 13, "suit": "spades"}] * 8
+    sequences = standard_deck_sequence + [
+        {
+            "command": "insert_specific_cards",
+            "meta": {
+                "cards": fluff,
+                "to_sequence": 1,
+                "force": True,
+                "random_positions": True,
+            },
+        },
+    ]
+    lan = Language(sequences=sequences)
+    assert not lan.compile().steps[1].deterministic
+    deck = lan.execute()[2]
+    assert len(deck.cards) == 60
+    assert deck.card_occurrence_count(Card(13, "spades")) == 9
+    assert deck.cards[-9:] != [Card(13, "spades")] * 9
+
+
+def test_insert_random_cards(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 1}},
+        {"command": "init_deck", "meta": {"deck_type": "empty_deck"}},
+        {
+            "command": "insert_random_cards",
+            "meta": {"count": 3, "from_sequence": 2, "to_sequence": 3, "force": True},
+        },
+        {
+            "command": "insert_random_cards",
+            "meta": {"count": 2, "from_sequence": 1, "to_sequence": 3, "force": True},
+        },
+    ]
+    results = Language(sequences=sequences).execute()
+    # Cards are copied from a list, but picked from a deck
+    assert len(results[2]) == 5
+    assert len(results[1].cards) == 45
+    assert results[5] is results[3]
+    assert len(results[5].cards) == 5
+    assert not set(results[5].cards) & set(results[1].cards)
+
+
+def test_compile_is_cached(standard_deck_sequence):
+    lan = Language(sequences=standard_deck_sequence)
+    plan = lan.compile()
+    assert lan.compile() is plan
+
+    # Changing the sequences invalidates the plan
+    standard_deck_sequence.append({"command": "shuffle", "meta": {"sequence": 1}})
+    assert lan.compile() is not plan
+    assert len(lan.compile().steps) == 2
+
+
+def test_compile_validates_sequences(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 2}}
+    ]
+    with pytest.raises(BadSource):
+        Language(sequences=sequences).compile()
+
+    sequences = standard_deck_sequence + [{"command": "fold", "meta": {}}]
+    with pytest.raises(UnsupportedCommand):
+        Language(sequences=sequences).compile()
+
+
+def test_compiled_plan_execution(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "shuffle", "meta": {"sequence": 1}},
+        {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 2}},
+    ]
+    plan = Language(sequences=sequences).compile()
+    for _ in range(10):
+        results = plan.execute()
+        assert len(results[3]) == 5
+        assert len(results[1].cards) == 47
+        # Every execution starts from scratch
+        assert results[1] is results[2]
+
+
+def test_deterministic_prefix_is_run_once(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {
+            "command": "pick_specific_cards",
+            "meta": {"cards": [{"value": 13, "suit": "hearts"}], "from_sequence": 1},
+        },
+        {"command": "shuffle", "meta": {"sequence": 1}},
+        {"command": "pick_random_cards", "meta": {"count": 51, "from_sequence": 3}},
+    ]
+    plan = Language(sequences=sequences).compile()
+    assert plan.prefix_length == 2
+
+    for _ in range(3):
+        results = plan.execute()
+        # Every execution gets its own copy of the deck after the prefix
+        assert len(results[1].cards) == 0
+        assert results[1] is results[3]
+        assert results[2] == [Card(value=13, suit="hearts")]
+        assert len(results[4]) == 51
+        assert Card(value=13, suit="hearts") not in results[4]
+
+
+def test_init_deck_is_not_hoisted(standard_deck_sequence):
+    # Cloning a fresh deck is no cheaper than creating it
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 1}},
+    ]
+    assert Language(sequences=sequences).compile().prefix_length == 0
+
+
+def test_execute_only_what_result_depends_on(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "init_deck", "meta": {"deck_type": "canasta_deck"}},
+        {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 2}},
+        {"command": "pick_random_cards", "meta": {"count": 10, "from_sequence": 1}},
+        {"command": "pick_random_cards", "meta": {"count": 3, "from_sequence": 4}},
+    ]
+    plan = Language(sequences=sequences).compile()
+
+    schedule = plan.get_schedule(5)
+    assert [step.sequence for step, _ in schedule.steps] == [1, 4, 5]
+    results = plan.execute(result_sequence=5)
+    # Everything but the result is released once it is not needed
+    assert list(results) == [5]
+    assert len(results[5]) == 3
+
+    # The final state of a deck depends on every step picking from it
+    assert [step.sequence for step, _ in plan.get_schedule(2).steps] == [2, 3]
+    results = plan.execute(result_sequence=2)
+    assert list(results) == [2]
+    assert len(results[2].cards) == 103
+
+
+def test_execute_result_with_shared_deck(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 10, "from_sequence": 1}},
+        {"command": "shuffle", "meta": {"sequence": 1}},
+        {"command": "pick_random_cards", "meta": {"count": 2, "from_sequence": 2}},
+        {"command": "pick_random_cards", "meta": {"count": 40, "from_sequence": 3}},
+    ]
+    plan = Language(sequences=sequences).compile()
+
+    # The shuffled deck is the deck of sequence 1, 10 cards were picked from it
+    assert [step.sequence for step, _ in plan.get_schedule(5).steps] == [1, 2, 3, 5]
+    assert len(plan.execute(result_sequence=5)[5]) == 40
+
+    with pytest.raises(BadSource):
+        plan.execute(result_sequence=6)
+
+
+def test_language_probability_test_skips_unused_steps(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 1}},
+        # Would fail if it was executed
+        {"command": "pick_random_cards", "meta": {"count": 100, "from_sequence": 1}},
+    ]
+    lan = Language(sequences=sequences)
+    assert 100 == ProbabilityTest.run_language_probability_test(
+        lan.execute, result_sequence=2, iteration_count=10
+    )
+
+
+def test_execution_context(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 1}},
+    ]
+    lan = Language(sequences=sequences)
+    context = lan.execute()
+    assert isinstance(context, ExecutionContext)
+    assert context.current_sequence is None
+    assert lan.sequence_results is context
+
+    # Each execution has its own state
+    other_context = lan.execute()
+    assert other_context is not context
+    assert other_context[1] is not context[1]
+    assert len(context[1].cards) == len(other_context[1].cards) == 47
+
+
+def test_language_can_be_pickled(standard_deck_sequence):
+    lan = Language(sequences=standard_deck_sequence)
+    lan.execute()
+    copied_lan = pickle.loads(pickle.dumps(lan))
+    assert copied_lan.sequences == lan.sequences
+    assert copied_lan.execute()[1].is_valid_deck
+
+
+class _NoLock(object):
+    def __enter__(self):
+        raise AssertionError("The lock was taken")
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def test_concurrent_execution():
+    """
+    One compiled program executed from many threads at once, without locking
+    """
+    sequences = [
+        {"command": "init_deck", "meta": {"deck_type": "canasta_deck"}},
+        {
+            "command": "pick_specific_cards",
+            "meta": {"cards": [{"value": 1, "suit": "spades"}], "from_sequence": 1},
+        },
+        {"command": "shuffle", "meta": {"sequence": 1}},
+        {"command": "pick_random_cards", "meta": {"count": 20, "from_sequence": 3}},
+        {"command": "pick_random_cards", "meta": {"count": 5, "from_sequence": 4}},
+    ]
+    lan = Language(sequences=sequences)
+    lan.compile()
+    lan._lock = _NoLock()
+    threads = 8
+    executions = 300
+    full_deck = Counter(JokerDeck().cards)
+    barrier = threading.Barrier(threads)
+
+    def run(_):
+        barrier.wait()
+        hands = []
+        for _ in range(executions):
+            context = lan.execute()
+            deck = context[1]
+            assert context[3] is deck
+            assert len(deck.cards) == 107 - 20
+            # No card got lost or duplicated by another thread
+            assert Counter(deck.cards + context[2] + context[4]) == full_deck
+            assert all(card in context[4] for card in context[5])
+            hands.append(tuple(context[5]))
+        return hands
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        hands = [hand for result in pool.map(run, range(threads)) for hand in result]
+    assert len(hands) == threads * executions
+    # Executions don't share their random state either
+    assert len(set(hands)) > 0.99 * len(hands)
+
+
+def test_changed_sequences_are_recompiled(standard_deck_sequence):
+    lan = Language(sequences=standard_deck_sequence)
+    assert 1 in lan.execute()
+
+    lan.sequences.append(
+        {"command": "pick_random_cards", "meta": {"count": 2, "from_sequence": 1}}
+    )
+    assert len(lan.execute()[2]) == 2
+
+    lan.sequences[1] = {
+        "command": "pick_random_cards",
+        "meta": {"count": 3, "from_sequence": 1},
+    }
+    assert len(lan.execute()[2]) == 3
+
+    lan.sequences[1]["meta"]["count"] = 4
+    lan.compile()
+    assert len(lan.execute()[2]) == 4
+
+    lan.sequences = standard_deck_sequence[:1]
+    assert 2 not in lan.execute()
+
+
+def _probability_of(sequences, result_sequence):
+    lan = Language(sequences=sequences)
+    return ProbabilityTest.run_language_probability_test(
+        lan.execute, result_sequence=result_sequence, iteration_count=ITERATION_COUNT
+    )
+
+
+def test_any_match_red_card(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 1}},
+        {
+            "command": "any_match",
+            "meta": {
+                "conditions": [{"type": "colours", "values": ["red"]}],
+                "from_sequence": 2,
+            },
+        },
+    ]
+    assert 48 < _probability_of(sequences, 3) < 52
+
+
+def test_any_match_jokers():
+    sequences = [
+        {"command": "init_deck", "meta": {"deck_type": "standard_deck_with_jokers"}},
+        {"command": "pick_random_cards", "meta": {"count": 3, "from_sequence": 1}},
+        {
+            "command": "any_match",
+            "meta": {
+                "conditions": [{"type": "values", "values": ["*"]}],
+                "from_sequence": 2,
+                "matches_required": 1,
+            },
+        },
+    ]
+    # 1 - (52 * 51 * 50) / (54 * 53 * 52) ~ 10.9%
+    assert 10 < _probability_of(sequences, 3) < 12
+
+    sequences[2]["meta"]["matches_required"] = 2
+    assert 0 < _probability_of(sequences, 3) < 0.8
+
+
+def test_any_match_specific_cards(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 26, "from_sequence": 1}},
+        {
+            "command": "any_match",
+            "meta": {
+                "conditions": [
+                    {
+                        "type": "specific_cards",
+                        "values": [
+                            {"value": 1, "suit": "hearts"},
+                            {"value": 2, "suit": "hearts"},
+                        ],
+                    }
+                ],
+                "from_sequence": 2,
+                "matches_required": 2,
+            },
+        },
+    ]
+    # 26 / 52 * 25 / 51 ~ 24.5%
+    assert 23 < _probability_of(sequences, 3) < 26
+
+
+def test_any_match_no_spade(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 3, "from_sequence": 1}},
+        {
+            "command": "any_match",
+            "meta": {
+                "conditions": [
+                    {"type": "suits", "values": ["hearts", "diamonds"]},
+                    {"type": "colours", "values": ["black"]},
+                ],
+                "from_sequence": 2,
+                "matches_required": 3,
+            },
+        },
+    ]
+    # Spades are black, so all of the cards always match
+    assert _probability_of(sequences, 3) == 100
+
+    sequences[2]["meta"]["conditions"][1] = {"type": "suits", "values": ["clubs"]}
+    # 39 / 52 * 38 / 51 * 37 / 50 ~ 41.4%
+    assert 40 < _probability_of(sequences, 3) < 43
+
+
+def test_all_match(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 3, "from_sequence": 1}},
+        {
+            "command": "all_match",
+            "meta": {
+                "conditions": [
+                    {"type": "suits", "values": ["hearts", "diamonds", "clubs"]},
+                    {"type": "colours", "values": ["red", "black", "red"]},
+                ],
+                "from_sequence": 2,
+            },
+        },
+    ]
+    # 3! * 13 ** 3 / (52 * 51 * 50) ~ 9.9%
+    assert 9 < _probability_of(sequences, 3) < 11
+
+    sequences[2]["meta"]["conditions"] = [
+        {"type": "values", "values": [1, 1]},
+        {"type": "colours", "values": ["red"]},
+    ]
+    lan = Language(sequences=sequences)
+    lan.execute()
+    picked = lan.sequence_results[2]
+    expected = [card.value for card in picked].count(1) >= 2 and any(
+        card.colour == "red" for card in picked
+    )
+    assert lan.sequence_results[3] == expected
+
+
+def test_order_match(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {"command": "pick_random_cards", "meta": {"count": 3, "from_sequence": 1}},
+        {
+            "command": "order_match",
+            "meta": {
+                "conditions": [
+                    {"type": "suits", "values": ["hearts"]},
+                    {"type": "suits", "values": ["diamonds"]},
+                    {"type": "suits", "values": ["clubs"]},
+                ],
+                "from_sequence": 2,
+            },
+        },
+    ]
+    # (13 / 52) * (13 / 51) * (13 / 50) ~ 1.66%
+    assert 1 < _probability_of(sequences, 3) < 2.3
+
+    # Fewer cards than conditions never match
+    sequences[1]["meta"]["count"] = 2
+    assert _probability_of(sequences, 3) == 0
+
+
+def test_match_conditions_are_validated(standard_deck_sequence):
+    sequences = standard_deck_sequence + [
+        {
+            "command": "any_match",
+            "meta": {
+                "conditions": [{"type": "shapes", "values": ["round"]}],
+                "from_sequence": 1,
+            },
+        },
+    ]
+    with pytest.raises(UnsupportedCondition):
+        Language(sequences=sequences).compile()
@@ -0,0 +1,151 @@
+import random
+
+import pytest
+
+from ..cards import parallel
+from ..cards.exceptions import BadSource
+from ..cards.language import Language
+from ..cards.models import ProbabilityTest, StandardDeck
+from ..cards import constants
+
+
+def pick_red_card():
+    deck = StandardDeck()
+    return deck.pick_random_card().colour == constants.COLOUR_RED
+
+
+def test_split_iterations():
+    assert parallel.split_iterations(10, 4) == [3, 3, 2, 2]
+    assert parallel.split_iterations(2, 4) == [1, 1, 0, 0]
+
+
+def test_shard_seeds_are_reproducible():
+    assert parallel.get_shard_seeds(1, 8) == parallel.get_shard_seeds(1, 8)
+    assert len(set(parallel.get_shard_seeds(1, 8))) == 8
+
+
+def test_resolve_function():
+    path = "{}:pick_red_card".format(__name__)
+    assert parallel.resolve_function(path) is pick_red_card
+    with pytest.raises(BadSource):
+        parallel.resolve_function(__name__)
+
+
+def test_parallel_probability_test():
+    result = ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=8000, workers=2, seed=1
+    )
+    assert 47 < result < 53
+    # The same seed and number of workers gives the same result
+    assert result == ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=8000, workers=2, seed=1
+    )
+
+
+def test_parallel_probability_test_with_import_path():
+    path = "{}:pick_red_card".format(__name__)
+    result = ProbabilityTest.run_probability_test(
+        path, iteration_count=8000, workers=2, seed=1
+    )
+    assert result == ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=8000, workers=2, seed=1
+    )
+
+
+def test_parallel_probability_test_with_closure():
+    def test_func(argument):
+        return random.random() < argument
+
+    result = ProbabilityTest.run_probability_test(
+        test_func, iteration_count=8000, workers=2, argument=0.25
+    )
+    assert 22 < result < 28
+
+
+def test_small_runs_stay_in_process():
+    # Too few iterations for a pool, but seeded runs give the same result
+    # as if the shards were run by the workers
+    small = ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=100, workers=2, seed=3
+    )
+    assert small == ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=100, workers=2, seed=3
+    )
+    assert small == ProbabilityTest._get_percentage(
+        sum(
+            parallel.run_shard((pick_red_card, None, {}), size, seed)
+            for size, seed in zip(
+                parallel.split_iterations(100, parallel.SHARD_COUNT),
+                parallel.get_shard_seeds(3, parallel.SHARD_COUNT),
+            )
+        ),
+        100,
+    )
+
+
+def test_seeded_runs_dont_depend_on_workers():
+    in_process = ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=8000, seed=5
+    )
+    assert in_process == ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=8000, workers=1, seed=5
+    )
+    assert in_process == ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=8000, workers=2, seed=5
+    )
+
+
+def test_seeded_runs_stay_in_process_without_workers(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("A pool was started")
+
+    monkeypatch.setattr(parallel, "ProcessPoolExecutor", no_pool)
+    result = ProbabilityTest.run_probability_test(
+        pick_red_card, iteration_count=100000, seed=5
+    )
+    assert 49 < result < 51
+
+
+def test_parallel_language_probability_test():
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 1}},
+        ]
+    )
+    result = ProbabilityTest.run_language_probability_test(
+        lan.execute, result_sequence=2, iteration_count=4000, workers=2, seed=1
+    )
+    assert result == 100
+
+
+def test_seeded_language_runs_dont_depend_on_workers():
+    # Sequence 3 is a random pick the result doesn't depend on, it must be
+    # skipped by every worker so the cards drawn stay the same
+    lan = Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 2}},
+            {"command": "pick_random_cards", "meta": {"count": 1, "from_sequence": 1}},
+            {
+                "command": "any_match",
+                "meta": {
+                    "conditions": [{"type": "colours", "values": ["red"]}],
+                    "from_sequence": 4,
+                },
+            },
+        ]
+    )
+    results = [
+        ProbabilityTest.run_language_probability_test(
+            lan.execute,
+            result_sequence=5,
+            iteration_count=4000,
+            workers=workers,
+            seed=3,
+        )
+        for workers in (None, 1, 2)
+    ]
+    assert results[0] == results[1] == results[2]
+    assert 45 < results[0] < 55
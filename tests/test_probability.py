@@ -1,6 +1,11 @@
 import random
+import time
 
-from ..cards.models import ProbabilityTest
+import numpy as np
+
+from ..cards.batch import SUIT_INDEXES, is_flush
+from ..cards.constants import SUIT_HEARTS
+from ..cards.models import ProbabilityTest, StandardDeck, JokerDeck
 
 
 def test_probability_calculator():
@@ -32,3 +37,203 @@ def test_probability_calculator_with_arguments():
         return argument
 
     assert 0 == ProbabilityTest.run_probability_test(test_func, 2, argument=False)
+
+
+def test_batch_probability_calculator():
+    def test_func(hands):
+        return np.ones(len(hands), dtype=bool)
+
+    assert 100 == ProbabilityTest.run_batch_probability_test(
+        test_func, StandardDeck, 5, iteration_count=10
+    )
+
+    def test_func(hands, joker_count):
+        return hands.is_joker.sum(axis=1) >= joker_count
+
+    # Blocks don't have to divide the number of iterations
+    result = ProbabilityTest.run_batch_probability_test(
+        test_func, JokerDeck, 3, iteration_count=50000, block_size=7000, joker_count=1
+    )
+    assert 10 < result < 12
+
+
+def test_batch_probability_calculator_is_reproducible():
+    results = [
+        ProbabilityTest.run_batch_probability_test(
+            is_flush, StandardDeck, 5, iteration_count=20000, rng=42
+        )
+        for _ in range(2)
+    ]
+    assert results[0] == results[1]
+    assert 0.05 < results[0] < 0.5
+
+
+def test_sequential_probability_calculator():
+    def test_func():
+        return random.choice([1, 2]) == 2
+
+    result = ProbabilityTest.run_sequential_probability_test(
+        test_func, half_width=2, check_every=100
+    )
+    assert result.half_width <= 2
+    # 50% needs about 2400 iterations for +-2% at 95% confidence
+    assert 2000 <= result.iterations <= 3000
+    assert result.interval[0] < result.estimate < result.interval[1]
+    assert 40 < result.estimate < 60
+    assert result.elapsed > 0
+
+
+def test_sequential_probability_calculator_budget():
+    def test_func(argument):
+        return argument
+
+    result = ProbabilityTest.run_sequential_probability_test(
+        test_func,
+        half_width=0.1,
+        relative=True,
+        max_iterations=250,
+        check_every=100,
+        method="clopper_pearson",
+        argument=False,
+    )
+    # 0% can never be within a relative half width, budget stops the run
+    assert result.iterations == 250
+    assert result.estimate == 0
+    assert result.interval[0] == 0
+
+
+def test_sequential_language_probability_calculator():
+    def test_func():
+        return {1: True}
+
+    result = ProbabilityTest.run_sequential_probability_test(
+        test_func, half_width=1, result_sequence=1
+    )
+    assert result.estimate == 100
+
+
+def test_multi_probability_calculator():
+    def deal_func():
+        return StandardDeck().pick_random_cards(2)
+
+    result = ProbabilityTest.run_multi_probability_test(
+        deal_func,
+        {
+            "red": lambda cards: cards[0].colour == "red",
+            "black": lambda cards: cards[0].colour == "black",
+            "also_red": lambda cards: cards[0].colour == "red",
+            "always": lambda cards: True,
+        },
+        iteration_count=2000,
+        seed=3,
+    )
+    assert result.iterations == 2000
+    assert result["red"].successes + result["black"].successes == 2000
+    assert result["red"].successes == result["also_red"].successes
+    assert result["always"].estimate == 100
+    assert 40 < result["red"].estimate < 60
+    assert result.correlation["red", "also_red"] == 1
+    assert result.correlation["red", "black"] == -1
+    assert np.isnan(result.correlation["red", "always"])
+
+    again = ProbabilityTest.run_multi_probability_test(
+        deal_func,
+        {"red": lambda cards: cards[0].colour == "red"},
+        iteration_count=2000,
+        seed=3,
+    )
+    assert again["red"].successes == result["red"].successes
+
+
+def test_multi_probability_calculator_keeps_the_global_random_state():
+    random.seed(1)
+    expected = random.random()
+    random.seed(1)
+    ProbabilityTest.run_multi_probability_test(
+        lambda: StandardDeck().pick_random_cards(2),
+        {"any": lambda cards: True},
+        iteration_count=10,
+        seed=3,
+    )
+    assert random.random() == expected
+
+
+def test_multi_probability_calculator_with_result_sequences():
+    def deal_func():
+        return {1: True, 2: False}
+
+    result = ProbabilityTest.run_multi_probability_test(
+        deal_func, {"first": 1, "second": 2}, iteration_count=10
+    )
+    assert result["first"].estimate == 100
+    assert result["second"].estimate == 0
+
+
+def test_batch_multi_probability_calculator():
+    result = ProbabilityTest.run_batch_multi_probability_test(
+        {
+            "flush": is_flush,
+            "hearts": lambda hands: (hands.suits == SUIT_INDEXES[SUIT_HEARTS]).all(
+                axis=1
+            ),
+        },
+        StandardDeck,
+        5,
+        iteration_count=100000,
+        block_size=30000,
+        rng=5,
+    )
+    assert result.iterations == 100000
+    assert 0.1 < result["flush"].estimate < 0.3
+    assert result["hearts"].successes < result["flush"].successes
+    assert 0 < result.correlation["flush", "hearts"] < 1
+
+
+def test_probability_calculator_generator():
+    calls = []
+
+    def test_func():
+        calls.append(1)
+        return len(calls) % 2 == 0
+
+    results = list(
+        ProbabilityTest.iter_probability_test(
+            test_func, iteration_count=2500, report_every=1000
+        )
+    )
+    assert [result.iterations for result in results] == [1000, 2000, 2500]
+    assert [result.successes for result in results] == [500, 1000, 1250]
+    assert results[-1].estimate == 50
+    assert results[-1].interval[0] < 50 < results[-1].interval[1]
+    assert results[-1].iterations_per_second > 0
+
+
+def test_probability_calculator_generator_can_be_stopped():
+    calls = []
+
+    def test_func():
+        calls.append(1)
+        return {1: True}
+
+    results = ProbabilityTest.iter_probability_test(
+        test_func, report_every=10, result_sequence=1
+    )
+    for result in results:
+        if result.iterations == 30:
+            break
+    # Nothing is computed ahead of the consumer
+    assert len(calls) == 30
+    assert result.estimate == 100
+
+
+def test_probability_calculator_generator_by_time():
+    def test_func():
+        time.sleep(0.001)
+        return False
+
+    results = ProbabilityTest.iter_probability_test(
+        test_func, iteration_count=200, report_every=None, report_seconds=0.02
+    )
+    iterations = [result.iterations for result in results]
+    assert iterations[-1] == 200
+    assert len(iterations) > 2
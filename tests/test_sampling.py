@@ -0,0 +1,138 @@
+import pytest
+
+from ..cards import exact
+from ..cards import exceptions
+from ..cards.constants import COLOUR_BLACK
+from ..cards.estimates import WeightedProbabilityResult
+from ..cards.models import JokerDeck, ProbabilityTest, StandardDeck
+from ..cards.sampling import importance_sampling, stratified_sampling
+
+
+def _two_jokers(cards):
+    return sum(card.is_joker for card in cards) >= 2
+
+
+def _no_black_card(cards):
+    return all(card.colour != COLOUR_BLACK for card in cards)
+
+
+def test_importance_sampling_is_unbiased():
+    expected = float(
+        exact.probability(JokerDeck, 3, lambda drawn: drawn[True] >= 2, exact.by_joker)
+    )
+    plain = importance_sampling(
+        _two_jokers, JokerDeck, 3, {}, key=exact.by_joker, iteration_count=5000, seed=1
+    )
+    biased = importance_sampling(
+        _two_jokers,
+        JokerDeck,
+        3,
+        {True: 20},
+        key=exact.by_joker,
+        iteration_count=5000,
+        seed=1,
+    )
+    # Drawing jokers more often makes the estimate much more precise
+    assert biased.standard_error < plain.standard_error / 5
+    assert abs(biased.estimate - expected * 100) < 4 * biased.standard_error
+    assert biased.interval[0] < expected * 100 < biased.interval[1]
+
+
+def test_importance_sampling_of_a_rare_event():
+    expected = float(
+        exact.probability(JokerDeck, 14, lambda drawn: drawn["black"] == 0)
+    )
+    result = ProbabilityTest.run_importance_sampling_test(
+        _no_black_card,
+        JokerDeck,
+        14,
+        weights={COLOUR_BLACK: 0.1},
+        iteration_count=5000,
+        seed=2,
+    )
+    # ~0.004%, plain Monte Carlo would need millions of iterations
+    assert abs(result.estimate / (expected * 100) - 1) < 0.1
+    assert result.iterations == 5000
+
+
+def test_importance_sampling_keeps_the_drawing_order():
+    deck = StandardDeck()
+    first_cards = []
+    importance_sampling(
+        lambda cards: first_cards.append(cards[0]) or True,
+        deck,
+        2,
+        {"red": 3},
+        iteration_count=2000,
+        seed=3,
+    )
+    red = sum(card.colour == "red" for card in first_cards)
+    # The first card is red with probability 3 / 4
+    assert 1400 < red < 1600
+
+
+def test_importance_sampling_validates_weights():
+    with pytest.raises(exceptions.UnsupportedAction):
+        importance_sampling(_two_jokers, JokerDeck, 3, {True: 0}, key=exact.by_joker)
+    with pytest.raises(exceptions.NotEnoughCardsException):
+        importance_sampling(_two_jokers, StandardDeck, 53, {})
+
+
+def test_stratified_sampling():
+    # The event depends only on the number of cards per group, so it is exact
+    expected = exact.probability(JokerDeck, 14, lambda drawn: drawn["black"] == 0)
+    result = ProbabilityTest.run_stratified_probability_test(
+        _no_black_card, JokerDeck, 14, iteration_count=2000, seed=4
+    )
+    assert result.estimate == pytest.approx(float(expected) * 100)
+    assert result.variance == 0
+    assert result.iterations == 2000
+
+    # Flush, stratified by colour
+    expected = exact.probability(
+        StandardDeck, 5, lambda drawn: 5 in drawn.values(), key=exact.by_suit
+    )
+    result = stratified_sampling(
+        lambda cards: len({card.suit for card in cards}) == 1,
+        StandardDeck,
+        5,
+        iteration_count=20000,
+        seed=5,
+    )
+    assert abs(result.estimate - float(expected) * 100) < 4 * result.standard_error
+    assert result.standard_error > 0
+
+
+def test_stratified_sampling_keeps_the_budget():
+    def test_func(cards):
+        return len({card.value for card in cards}) == 5
+
+    # 6175 strata, a sample each fits the budget
+    result = stratified_sampling(
+        test_func,
+        StandardDeck,
+        5,
+        key=exact.by_value,
+        iteration_count=8000,
+        min_samples=1,
+        seed=1,
+    )
+    assert result.iterations == 8000
+    # Every stratum has one value count per card, the estimate is exact
+    expected = exact.probability(
+        StandardDeck, 5, lambda drawn: max(drawn.values()) == 1, key=exact.by_value
+    )
+    assert result.estimate == pytest.approx(float(expected) * 100)
+
+    with pytest.raises(exceptions.UnsupportedAction):
+        stratified_sampling(
+            test_func, StandardDeck, 5, key=exact.by_value, iteration_count=2000
+        )
+
+
+def test_weighted_probability_result():
+    result = WeightedProbabilityResult.from_estimate(0.25, 0.0001, 100)
+    assert result.estimate == 25
+    assert result.standard_error == pytest.approx(1)
+    assert result.interval == pytest.approx((23.04, 26.96), abs=0.01)
+    assert result.half_width == pytest.approx(1.96, abs=0.01)
@@ -0,0 +1,66 @@
+from fractions import Fraction
+
+from ..cards import exact
+from ..cards.models import JokerDeck, StandardDeck
+from ..cards.scenarios import SCENARIOS, ScenarioResult, format_report, run_scenarios
+
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+
+def test_references_agree_with_exact_probabilities():
+    def reference(name):
+        return SCENARIOS_BY_NAME[name].reference
+
+    assert reference("joker_cut") == exact.probability(
+        JokerDeck, 3, lambda drawn: drawn[True] >= 1, key=exact.by_joker
+    )
+    assert reference("two_jokers_cut") == exact.probability(
+        JokerDeck, 3, lambda drawn: drawn[True] >= 2, key=exact.by_joker
+    )
+    assert reference("flush") == exact.probability(
+        StandardDeck, 5, lambda drawn: 5 in drawn.values(), key=exact.by_suit
+    )
+    assert reference("no_black_card") == exact.probability(
+        JokerDeck, 14, lambda drawn: drawn["black"] == 0
+    )
+    assert reference("spade_and_heart") == exact.probability(
+        StandardDeck,
+        2,
+        lambda drawn: drawn["spades"] == drawn["hearts"] == 1,
+        key=exact.by_suit,
+    )
+    assert reference("three_of_a_kind") == exact.probability(
+        StandardDeck, 5, lambda drawn: 3 in drawn.values(), key=exact.by_value
+    )
+    assert reference("red_card") == Fraction(1, 2)
+
+
+def test_run_scenarios():
+    results = run_scenarios(iteration_count=3000, seed=1)
+    engines = {(result.scenario, result.engine) for result in results}
+    assert len(engines) == len(results)
+    assert ("flush", "batch") in engines
+    assert ("high_card", "language_batch") in engines
+    assert ("monty_hall_switch", "language") not in engines
+    for result in results:
+        assert result.z_score < 5, result
+        assert result.iterations_per_second > 0
+
+    report = format_report(results).splitlines()
+    assert len(report) == len(results) + 1
+
+
+def test_scenario_result():
+    result = ScenarioResult(
+        scenario="red_card",
+        engine="python",
+        iterations=10000,
+        estimate=51.0,
+        reference=50.0,
+        elapsed=0.5,
+    )
+    assert result.error == 1.0
+    assert result.iterations_per_second == 20000
+    # Standard error is 0.5 percentage points
+    assert round(result.z_score, 6) == 2
+    assert result.as_dict()["z_score"] == result.z_score
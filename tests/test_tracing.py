@@ -0,0 +1,84 @@
+import json
+
+from ..cards.language import Language
+from ..cards.models import ProbabilityTest
+from ..cards.tracing import StepTracer
+
+
+def _program():
+    return Language(
+        sequences=[
+            {"command": "init_deck", "meta": {"deck_type": "standard_deck"}},
+            {"command": "shuffle", "meta": {"sequence": 1}},
+            {"command": "pick_random_cards", "meta": {"count": 2, "from_sequence": 2}},
+        ]
+    )
+
+
+def test_trace_execute():
+    lan = _program()
+    plan = lan.compile()
+    lan.tracer = StepTracer(track_allocations=True)
+    assert lan.compile() is not plan
+    for _ in range(5):
+        lan.execute()
+
+    report = lan.tracer.report()
+    assert [step["command"] for step in report["steps"]] == [
+        "init_deck",
+        "shuffle",
+        "pick_random_cards",
+    ]
+    for step in report["steps"]:
+        assert step["calls"] == 5
+        assert 0 <= step["p50_seconds"] <= step["p99_seconds"]
+        assert step["total_seconds"] > 0
+    assert report["track_allocations"]
+
+
+def test_trace_probability_test():
+    lan = _program()
+    lan.tracer = StepTracer(max_samples=10)
+    ProbabilityTest.run_language_probability_test(
+        lan.execute, result_sequence=3, iteration_count=100
+    )
+    calls = {step["sequence"]: step["calls"] for step in lan.tracer.report()["steps"]}
+    assert calls == {1: 100, 2: 100, 3: 100}
+    assert len(lan.tracer.get_stats(1, "init_deck").samples) == 10
+
+    lan.tracer.clear()
+    ProbabilityTest.run_language_probability_test(
+        lan.execute, result_sequence=3, iteration_count=10
+    )
+    assert lan.tracer.get_stats(3, "pick_random_cards").calls == 10
+
+    lan.tracer.clear()
+    ProbabilityTest.run_language_probability_test(
+        lan.execute, result_sequence=3, iteration_count=1000, backend="batch"
+    )
+    # The batch backend runs a step once per block
+    calls = {step["sequence"]: step["calls"] for step in lan.tracer.report()["steps"]}
+    assert calls == {1: 1, 2: 1, 3: 1}
+
+
+def test_trace_execute_sequence():
+    lan = _program()
+    lan.tracer = StepTracer()
+    lan.execute_sequence("init_deck", deck_type="standard_deck")
+    assert lan.tracer.report()["steps"][0]["calls"] == 1
+
+
+def test_save_report(tmp_path):
+    lan = _program()
+    lan.tracer = StepTracer()
+    lan.execute()
+    path = tmp_path / "trace.json"
+    lan.tracer.save_report(str(path))
+    with open(path) as report_file:
+        assert json.load(report_file) == lan.tracer.report()
+
+
+def test_tracing_is_off_by_default():
+    lan = _program()
+    assert lan.tracer is None
+    assert lan.compile().tracer is None